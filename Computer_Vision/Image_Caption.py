@@ -1,16 +1,57 @@
-import torch
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
 from PIL import Image
-from transformers import VisionEncoderDecoderModel, ViTImageProcessor, GPT2TokenizerFast
-from tqdm import tqdm
+from Core import tracing
+from Core.model_registry import registry
+from Core.inference_client import RemoteModel, remote_model
+from Computer_Vision.caption_backends import CAPTION_MODEL_NAME, default_backend, load_caption_backend
 
-model = VisionEncoderDecoderModel.from_pretrained("nlpconnect/vit-gpt2-image-captioning",
-    cache_dir="./models_cache")
-tokenizer = GPT2TokenizerFast.from_pretrained("nlpconnect/vit-gpt2-image-captioning",
-    cache_dir="./models_cache")
+# Inference backend: "eager" (fp32), "int8" (dynamic quantization) or "onnx"
+# (ONNX Runtime with KV cache). Set MOBSIR_CAPTION_BACKEND or call set_caption_backend.
+caption_backend = default_backend()
 
 
-image_processor = ViTImageProcessor.from_pretrained("nlpconnect/vit-gpt2-image-captioning",
-    cache_dir="./models_cache")
+def _load_captioner():
+  """Load the captioning model (with the selected backend), image processor and tokenizer."""
+  # With MOBSIR_INFERENCE_URL set the model lives in the inference server.
+  remote = remote_model("caption")
+  if remote is not None:
+    return remote, None, None
+  return load_caption_backend(caption_backend)
+
+
+registry.register("captioner", _load_captioner)
+
+
+def set_caption_backend(name):
+  """Switch the captioner backend; the model is reloaded on next use."""
+  global caption_backend
+  caption_backend = name
+  registry.unload("captioner")
+
+
+def load_captioner():
+  """Return (model, image_processor, tokenizer), loading them on first use."""
+  return registry.get("captioner")
+
+
+def using_captioner():
+  """
+    Context manager giving (model, image_processor, tokenizer) and keeping
+    them loaded (not evicted by the model registry) until the block ends.
+    """
+  return registry.use("captioner")
+
+
+def __getattr__(name):
+  # Backward compatibility for `from Computer_Vision.Image_Caption import model, ...`.
+  components = ("model", "image_processor", "tokenizer")
+  if name in components:
+    return load_captioner()[components.index(name)]
+  raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def get_caption(model, image_processor, tokenizer, image_path):
@@ -18,7 +59,7 @@ def get_caption(model, image_processor, tokenizer, image_path):
     Generate a caption for a given image using a ViT-GPT2 image captioning model.
 
     This function:
-    - Opens the image and ensures it is in RGB mode.
+    - Opens the image (unless it is already in memory) and ensures it is in RGB mode.
     - Processes the image using the ViT image processor.
     - Uses the encoder-decoder model to generate a caption.
     - Decodes and returns the caption as a string.
@@ -27,24 +68,224 @@ def get_caption(model, image_processor, tokenizer, image_path):
         model (VisionEncoderDecoderModel): Pre-trained image captioning model.
         image_processor (ViTImageProcessor): Pre-trained image processor.
         tokenizer (GPT2TokenizerFast): Tokenizer to decode model output.
-        image_path (str): Path to the input image file.
+        image_path (str, PIL.Image or numpy.ndarray): Path to the input image
+            file, or the image itself (numpy arrays must be RGB).
 
     Returns:
         str: Generated caption describing the image.
     """
-    # Open the image
-  image = Image.open(image_path)
-  if image.mode != "RGB":
-    image = image.convert(mode="RGB")
+  return next(get_captions(model, image_processor, tokenizer, [image_path]))
+
+
+def _load_rgb_image(image):
+  """Return a PIL RGB image from a file path, a PIL image or an RGB numpy array."""
+  if isinstance(image, Image.Image):
+    pil_image = image
+  elif isinstance(image, np.ndarray):
+    pil_image = Image.fromarray(image)
+  else:
+    pil_image = Image.open(image)
+  if pil_image.mode != "RGB":
+    pil_image = pil_image.convert(mode="RGB")
+  return pil_image
+
+
+def _generation_kwargs(num_beams=None, max_new_tokens=None, **generate_kwargs):
+  """Build `model.generate` kwargs, leaving unset options to the model's defaults."""
+  kwargs = dict(generate_kwargs)
+  if num_beams is not None:
+    kwargs["num_beams"] = num_beams
+  if max_new_tokens is not None:
+    kwargs["max_new_tokens"] = max_new_tokens
+  return kwargs
+
+
+def _caption_batch(model, image_processor, tokenizer, images, generation):
+  """Run one padded `generate` call for a list of PIL images."""
+  if isinstance(model, RemoteModel):
+    return model.client.caption(images, num_beams=generation.get("num_beams"),
+                                max_new_tokens=generation.get("max_new_tokens"))
+  import torch
+
+  with tracing.span("caption", batch=len(images), backend=caption_backend):
+    pixel_values = image_processor(images, return_tensors="pt").pixel_values
+    with torch.inference_mode():
+      output = model.generate(pixel_values=pixel_values, **generation)
+  return [caption.strip() for caption in tokenizer.batch_decode(output, skip_special_tokens=True)]
+
+
+def get_captions(model, image_processor, tokenizer, images, batch_size=8,
+                 num_beams=None, max_new_tokens=None, **generate_kwargs):
+  """
+    Generate captions for many images, batching them through the model.
+
+    Images are grouped into batches of `batch_size`; each batch is processed
+    by one `generate` call (shorter captions are padded by the decoder) and the
+    captions are yielded as soon as their batch finishes, in input order.
+
+    Args:
+        model (VisionEncoderDecoderModel): Pre-trained image captioning model.
+        image_processor (ViTImageProcessor): Pre-trained image processor.
+        tokenizer (GPT2TokenizerFast): Tokenizer to decode model output.
+        images (iterable): File paths, PIL images or RGB numpy arrays.
+        batch_size (int, optional): Images per `generate` call. Default is 8.
+        num_beams (int, optional): Beam width. Defaults to the model's setting.
+        max_new_tokens (int, optional): Caption length limit. Defaults to the
+            model's setting.
+        **generate_kwargs: Any other `model.generate` options.
+
+    Yields:
+        str: One caption per input image, in input order.
+    """
+  generation = _generation_kwargs(num_beams, max_new_tokens, **generate_kwargs)
+  batch = []
+  for image in images:
+    batch.append(_load_rgb_image(image))
+    if len(batch) >= batch_size:
+      yield from _caption_batch(model, image_processor, tokenizer, batch, generation)
+      batch = []
+  if batch:
+    yield from _caption_batch(model, image_processor, tokenizer, batch, generation)
+
 
+def stream_caption(model, image_processor, tokenizer, image, max_new_tokens=None, **generate_kwargs):
+  """
+    Generate a caption and yield its text as the tokens are decoded.
+
+    `generate` runs on a background thread with a TextIteratorStreamer, so the
+    first words are available long before the caption is complete. Streaming
+    needs one hypothesis at a time, so decoding is greedy (num_beams=1).
+
+    Args:
+        model (VisionEncoderDecoderModel): Pre-trained image captioning model.
+        image_processor (ViTImageProcessor): Pre-trained image processor.
+        tokenizer (GPT2TokenizerFast): Tokenizer to decode model output.
+        image (str, PIL.Image or numpy.ndarray): The image (numpy arrays must be RGB).
+        max_new_tokens (int, optional): Caption length limit. Defaults to the
+            model's setting.
+        **generate_kwargs: Any other `model.generate` options.
+
+    Yields:
+        str: Decoded text pieces, in order.
+    """
+  if isinstance(model, RemoteModel):
+    # The server answers with whole captions, so the caption is one piece.
+    yield model.client.caption([image], num_beams=1, max_new_tokens=max_new_tokens)[0]
+    return
+  import torch
+  from transformers import TextIteratorStreamer
+
+  pixel_values = image_processor(_load_rgb_image(image), return_tensors="pt").pixel_values
+  streamer = TextIteratorStreamer(tokenizer, skip_special_tokens=True)
+  generation = _generation_kwargs(1, max_new_tokens, **generate_kwargs)
+  errors = []
+
+  def run():
+    try:
+      with torch.inference_mode():
+        model.generate(pixel_values=pixel_values, streamer=streamer, **generation)
+    except Exception as e:
+      errors.append(e)
+      streamer.end()
+
+  worker = threading.Thread(target=run, name="caption-stream", daemon=True)
+  worker.start()
+  for text in streamer:
+    if text:
+      yield text
+  worker.join()
+  if errors:
+    raise errors[0]
+
+
+class CaptionBatcher:
+  """
+    Micro-batching queue that merges concurrent caption requests.
+
+    Requests submitted from different threads within `max_wait_ms` of each
+    other are captioned together in one `generate` call.
+
+    Args:
+        model, image_processor, tokenizer: Captioning model components.
+        max_batch_size (int, optional): Largest merged batch. Default is 8.
+        max_wait_ms (float, optional): How long the first request of a batch
+            waits for others to join. Default is 5.
+        **generation: Generation settings (num_beams, max_new_tokens, ...).
+    """
 
-  img = image_processor(image, return_tensors="pt")
+  def __init__(self, model, image_processor, tokenizer, max_batch_size=8, max_wait_ms=5, **generation):
+    self.model = model
+    self.image_processor = image_processor
+    self.tokenizer = tokenizer
+    self.max_batch_size = max_batch_size
+    self.max_wait = max_wait_ms / 1000.0
+    self.generation = _generation_kwargs(**generation)
+    self._queue = queue.Queue()
+    self._closed = False
+    self._worker = threading.Thread(target=self._run, name="caption-batcher", daemon=True)
+    self._worker.start()
 
+  def submit(self, image):
+    """Queue an image and return a Future that resolves to its caption."""
+    if self._closed:
+      raise RuntimeError("CaptionBatcher is closed")
+    future = Future()
+    self._queue.put((image, future))
+    tracing.set_gauge("queue_depth", self._queue.qsize(), queue="caption_batcher")
+    return future
 
-  output = model.generate(**img)
+  def caption(self, image, timeout=None):
+    """Caption one image, sharing the model call with concurrent requests."""
+    return self.submit(image).result(timeout=timeout)
 
-  caption = tokenizer.batch_decode(output, skip_special_tokens=True)[0]
+  def close(self):
+    """Stop the worker after the queued requests are served."""
+    self._closed = True
+    self._queue.put(None)
+    self._worker.join()
 
-  return caption
+  def _collect(self):
+    item = self._queue.get()
+    if item is None:
+      return None
+    batch = [item]
+    deadline = time.monotonic() + self.max_wait
+    while len(batch) < self.max_batch_size:
+      remaining = deadline - time.monotonic()
+      if remaining <= 0:
+        break
+      try:
+        item = self._queue.get(timeout=remaining)
+      except queue.Empty:
+        break
+      if item is None:
+        self._queue.put(None)
+        break
+      batch.append(item)
+    return batch
 
-    
+  def _run(self):
+    while True:
+      batch = self._collect()
+      if batch is None:
+        return
+      live = [(image, future) for image, future in batch if future.set_running_or_notify_cancel()]
+      # An unreadable image fails only its own request; the rest are still captioned.
+      loaded = []
+      for image, future in live:
+        try:
+          loaded.append((_load_rgb_image(image), future))
+        except Exception as e:
+          future.set_exception(e)
+      live = loaded
+      if not live:
+        continue
+      try:
+        captions = _caption_batch(self.model, self.image_processor, self.tokenizer,
+                                  [pil_image for pil_image, _ in live], self.generation)
+      except Exception as e:
+        for _, future in live:
+          future.set_exception(e)
+        continue
+      for (_, future), caption in zip(live, captions):
+        future.set_result(caption)
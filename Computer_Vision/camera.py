@@ -0,0 +1,248 @@
+import os
+import glob
+import time
+import threading
+from collections import deque
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def blur_score(frame, width=160):
+    """
+    Cheap sharpness score: variance of the Laplacian on a downscaled gray frame.
+
+    Higher is sharper; motion-blurred or out-of-focus frames score low.
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    if gray.shape[1] > width:
+        height = max(1, int(gray.shape[0] * width / gray.shape[1]))
+        gray = cv2.resize(gray, (width, height), interpolation=cv2.INTER_AREA)
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+def brightness(frame):
+    """Mean gray level of a BGR frame (0-255)."""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    return float(gray.mean())
+
+
+class FrameSource:
+    """Interface for frame sources: `open`, `read() -> (ok, bgr_frame)` and `release`."""
+
+    def open(self):
+        return True
+
+    def read(self):
+        raise NotImplementedError
+
+    def release(self):
+        pass
+
+
+class OpenCVFrameSource(FrameSource):
+    """
+    A camera opened with cv2.VideoCapture.
+
+    Args:
+        index (int, optional): Camera index. Default is 0.
+    """
+
+    def __init__(self, index=0):
+        self.index = index
+        self._cap = None
+
+    def open(self):
+        self._cap = cv2.VideoCapture(self.index)
+        return self._cap.isOpened()
+
+    def read(self):
+        if self._cap is None:
+            return False, None
+        return self._cap.read()
+
+    def release(self):
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+
+class FileFrameSource(FrameSource):
+    """
+    Replays image files as camera frames, e.g. the `family/` photos in tests.
+
+    Args:
+        paths (str or list): A folder, a glob pattern or a list of image paths.
+        loop (bool, optional): Start again after the last image. Default is True.
+    """
+
+    def __init__(self, paths, loop=True):
+        if isinstance(paths, str):
+            if os.path.isdir(paths):
+                paths = [os.path.join(paths, f) for f in sorted(os.listdir(paths))
+                         if f.lower().endswith(IMAGE_EXTENSIONS)]
+            else:
+                paths = sorted(glob.glob(paths))
+        self.paths = list(paths)
+        self.loop = loop
+        self._index = 0
+        self._cache = {}
+
+    def read(self):
+        if not self.paths or (self._index >= len(self.paths) and not self.loop):
+            return False, None
+        path = self.paths[self._index % len(self.paths)]
+        self._index += 1
+        frame = self._cache.get(path)
+        if frame is None:
+            frame = cv2.imread(path)
+            if frame is None:
+                return False, None
+            self._cache[path] = frame
+        return True, frame.copy()
+
+
+class SyntheticFrameSource(FrameSource):
+    """
+    Deterministic generated frames (a textured pattern that slowly drifts).
+
+    Args:
+        width (int, optional): Frame width. Default is 640.
+        height (int, optional): Frame height. Default is 480.
+        seed (int, optional): Random seed for the texture. Default is 0.
+    """
+
+    def __init__(self, width=640, height=480, seed=0):
+        rng = np.random.default_rng(seed)
+        self._texture = rng.integers(0, 256, size=(height, width * 2, 3), dtype=np.uint8)
+        self.width = width
+        self._step = 0
+
+    def read(self):
+        offset = self._step % self.width
+        self._step += 1
+        return True, self._texture[:, offset:offset + self.width].copy()
+
+
+class CameraManager:
+    """
+    Keeps the camera open and grabs frames on a background thread.
+
+    Frames go into a small ring buffer together with a sharpness and a
+    brightness score. `get_frame` returns the sharpest sufficiently bright
+    recent frame, so captures skip the device open and auto-exposure delay
+    and avoid dark or blurred first frames.
+
+    Args:
+        source (FrameSource, optional): Frame source. Defaults to camera 0.
+        buffer_size (int, optional): Frames kept in the ring buffer. Default is 8.
+        fps (float, optional): Grab rate. Default is 15.
+        min_brightness (float, optional): Frames darker than this are skipped. Default is 20.
+    """
+
+    def __init__(self, source=None, buffer_size=8, fps=15, min_brightness=20):
+        self.source = source or OpenCVFrameSource(0)
+        self.buffer_size = buffer_size
+        self.fps = fps
+        self.min_brightness = min_brightness
+        self._buffer = deque(maxlen=buffer_size)
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+        self.error = None
+
+    @property
+    def is_running(self):
+        return self._running
+
+    def start(self):
+        """Open the source and start grabbing frames (no-op if already running)."""
+        with self._cond:
+            if self._running:
+                return True
+            if not self.source.open():
+                self.error = "📷 لَمْ أَتَمَكَّنْ مِنْ فَتْحِ الكَامِيرَا"
+                return False
+            self.error = None
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="camera-grabber", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        """Stop grabbing and release the device."""
+        with self._cond:
+            self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        self.source.release()
+        with self._cond:
+            self._buffer.clear()
+
+    def set_source(self, source):
+        """Switch to another frame source (e.g. a FileFrameSource in tests)."""
+        was_running = self._running
+        self.stop()
+        self.source = source
+        if was_running:
+            self.start()
+
+    def _run(self):
+        interval = 1.0 / self.fps if self.fps else 0
+        while self._running:
+            started = time.monotonic()
+            ok, frame = self.source.read()
+            if ok and frame is not None:
+                entry = (time.monotonic(), frame, blur_score(frame), brightness(frame))
+                with self._cond:
+                    self._buffer.append(entry)
+                    self._cond.notify_all()
+            elapsed = time.monotonic() - started
+            if interval > elapsed:
+                time.sleep(interval - elapsed)
+
+    def get_frame(self, timeout=3.0, max_age=1.0, sharpest=True):
+        """
+        Return a recent good frame (BGR).
+
+        Args:
+            timeout (float, optional): Seconds to wait for a usable frame. Default is 3.
+            max_age (float, optional): Only frames grabbed in the last `max_age`
+                seconds are considered. Default is 1.
+            sharpest (bool, optional): Pick the sharpest candidate instead of the
+                newest. Default is True.
+
+        Returns:
+            numpy.ndarray or None: A copy of the frame, or None if none arrived.
+        """
+        if not self.start():
+            return None
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                candidates = [e for e in self._buffer
+                              if now - e[0] <= max_age and e[3] >= self.min_brightness]
+                if candidates:
+                    best = max(candidates, key=lambda e: e[2]) if sharpest else candidates[-1]
+                    return best[1].copy()
+                remaining = deadline - now
+                if remaining <= 0:
+                    # Fall back to the newest frame even if it is dark.
+                    return self._buffer[-1][1].copy() if self._buffer else None
+                self._cond.wait(timeout=remaining)
+
+
+_camera = None
+_camera_lock = threading.Lock()
+
+
+def get_camera(**kwargs):
+    """Return the shared CameraManager, creating it on the first call."""
+    global _camera
+    with _camera_lock:
+        if _camera is None:
+            _camera = CameraManager(**kwargs)
+        return _camera
@@ -0,0 +1,201 @@
+"""
+Inference backends for the ViT-GPT2 captioner.
+
+- "eager": the original fp32 PyTorch model.
+- "int8":  dynamic int8 quantization of the model's nn.Linear layers (the ViT
+           encoder and the LM head; GPT-2's Conv1D blocks stay fp32).
+- "onnx":  an ONNX Runtime graph exported once to models_cache/onnx with
+           KV-cache decoding (requires `optimum[onnxruntime]`).
+
+Run `python -m Computer_Vision.caption_backends <images...>` for a report of
+load time, latency, memory and caption agreement across the backends.
+"""
+import os
+import json
+import glob
+import argparse
+
+from Core.model_backends import (BACKENDS, backend_from_env, select_loader, quantize_int8,
+                                 export_onnx_once, measure_backend)
+
+CAPTION_MODEL_NAME = "nlpconnect/vit-gpt2-image-captioning"
+CACHE_DIR = "./models_cache"
+ONNX_EXPORT_DIR = os.path.join(CACHE_DIR, "onnx", "vit-gpt2-image-captioning")
+
+
+def default_backend():
+    """Backend chosen by the MOBSIR_CAPTION_BACKEND environment variable (default "eager")."""
+    return backend_from_env("MOBSIR_CAPTION_BACKEND")
+
+
+def _load_processors():
+    from transformers import ViTImageProcessor, GPT2TokenizerFast
+
+    tokenizer = GPT2TokenizerFast.from_pretrained(CAPTION_MODEL_NAME, cache_dir=CACHE_DIR)
+    image_processor = ViTImageProcessor.from_pretrained(CAPTION_MODEL_NAME, cache_dir=CACHE_DIR)
+    return image_processor, tokenizer
+
+
+def _load_eager():
+    from transformers import VisionEncoderDecoderModel
+
+    model = VisionEncoderDecoderModel.from_pretrained(CAPTION_MODEL_NAME, cache_dir=CACHE_DIR)
+    return model.eval()
+
+
+def _load_int8():
+    return quantize_int8(_load_eager())
+
+
+def export_onnx(export_dir=ONNX_EXPORT_DIR):
+    """
+    Export the captioner to ONNX (encoder, decoder and decoder-with-past) once.
+
+    Returns:
+        str: The export folder.
+    """
+    from optimum.onnxruntime import ORTModelForVision2Seq
+
+    return export_onnx_once(ORTModelForVision2Seq, CAPTION_MODEL_NAME, export_dir, "captioner",
+                            cache_dir=CACHE_DIR)
+
+
+def _load_onnx():
+    from optimum.onnxruntime import ORTModelForVision2Seq
+
+    return ORTModelForVision2Seq.from_pretrained(export_onnx(), use_cache=True)
+
+
+_LOADERS = {"eager": _load_eager, "int8": _load_int8, "onnx": _load_onnx}
+
+
+def load_caption_backend(name=None):
+    """
+    Load the captioner with the given backend.
+
+    Args:
+        name (str, optional): "eager", "int8" or "onnx". Defaults to `default_backend()`.
+
+    Returns:
+        tuple: (model, image_processor, tokenizer); every model has a
+        `generate(pixel_values=...)` compatible with `get_captions`.
+    """
+    model = select_loader("caption", _LOADERS, name or default_backend())()
+    image_processor, tokenizer = _load_processors()
+    return model, image_processor, tokenizer
+
+
+def _token_jaccard(a, b):
+    a, b = set(a.lower().split()), set(b.lower().split())
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def compare_caption_backends(images, backends=BACKENDS, repeats=3, **generation):
+    """
+    Caption the same images with each backend and compare them with "eager".
+
+    The eager backend always runs first so every other backend is compared
+    against it. It is only reported when it is in `backends` (or failed, in
+    which case the others have no agreement scores).
+
+    Args:
+        images (list): Image paths (or PIL images / RGB arrays).
+        backends (iterable, optional): Backends to compare. Default is all.
+        repeats (int, optional): Timed passes per backend after a warm-up. Default is 3.
+        **generation: Generation settings passed to `get_captions`.
+
+    Returns:
+        dict: Per backend: load_seconds, mean/min latency per image in ms,
+        rss_delta_mb, captions, exact_match and token_jaccard against "eager".
+
+    Raises:
+        ValueError: If there are no images or `repeats` is less than 1.
+    """
+    from Computer_Vision.Image_Caption import get_captions
+
+    images = list(images)
+    if not images:
+        raise ValueError("No images to compare the caption backends on")
+    if repeats < 1:
+        raise ValueError(f"repeats must be at least 1, got {repeats}")
+    backends = list(dict.fromkeys(backends))
+    report = {}
+    reference = None
+    for name in ["eager"] + [b for b in backends if b != "eager"]:
+        try:
+            measured = measure_backend(
+                lambda: load_caption_backend(name),
+                lambda components: list(get_captions(*components, images, **generation)),
+                # A reference-only eager run needs no timing passes beyond one.
+                repeats=repeats if name in backends else 1)
+        except Exception as e:
+            report[name] = {"error": str(e)}
+            continue
+
+        captions = measured["outputs"]
+        latencies = [seconds / len(images) for seconds in measured["run_seconds"]]
+        if name == "eager":
+            reference = captions
+            if name not in backends:
+                continue
+        entry = {
+            "load_seconds": measured["load_seconds"],
+            "latency_ms_mean": 1000 * sum(latencies) / len(latencies),
+            "latency_ms_min": 1000 * min(latencies),
+            "rss_delta_mb": measured["rss_delta_mb"],
+            "captions": captions,
+        }
+        if reference is not None:
+            entry["exact_match"] = sum(a == b for a, b in zip(captions, reference)) / len(captions)
+            entry["token_jaccard"] = sum(_token_jaccard(a, b) for a, b in zip(captions, reference)) / len(captions)
+        report[name] = entry
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare captioner inference backends.")
+    parser.add_argument("images", nargs="*", help="Image files, folders or glob patterns")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--export-only", action="store_true", help="Only export the ONNX model")
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    args = parser.parse_args(argv)
+
+    if args.export_only:
+        print(export_onnx())
+        return
+    if not args.images:
+        parser.error("images are required unless --export-only is given")
+    if args.repeats < 1:
+        parser.error("--repeats must be at least 1")
+
+    paths = []
+    for pattern in args.images:
+        if os.path.isdir(pattern):
+            paths += sorted(glob.glob(os.path.join(pattern, "*.*")))
+        else:
+            paths += sorted(glob.glob(pattern))
+    paths = [p for p in paths if p.lower().endswith((".jpg", ".jpeg", ".png"))]
+    if not paths:
+        parser.error(f"no .jpg/.jpeg/.png images found in: {' '.join(args.images)}")
+
+    report = compare_caption_backends(paths, backends=args.backends, repeats=args.repeats)
+    for name, entry in report.items():
+        if "error" in entry:
+            print(f"{name:6s} error: {entry['error']}")
+            continue
+        rss = entry["rss_delta_mb"]
+        print(f"{name:6s} load {entry['load_seconds']:.1f}s  "
+              f"latency {entry['latency_ms_mean']:.0f} ms/img  "
+              f"rss +{rss if rss is not None else float('nan'):.0f} MB  "
+              f"exact {entry.get('exact_match', float('nan')):.2f}  "
+              f"jaccard {entry.get('token_jaccard', float('nan')):.2f}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
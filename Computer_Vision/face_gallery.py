@@ -0,0 +1,284 @@
+import os
+import json
+import hashlib
+import threading
+import cv2
+import numpy as np
+from Computer_Vision.face_index import FaceIndex, l2_normalize
+from Computer_Vision.frames import bgr_to_rgb
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+GALLERY_FILENAME = "gallery.npz"
+
+
+def file_sha1(path, chunk_size=1 << 16):
+    """Return the SHA-1 hex digest of a file's contents."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_labels(labels_path):
+    """Load the name -> label mapping from labels.json, or an empty dict."""
+    if labels_path and os.path.exists(labels_path):
+        with open(labels_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+class FaceGallery:
+    """
+    On-disk store of the known-face embeddings for a family folder.
+
+    Each entry keeps the source filename, the person's name (filename without
+    extension), its label from labels.json, the face embedding and the
+    mtime/size/SHA-1 of the source file. `sync` only re-embeds files that were
+    added or changed since the last call and drops entries for deleted files,
+    so the cost of a recognition request no longer grows with the gallery.
+
+    Args:
+        family_folder (str): Folder containing the photos of known people.
+        labels_path (str, optional): Path to labels.json. Default is "labels.json".
+        store_path (str, optional): Where to keep the store. Defaults to
+            `<family_folder>/gallery.npz`.
+    """
+
+    def __init__(self, family_folder, labels_path="labels.json", store_path=None):
+        self.family_folder = family_folder
+        self.labels_path = labels_path
+        self.store_path = store_path or os.path.join(family_folder, GALLERY_FILENAME)
+        self._lock = threading.RLock()
+        self._entries = {}
+        self._skipped = {}
+        self._label_map = {}
+        self._labels_mtime = None
+        self._version = 0
+        self._index_cache = None
+        self.load()
+
+    # ------------------------------------------------------------------ #
+    # Persistence
+    # ------------------------------------------------------------------ #
+    def load(self):
+        """Load the store from disk, ignoring missing or unreadable files."""
+        with self._lock:
+            self._entries = {}
+            self._version += 1
+            if not os.path.exists(self.store_path):
+                return
+            try:
+                data = np.load(self.store_path, allow_pickle=False)
+                for i, filename in enumerate(data["files"]):
+                    self._entries[str(filename)] = {
+                        "name": str(data["names"][i]),
+                        "label": str(data["labels"][i]),
+                        "embedding": data["embeddings"][i].astype(np.float32),
+                        "mtime": float(data["mtimes"][i]),
+                        "size": int(data["sizes"][i]),
+                        "sha1": str(data["hashes"][i]),
+                    }
+            except Exception as e:
+                print(f"⚠ تعذر قراءة ملف الوجوه المخزنة {self.store_path}: {e}")
+                self._entries = {}
+
+    def save(self):
+        """Atomically write the store to disk."""
+        with self._lock:
+            self._version += 1
+            files = sorted(self._entries)
+            entries = [self._entries[f] for f in files]
+            if entries:
+                embeddings = np.stack([e["embedding"] for e in entries]).astype(np.float32)
+            else:
+                embeddings = np.zeros((0, 0), dtype=np.float32)
+            tmp_path = self.store_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                np.savez(
+                    f,
+                    files=np.array(files, dtype=str),
+                    names=np.array([e["name"] for e in entries], dtype=str),
+                    labels=np.array([e["label"] for e in entries], dtype=str),
+                    embeddings=embeddings,
+                    mtimes=np.array([e["mtime"] for e in entries], dtype=np.float64),
+                    sizes=np.array([e["size"] for e in entries], dtype=np.int64),
+                    hashes=np.array([e["sha1"] for e in entries], dtype=str),
+                )
+            os.replace(tmp_path, self.store_path)
+
+    # ------------------------------------------------------------------ #
+    # Incremental updates
+    # ------------------------------------------------------------------ #
+    def _refresh_labels(self):
+        """Re-read labels.json when it changed and relabel stored entries."""
+        mtime = os.path.getmtime(self.labels_path) if os.path.exists(self.labels_path) else None
+        if mtime == self._labels_mtime:
+            return False
+        self._labels_mtime = mtime
+        self._label_map = load_labels(self.labels_path)
+        changed = False
+        for entry in self._entries.values():
+            label = self._label_map.get(entry["name"], entry["name"])
+            if label != entry["label"]:
+                entry["label"] = label
+                changed = True
+        return changed
+
+    def _embed_file(self, app, img_path, img=None):
+        """Detect the first face in an image file and return its embedding."""
+        if img is None:
+            img = cv2.imread(img_path)
+            if img is None:
+                print(f"❌ تعذر تحميل الصورة من المسار: {img_path}")
+                return None
+        faces = app.get(bgr_to_rgb(img))
+        if not faces:
+            print(f"⚠ مفيش وجه واضح في {os.path.basename(img_path)}")
+            return None
+        return np.asarray(faces[0].embedding, dtype=np.float32)
+
+    def _make_entry(self, filename, embedding, stat, sha1):
+        name = os.path.splitext(filename)[0]
+        return {
+            "name": name,
+            "label": self._label_map.get(name, name),
+            "embedding": embedding,
+            "mtime": stat.st_mtime,
+            "size": stat.st_size,
+            "sha1": sha1,
+        }
+
+    def sync(self, app):
+        """
+        Bring the store up to date with the family folder.
+
+        Files whose mtime and size are unchanged are trusted as-is; otherwise the
+        content hash decides whether the face has to be re-embedded. Entries for
+        deleted files are dropped. The store is saved only when something changed.
+
+        Args:
+            app (FaceRecognizer): Recognizer (or prepared FaceAnalysis app)
+                used for new embeddings.
+
+        Returns:
+            bool: True if the store was modified.
+        """
+        with self._lock:
+            changed = self._refresh_labels()
+            present = set()
+
+            for filename in sorted(os.listdir(self.family_folder)):
+                if not filename.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                present.add(filename)
+                img_path = os.path.join(self.family_folder, filename)
+                stat = os.stat(img_path)
+                entry = self._entries.get(filename)
+                if entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+                    continue
+                if self._skipped.get(filename) == (stat.st_mtime, stat.st_size):
+                    continue
+
+                sha1 = file_sha1(img_path)
+                if entry and entry["sha1"] == sha1:
+                    entry["mtime"] = stat.st_mtime
+                    entry["size"] = stat.st_size
+                    changed = True
+                    continue
+
+                embedding = self._embed_file(app, img_path)
+                if embedding is None:
+                    # Remember photos without a usable face so they are not
+                    # re-read on every call until they change again.
+                    self._skipped[filename] = (stat.st_mtime, stat.st_size)
+                    if self._entries.pop(filename, None) is not None:
+                        changed = True
+                    continue
+                self._skipped.pop(filename, None)
+                self._entries[filename] = self._make_entry(filename, embedding, stat, sha1)
+                changed = True
+
+            for filename in list(self._entries):
+                if filename not in present:
+                    del self._entries[filename]
+                    changed = True
+
+            if changed:
+                self.save()
+            return changed
+
+    def add(self, img_path, app, img=None):
+        """
+        Embed a newly enrolled photo and append it to the store right away.
+
+        Args:
+            img_path (str): Path of the photo inside the family folder.
+            app (FaceRecognizer): Recognizer (or prepared FaceAnalysis app).
+            img (numpy.ndarray, optional): The BGR frame that was written to
+                `img_path`, to avoid reading it back from disk.
+
+        Returns:
+            bool: True if a face was found and the store was updated.
+        """
+        with self._lock:
+            self._refresh_labels()
+            embedding = self._embed_file(app, img_path, img=img)
+            if embedding is None:
+                return False
+            filename = os.path.basename(img_path)
+            self._entries[filename] = self._make_entry(
+                filename, embedding, os.stat(img_path), file_sha1(img_path))
+            self.save()
+            return True
+
+    # ------------------------------------------------------------------ #
+    # Accessors
+    # ------------------------------------------------------------------ #
+    def __len__(self):
+        return len(self._entries)
+
+    def items(self):
+        """Return (names, labels, embeddings) for all stored faces."""
+        with self._lock:
+            files = sorted(self._entries)
+            names = [self._entries[f]["name"] for f in files]
+            labels = [self._entries[f]["label"] for f in files]
+            embeddings = [self._entries[f]["embedding"] for f in files]
+            return names, labels, embeddings
+
+    def index(self, use_ann=None):
+        """
+        Return the gallery as a search index over L2-normalized embeddings.
+
+        The normalized matrix and index are rebuilt only after the store changed.
+
+        Args:
+            use_ann (bool, optional): Passed to FaceIndex.
+
+        Returns:
+            tuple: (names, labels, FaceIndex)
+        """
+        with self._lock:
+            key = (self._version, use_ann)
+            if self._index_cache is None or self._index_cache[0] != key:
+                names, labels, embeddings = self.items()
+                matrix = l2_normalize(embeddings) if embeddings else np.zeros((0, 512), dtype=np.float32)
+                self._index_cache = (key, names, labels, FaceIndex(matrix, use_ann=use_ann))
+            _, names, labels, index = self._index_cache
+            return names, labels, index
+
+
+_galleries = {}
+_galleries_lock = threading.Lock()
+
+
+def get_gallery(family_folder, labels_path="labels.json"):
+    """Return the shared FaceGallery for a family folder, loading it once."""
+    key = (os.path.abspath(family_folder), os.path.abspath(labels_path))
+    with _galleries_lock:
+        gallery = _galleries.get(key)
+        if gallery is None:
+            gallery = FaceGallery(family_folder, labels_path=labels_path)
+            _galleries[key] = gallery
+        return gallery
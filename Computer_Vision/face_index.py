@@ -0,0 +1,78 @@
+import numpy as np
+
+try:
+    import faiss  # optional, only needed for the approximate index
+except ImportError:
+    faiss = None
+
+# Galleries at least this large use the approximate index when faiss is installed.
+ANN_MIN_SIZE = 2000
+
+
+def l2_normalize(vectors):
+    """Return row-wise L2-normalized float32 vectors (zero rows stay zero)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class FaceIndex:
+    """
+    Nearest-neighbour search over a pre-normalized gallery matrix.
+
+    Small galleries are searched exactly with one matrix product. Large ones
+    use a faiss HNSW inner-product index when faiss is available.
+
+    Args:
+        matrix (numpy.ndarray): (N, D) L2-normalized gallery embeddings.
+        use_ann (bool, optional): Force (True) or disable (False) the approximate
+            index. By default it is used for galleries of `ANN_MIN_SIZE` or more.
+    """
+
+    def __init__(self, matrix, use_ann=None):
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        if use_ann is None:
+            use_ann = len(self.matrix) >= ANN_MIN_SIZE
+        if use_ann and faiss is None:
+            print("⚠ مكتبة faiss غير مثبتة، سيتم استخدام البحث الكامل.")
+            use_ann = False
+        self.use_ann = bool(use_ann) and len(self.matrix) > 0
+        self._ann = None
+        if self.use_ann:
+            self._ann = faiss.IndexHNSWFlat(self.matrix.shape[1], 32, faiss.METRIC_INNER_PRODUCT)
+            self._ann.add(self.matrix)
+
+    def __len__(self):
+        return len(self.matrix)
+
+    def search(self, queries, k):
+        """
+        Find the k most similar gallery rows for each query.
+
+        Args:
+            queries (numpy.ndarray): (F, D) L2-normalized query embeddings.
+            k (int): Number of neighbours per query.
+
+        Returns:
+            tuple: (scores, indices), both (F, k); indices are -1 where fewer
+            than k neighbours exist.
+        """
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        k = min(k, len(self.matrix))
+        if k == 0 or len(queries) == 0:
+            return (np.zeros((len(queries), 0), dtype=np.float32),
+                    np.zeros((len(queries), 0), dtype=np.int64))
+        if self._ann is not None:
+            return self._ann.search(queries, k)
+
+        sims = queries @ self.matrix.T
+        if k < sims.shape[1]:
+            idx = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        else:
+            idx = np.tile(np.arange(sims.shape[1]), (len(sims), 1))
+        scores = np.take_along_axis(sims, idx, axis=1)
+        order = np.argsort(-scores, axis=1)
+        return np.take_along_axis(scores, order, axis=1), np.take_along_axis(idx, order, axis=1)
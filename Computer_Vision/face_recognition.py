@@ -1,76 +1,216 @@
 import os
+import time
 import cv2
-import json
 import numpy as np
 from numpy.linalg import norm
-from insightface.app import FaceAnalysis
+from Computer_Vision.face_gallery import get_gallery
+from Computer_Vision.face_index import l2_normalize
+from Computer_Vision.frames import to_rgb_array
+from Computer_Vision.face_recognizer import get_recognizer
+from Core.model_registry import registry
+from Core.inference_client import get_client
+from Core import tracing
 
 def cosine_similarity(a, b):
     return np.dot(a, b) / (norm(a) * norm(b))
 
 
-def check_family_in_image(family_folder,image_path, labels_path="labels.json", threshold=0.5):
+def _best_per_label(queries, labels, index, top_k):
+    """Return, for every query, a dict of the best gallery score of each label."""
+    if not index.use_ann:
+        # Exact path: score against the whole gallery, then keep each person's best row.
+        names, rows = np.unique(np.asarray(labels, dtype=object), return_inverse=True)
+        best = np.full((len(names), len(queries)), -np.inf, dtype=np.float32)
+        np.maximum.at(best, rows, (queries @ index.matrix.T).T)
+        return [dict(zip(names.tolist(), column.tolist())) for column in best.T]
+
+    # Approximate path: widen the search until every face sees a runner-up
+    # person, so several photos of one person cannot hide the second best.
+    k = top_k
+    while True:
+        scores, indices = index.search(queries, k)
+        candidates = []
+        for face_scores, face_rows in zip(scores, indices):
+            per_label = {}
+            for score, row in zip(face_scores, face_rows):
+                if row < 0:
+                    continue
+                label = labels[row]
+                if score > per_label.get(label, -1.0):
+                    per_label[label] = float(score)
+            candidates.append(per_label)
+        if k >= len(index) or all(len(per_label) >= 2 for per_label in candidates):
+            return candidates
+        k = min(2 * k, len(index))
+
+
+def match_faces(face_embeddings, labels, index, threshold=0.5, margin=0.05, top_k=10):
     """
-    Verifies which known people from a folder are present in the group image.
+    Assign detected faces to known people with one batched similarity search.
+
+    Gallery rows that share a label are merged by taking their best score, so
+    the margin is always measured against the best *other* person.
+    Candidate (face, person) pairs are then assigned greedily from the highest
+    similarity down, so every face gets at most one person and every person at
+    most one face. An assignment is kept only if it clears `threshold` and
+    beats the face's best alternative person by at least `margin`.
 
     Args:
-        reference_img_folder (str): Folder path containing images of known individuals.
-        group_img_path (str): Path to the group image to verify against.
-        model_name (str): DeepFace model to use for verification (default is 'ArcFace').
+        face_embeddings (numpy.ndarray): (F, D) embeddings of the detected faces.
+        labels (list): Label of every gallery row in `index`.
+        index (FaceIndex): Search index over the normalized gallery.
+        threshold (float, optional): Minimum cosine similarity. Default is 0.5.
+        margin (float, optional): Minimum lead over the runner-up. Default is 0.05.
+        top_k (int, optional): Initial neighbours per face on the approximate
+            (faiss) path; doubled until a second person is found. The exact
+            path scores the whole gallery. Default is 10.
 
     Returns:
-        list: A list of strings describing the friends found, e.g., ['رحاب - صديق مبصر', ...]
+        list: One (label or None, score, margin) tuple per face.
     """
-    app = FaceAnalysis(name="buffalo_l", providers=["CPUExecutionProvider"]) ## using CPU
-    # app = FaceAnalysis(name="buffalo_l", providers=["CUDAExecutionProvider"]) ## using GPU
-    app.prepare(ctx_id=0)
+    if len(face_embeddings) == 0:
+        return []
+    queries = l2_normalize(face_embeddings)
+    if len(index) == 0:
+        return [(None, 0.0, 0.0) for _ in queries]
+    candidates = _best_per_label(queries, labels, index, top_k)
+
+    pairs = sorted(
+        ((score, face_i, label) for face_i, per_label in enumerate(candidates)
+         for label, score in per_label.items()),
+        reverse=True,
+    )
+    results = [(None, max(c.values(), default=0.0), 0.0) for c in candidates]
+    used_faces, used_labels = set(), set()
+    for score, face_i, label in pairs:
+        if face_i in used_faces or label in used_labels or score <= threshold:
+            continue
+        others = [s for l, s in candidates[face_i].items() if l != label]
+        lead = score - max(others) if others else score
+        if lead < margin:
+            continue
+        results[face_i] = (label, score, lead)
+        used_faces.add(face_i)
+        used_labels.add(label)
+    return results
+
+
+def recognize_family_faces(family_folder, image, labels_path="labels.json", threshold=0.5,
+                           margin=0.05, recognizer=None, use_ann=None, timings=None):
+    """
+    Detect every face in an image and identify the known people among them.
 
+    Args:
+        family_folder (str): Folder containing images of known individuals.
+        image (str or numpy.ndarray): Path to the image to check, or an RGB
+            frame already in memory.
+        labels_path (str, optional): Path to labels.json. Default is "labels.json".
+        threshold (float, optional): Minimum cosine similarity. Default is 0.5.
+        margin (float, optional): Minimum lead of the best match over the
+            runner-up. Default is 0.05.
+        recognizer (FaceRecognizer, optional): Recognizer to use. Defaults to the
+            shared one from `get_recognizer()`, kept loaded by the model registry
+            while this call runs.
+        use_ann (bool, optional): Use the approximate nearest-neighbour index.
+            By default it is chosen from the gallery size.
+        timings (dict, optional): If given, filled with the "detect" and
+            "match" durations in seconds. Not filled when recognition runs on
+            the inference server (MOBSIR_INFERENCE_URL).
 
-    img = cv2.imread(image_path)
+    Returns:
+        list: One dict per detected face with keys "bbox" ([x1, y1, x2, y2]),
+        "det_score", "label" (None if unknown), "score" and "margin".
+    """
+    client = get_client() if recognizer is None else None
+    if client is not None:
+        return client.recognize(image, family_folder, labels_path, threshold=threshold, margin=margin)
+    if recognizer is None:
+        with registry.use("face_recognizer"):
+            return recognize_family_faces(family_folder, image, labels_path, threshold, margin,
+                                          recognizer=get_recognizer(), use_ann=use_ann, timings=timings)
+    app = recognizer
+
+    img = to_rgb_array(image)
     if img is None:
-        print(f"تعذر تحميل الصورة من المسار: {image_path}")
+        print(f"تعذر تحميل الصورة من المسار: {image}")
         return []
-    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    detect_start = time.perf_counter()
     detected_faces = app.get(img)
+    detect_seconds = time.perf_counter() - detect_start
+    tracing.record_span("face_detect", detect_seconds, faces=len(detected_faces))
+    if timings is not None:
+        timings["detect"] = detect_seconds
 
     if not detected_faces:
         print("❌مفيش وجوه واضحة في الصورة.")
         return []
 
-    known_embeddings = []
-    known_names = []
-
-    for filename in os.listdir(family_folder):
-        if filename.lower().endswith((".jpg", ".jpeg", ".png")):
-            img_path = os.path.join(family_folder, filename)
-            known_img = cv2.imread(img_path)
-            if known_img is None:
-                 print(f"❌ تعذر تحميل الصورة من المسار: {img_path}")
-                 continue
-            known_img = cv2.cvtColor(known_img, cv2.COLOR_BGR2RGB)
-            faces = app.get(known_img)
-            if not faces:
-                print(f"⚠ مفيش وجه واضح في {filename}")
-                continue
-            known_embeddings.append(faces[0].embedding)
-            known_names.append(os.path.splitext(filename)[0])
-
-  
-    if os.path.exists(labels_path):
-        with open(labels_path, "r", encoding="utf-8") as f:
-            label_map = json.load(f)
-    else:
-        label_map = {}
-
-    found_people = set()
-    for detected_face in detected_faces:
-        for known_name, known_emb in zip(known_names, known_embeddings):
-            sim = cosine_similarity(detected_face.embedding, known_emb)
-            if sim > threshold:
-                label = label_map.get(known_name, known_name)
-                found_people.add(label)
-
-    return list(found_people)
+    match_start = time.perf_counter()
+    # Known faces come from the on-disk gallery; only new or changed photos
+    # in the family folder are embedded again.
+    gallery = get_gallery(family_folder, labels_path)
+    gallery.sync(app)
+    _, known_labels, index = gallery.index(use_ann=use_ann)
+
+    embeddings = np.stack([face.embedding for face in detected_faces])
+    matches = match_faces(embeddings, known_labels, index, threshold=threshold, margin=margin)
+    match_seconds = time.perf_counter() - match_start
+    tracing.record_span("face_match", match_seconds, faces=len(detected_faces), gallery=len(known_labels))
+    if timings is not None:
+        timings["match"] = match_seconds
+
+    results = []
+    for face, (label, score, lead) in zip(detected_faces, matches):
+        results.append({
+            "bbox": [int(round(v)) for v in face.bbox],
+            "det_score": float(face.det_score),
+            "label": label,
+            "score": score,
+            "margin": lead,
+        })
+    return results
+
+
+def check_family_in_image(family_folder,image, labels_path="labels.json", threshold=0.5, recognizer=None):
+    """
+    Verifies which known people from a folder are present in the group image.
+
+    Thin wrapper around `recognize_family_faces` for callers that only need
+    the names; use that function for per-face scores and bounding boxes.
+
+    Args:
+        family_folder (str): Folder path containing images of known individuals.
+        image (str or numpy.ndarray): Path to the group image to verify against,
+            or an RGB frame already in memory.
+        labels_path (str, optional): Path to labels.json. Default is "labels.json".
+        threshold (float, optional): Minimum cosine similarity. Default is 0.5.
+        recognizer (FaceRecognizer, optional): Recognizer to use. Defaults to the
+            shared one from `get_recognizer()`, which keeps its models loaded.
+
+    Returns:
+        list: A list of strings describing the friends found, e.g., ['رحاب - صديق مبصر', ...]
+    """
+    faces = recognize_family_faces(family_folder, image, labels_path=labels_path,
+                                   threshold=threshold, recognizer=recognizer)
+    return [face["label"] for face in faces if face["label"]]
+
+
+def enroll_family_image(img_path, frame=None, family_folder="family", labels_path="labels.json"):
+    """
+    Add a freshly captured family photo to the embedding gallery.
+
+    Args:
+        img_path (str): Path where the photo was saved inside the family folder.
+        frame (numpy.ndarray, optional): The BGR frame that was saved, so the
+            photo does not have to be decoded again.
+        family_folder (str): Family folder the gallery belongs to.
+        labels_path (str): Path to labels.json.
+
+    Returns:
+        bool: True if a face was found and stored.
+    """
+    with registry.use("face_recognizer"):
+        return get_gallery(family_folder, labels_path).add(img_path, get_recognizer(), img=frame)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,171 @@
+import threading
+from Core.model_registry import registry
+from Core.inference_client import RemoteModel, remote_model
+
+DEFAULT_MODEL_NAME = "buffalo_l"
+DEFAULT_PROVIDERS = ["CPUExecutionProvider"]  ## using CPU
+# DEFAULT_PROVIDERS = ["CUDAExecutionProvider", "CPUExecutionProvider"]  ## using GPU
+DEFAULT_DET_SIZE = (640, 640)
+
+
+class FaceRecognizer:
+    """
+    Long-lived wrapper around insightface's FaceAnalysis.
+
+    The ONNX sessions are created once on first use (or by `warmup_async` in
+    the background at startup) and reused by every later call until `close`
+    or `reload` is called. The shared recognizer from `get_recognizer` loads
+    them through the model registry ("face_recognizer"), so they count
+    against its memory budget and an eviction really frees them.
+
+    Args:
+        model_name (str, optional): insightface model pack. Default is "buffalo_l".
+        providers (list, optional): ONNX Runtime execution providers.
+        det_size (tuple, optional): Detector input size. Default is (640, 640).
+        ctx_id (int, optional): Device id passed to `prepare`. Default is 0.
+    """
+
+    def __init__(self, model_name=DEFAULT_MODEL_NAME, providers=None, det_size=DEFAULT_DET_SIZE, ctx_id=0):
+        self.model_name = model_name
+        self.providers = list(providers or DEFAULT_PROVIDERS)
+        self.det_size = tuple(det_size)
+        self.ctx_id = ctx_id
+        self._app = None
+        self._lock = threading.Lock()
+        self._warmup_thread = None
+        # Set on the shared recognizer by get_recognizer().
+        self._registry_name = None
+
+    @property
+    def is_loaded(self):
+        return self._app is not None
+
+    def load(self):
+        """Return the prepared FaceAnalysis app, creating it if it is not loaded yet."""
+        if self._registry_name is not None:
+            app = registry.get(self._registry_name)
+            if not isinstance(app, RemoteModel):
+                return app
+            # The registry entry stands for the inference server's models, but
+            # detection for tracking still runs here.
+        return self._load_app()
+
+    def _load_app(self):
+        if self._app is not None:
+            return self._app
+        with self._lock:
+            if self._app is None:
+                # Imported lazily so importing this module does not load onnxruntime.
+                from insightface.app import FaceAnalysis
+                app = FaceAnalysis(name=self.model_name, providers=self.providers)
+                app.prepare(ctx_id=self.ctx_id, det_size=self.det_size)
+                self._app = app
+        return self._app
+
+    @property
+    def app(self):
+        """The prepared FaceAnalysis app, loading it on first access."""
+        return self.load()
+
+    def get(self, img):
+        """Detect faces and compute their embeddings for an RGB image."""
+        return self.load().get(img)
+
+    def detect(self, img, max_num=0):
+        """
+        Run only the face detector on an RGB image.
+
+        Unlike `get`, no landmark, attribute or recognition model runs, so this
+        is the cheap per-frame call for tracking.
+
+        Returns:
+            list: insightface Face objects with bbox, kps and det_score (no embedding).
+        """
+        from insightface.app.common import Face
+        app = self.load()
+        bboxes, kpss = app.det_model.detect(img, max_num=max_num, metric="default")
+        faces = []
+        for i in range(bboxes.shape[0]):
+            kps = kpss[i] if kpss is not None else None
+            faces.append(Face(bbox=bboxes[i, 0:4], kps=kps, det_score=bboxes[i, 4]))
+        return faces
+
+    def embed(self, img, face):
+        """
+        Compute the ArcFace embedding of a face returned by `detect`.
+
+        The embedding is stored on the face (`face.embedding`) and returned.
+        """
+        self.load().models["recognition"].get(img, face)
+        return face.embedding
+
+    def warmup_async(self):
+        """
+        Load the models on a background thread.
+
+        Returns:
+            threading.Thread: The warm-up thread (already started).
+        """
+        if self._warmup_thread is None or not self._warmup_thread.is_alive():
+            self._warmup_thread = threading.Thread(target=self._warmup, name="face-warmup", daemon=True)
+            self._warmup_thread.start()
+        return self._warmup_thread
+
+    def _warmup(self):
+        try:
+            self.load()
+        except Exception as e:
+            print(f"⚠ تعذر تحميل نموذج التعرف على الوجوه: {e}")
+
+    def close(self):
+        """
+        Release the ONNX sessions. The next call loads them again.
+
+        For the shared recognizer use `registry.unload("face_recognizer")`,
+        which calls this.
+        """
+        with self._lock:
+            self._app = None
+
+    def reload(self, providers=None, det_size=None):
+        """
+        Drop the current sessions and load them again, optionally with new settings.
+
+        Args:
+            providers (list, optional): New execution providers.
+            det_size (tuple, optional): New detector input size.
+        """
+        with self._lock:
+            if providers is not None:
+                self.providers = list(providers)
+            if det_size is not None:
+                self.det_size = tuple(det_size)
+            self._app = None
+        if self._registry_name is not None:
+            registry.unload(self._registry_name)
+        return self.load()
+
+
+_recognizer = None
+_recognizer_lock = threading.Lock()
+
+
+def get_recognizer(**kwargs):
+    """
+    Return the process-wide FaceRecognizer, creating it on the first call.
+
+    Keyword arguments are only used when the recognizer is created; use
+    `reload` to change the settings of an existing one.
+    """
+    global _recognizer
+    with _recognizer_lock:
+        if _recognizer is None:
+            _recognizer = FaceRecognizer(**kwargs)
+            _recognizer._registry_name = "face_recognizer"
+        return _recognizer
+
+
+# Lets the model registry warm the shared recognizer up with the other models.
+# With MOBSIR_INFERENCE_URL set the server holds the models, so nothing is loaded here.
+registry.register("face_recognizer", lambda: remote_model("recognize") or get_recognizer()._load_app(),
+                  unloader=lambda app: get_recognizer().close())
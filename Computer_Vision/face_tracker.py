@@ -0,0 +1,254 @@
+import time
+import itertools
+import numpy as np
+from Core import tracing
+from Core.model_registry import registry
+from Computer_Vision.face_gallery import get_gallery
+from Computer_Vision.face_index import l2_normalize
+from Computer_Vision.face_recognition import match_faces
+from Computer_Vision.face_recognizer import get_recognizer
+from Computer_Vision.frames import to_rgb_array
+
+
+def iou(a, b):
+    """Intersection over union of two [x1, y1, x2, y2] boxes."""
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+class FaceTrack:
+    """One person followed across frames, with the identity found for them."""
+
+    def __init__(self, track_id, bbox, det_score, now):
+        self.id = track_id
+        self.bbox = bbox
+        self.det_score = det_score
+        self.label = None
+        self.score = 0.0
+        self.margin = 0.0
+        self.embedding = None
+        self.hits = 1
+        self.misses = 0
+        self.first_seen = now
+        self.last_seen = now
+        self.frames_since_embed = None
+
+    def as_dict(self):
+        return {
+            "track_id": self.id,
+            "bbox": [int(round(v)) for v in self.bbox],
+            "det_score": float(self.det_score),
+            "label": self.label,
+            "score": self.score,
+            "margin": self.margin,
+            "hits": self.hits,
+        }
+
+
+class FaceTracker:
+    """
+    Follows faces across frames so identity matching runs once per person.
+
+    Every `update` runs only the face detector. Detections are linked to
+    existing tracks by bounding-box overlap (IoU); the ArcFace embedding and
+    the gallery match run only for new tracks and for tracks that are still
+    unknown or matched with a low score (those are retried every
+    `retry_every` frames). A new face whose embedding is close to a track
+    lost in the last `lost_seconds` takes over that track, so someone who is
+    briefly hidden keeps their identity.
+
+    Args:
+        family_folder (str, optional): Known faces folder. Default is "family".
+        labels_path (str, optional): Path to labels.json. Default is "labels.json".
+        recognizer (FaceRecognizer, optional): Defaults to the shared recognizer.
+        iou_threshold (float, optional): Minimum overlap to continue a track. Default is 0.3.
+        max_misses (int, optional): Frames a track survives without a detection. Default is 3.
+        confident_score (float, optional): Match score above which a name is final. Default is 0.6.
+        retry_every (int, optional): Frames between re-identification attempts
+            for unknown or low-confidence tracks. Default is 5.
+        lost_seconds (float, optional): How long a lost track can be revived. Default is 10.
+        reid_similarity (float, optional): Embedding similarity needed to revive a
+            lost track. Default is 0.5.
+        announce_cooldown (float, optional): Seconds before a person who left is
+            announced again. Default is 300.
+        threshold (float, optional): Gallery match threshold. Default is 0.5.
+        margin (float, optional): Gallery match margin. Default is 0.05.
+    """
+
+    def __init__(self, family_folder="family", labels_path="labels.json", recognizer=None, iou_threshold=0.3,
+                 max_misses=3, confident_score=0.6, retry_every=5, lost_seconds=10.0, reid_similarity=0.5,
+                 announce_cooldown=300.0, threshold=0.5, margin=0.05):
+        self.family_folder = family_folder
+        self.labels_path = labels_path
+        self.recognizer = recognizer
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.confident_score = confident_score
+        self.retry_every = retry_every
+        self.lost_seconds = lost_seconds
+        self.reid_similarity = reid_similarity
+        self.announce_cooldown = announce_cooldown
+        self.threshold = threshold
+        self.margin = margin
+        self.tracks = []
+        self._lost = []
+        self._ids = itertools.count(1)
+        self._announced = {}
+        self.stats = {"frames": 0, "detections": 0, "embeddings": 0, "revived": 0}
+
+    def _needs_identity(self, track):
+        if track.frames_since_embed is None:
+            return True
+        if track.label is not None and track.score >= self.confident_score:
+            return False
+        return track.frames_since_embed >= self.retry_every
+
+    def _associate(self, faces):
+        """Greedy IoU assignment; returns {face_index: track} for the matched pairs."""
+        pairs = sorted(
+            ((iou(face.bbox, track.bbox), f, t) for f, face in enumerate(faces)
+             for t, track in enumerate(self.tracks)),
+            reverse=True,
+        )
+        matched, used_tracks = {}, set()
+        for overlap, f, t in pairs:
+            if overlap < self.iou_threshold:
+                break
+            if f in matched or t in used_tracks:
+                continue
+            matched[f] = self.tracks[t]
+            used_tracks.add(t)
+        return matched
+
+    def _revive(self, embedding, now):
+        """Return a recently lost track whose embedding matches, removing it from the lost list."""
+        self._lost = [t for t in self._lost if now - t.last_seen <= self.lost_seconds]
+        best, best_score = None, self.reid_similarity
+        for track in self._lost:
+            if track.embedding is None:
+                continue
+            score = float(np.dot(track.embedding, embedding))
+            if score > best_score:
+                best, best_score = track, score
+        if best is not None:
+            self._lost.remove(best)
+            self.stats["revived"] += 1
+        return best
+
+    def update(self, image, now=None):
+        """
+        Process one frame.
+
+        Args:
+            image (str or numpy.ndarray): Image path or RGB frame.
+            now (float, optional): Timestamp (time.monotonic) of the frame.
+
+        Returns:
+            tuple: (tracks, arrivals). `tracks` is a list of dicts (track_id, bbox,
+            det_score, label, score, margin, hits) for the faces in this frame;
+            `arrivals` lists family members who just appeared and have not been
+            announced within `announce_cooldown`.
+        """
+        now = time.monotonic() if now is None else now
+        img = to_rgb_array(image)
+        if img is None:
+            return [], []
+        if self.recognizer is not None:
+            return self._update(self.recognizer, img, now)
+        # The shared recognizer stays loaded (not evicted) while the frame is processed.
+        with registry.use("face_recognizer"):
+            return self._update(get_recognizer(), img, now)
+
+    def _update(self, app, img, now):
+        self.stats["frames"] += 1
+
+        with tracing.span("face_track_detect"):
+            faces = app.detect(img)
+        self.stats["detections"] += len(faces)
+        matched = self._associate(faces)
+
+        current, to_identify = [], []
+        for f, face in enumerate(faces):
+            track = matched.get(f)
+            if track is None:
+                track = FaceTrack(None, face.bbox, face.det_score, now)
+            else:
+                track.bbox, track.det_score = face.bbox, face.det_score
+                track.hits += 1
+                track.misses = 0
+                track.last_seen = now
+                track.frames_since_embed += 1
+            current.append(track)
+            if self._needs_identity(track):
+                to_identify.append((track, face))
+
+        if to_identify:
+            with tracing.span("face_track_identify", faces=len(to_identify)):
+                self._identify(app, img, to_identify, now)
+
+        for track in current:
+            if track.id is None:
+                track.id = next(self._ids)
+
+        # Tracks that were not seen in this frame age out, then become revivable.
+        seen = {id(track) for track in current}
+        for track in self.tracks:
+            if id(track) in seen:
+                continue
+            track.misses += 1
+            if track.misses <= self.max_misses:
+                current.append(track)
+            else:
+                self._lost.append(track)
+        self.tracks = current
+
+        arrivals = []
+        for track in self.tracks:
+            if track.misses or track.label is None or track.score < self.threshold:
+                continue
+            last = self._announced.get(track.label)
+            if last is None or now - last > self.announce_cooldown:
+                arrivals.append(track.label)
+            self._announced[track.label] = now
+        arrivals = list(dict.fromkeys(arrivals))
+        visible = [track.as_dict() for track in self.tracks if not track.misses]
+        return visible, arrivals
+
+    def _identify(self, app, img, to_identify, now):
+        embeddings = []
+        for track, face in to_identify:
+            embeddings.append(app.embed(img, face))
+        self.stats["embeddings"] += len(embeddings)
+        normalized = l2_normalize(np.stack(embeddings))
+
+        gallery = get_gallery(self.family_folder, self.labels_path)
+        gallery.sync(app)
+        _, known_labels, index = gallery.index()
+        # Names already held by other confident tracks are not handed out twice.
+        taken = {t.label for t in self.tracks if t.label and t.score >= self.confident_score
+                 and all(t is not track for track, _ in to_identify)}
+        matches = match_faces(normalized, known_labels, index, threshold=self.threshold, margin=self.margin)
+
+        for (track, face), embedding, (label, score, lead) in zip(to_identify, normalized, matches):
+            if track.id is None:
+                revived = self._revive(embedding, now)
+                if revived is not None:
+                    track.id = revived.id
+                    track.first_seen = revived.first_seen
+                    if label is None and revived.label is not None:
+                        label, score, lead = revived.label, revived.score, revived.margin
+            if label in taken:
+                label = None
+            track.embedding = embedding
+            track.frames_since_embed = 0
+            if label is not None or track.label is None:
+                track.label, track.score, track.margin = label, score, lead
+
+    def reset(self):
+        """Forget every track and announcement."""
+        self.tracks = []
+        self._lost = []
+        self._announced = {}
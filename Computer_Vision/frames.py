@@ -0,0 +1,96 @@
+import os
+import queue
+import threading
+import cv2
+import numpy as np
+from PIL import Image
+from Core import tracing
+
+
+def bgr_to_rgb(frame):
+    """Convert an OpenCV BGR frame to RGB (the format the caption and face APIs take)."""
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+
+def to_rgb_array(image):
+    """
+    Return an RGB uint8 numpy array for a file path, a PIL image or an array.
+
+    Numpy arrays are assumed to already be RGB, so frames converted once with
+    `bgr_to_rgb` can be shared by captioning and face recognition without
+    another decode or color conversion.
+
+    Returns:
+        numpy.ndarray or None: The RGB image, or None if a file could not be read.
+    """
+    if isinstance(image, np.ndarray):
+        return image
+    if isinstance(image, Image.Image):
+        return np.asarray(image.convert("RGB"))
+    frame = cv2.imread(image)
+    if frame is None:
+        return None
+    return bgr_to_rgb(frame)
+
+
+class FrameArchiver:
+    """
+    Writes captured frames to disk on a background thread.
+
+    `archive` returns the destination path immediately, so the request that
+    captured the frame does not wait for the PNG encode.
+
+    Args:
+        max_pending (int, optional): Frames queued before new ones are dropped. Default is 8.
+    """
+
+    def __init__(self, max_pending=8):
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, name="frame-archiver", daemon=True)
+        self._thread.start()
+
+    def archive(self, frame_bgr, path):
+        """
+        Queue a BGR frame to be written to `path`.
+
+        Returns:
+            str or None: The path, or None if the queue is full and the frame was dropped.
+        """
+        try:
+            self._queue.put_nowait((frame_bgr, path))
+            tracing.set_gauge("queue_depth", self._queue.qsize(), queue="frame_archiver")
+            return path
+        except queue.Full:
+            tracing.incr("frames_dropped", queue="frame_archiver")
+            print(f"⚠ Archive queue full, skipping {path}")
+            return None
+
+    def flush(self):
+        """Block until every queued frame has been written."""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            frame, path = self._queue.get()
+            try:
+                folder = os.path.dirname(path)
+                if folder:
+                    os.makedirs(folder, exist_ok=True)
+                cv2.imwrite(path, frame)
+            except Exception as e:
+                print(f"⚠ Failed to archive {path}: {e}")
+            finally:
+                self._queue.task_done()
+
+
+_archiver = None
+_archiver_lock = threading.Lock()
+
+
+def get_archiver():
+    """Return the shared FrameArchiver."""
+    global _archiver
+    with _archiver_lock:
+        if _archiver is None:
+            _archiver = FrameArchiver()
+        return _archiver
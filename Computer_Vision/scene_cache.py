@@ -0,0 +1,137 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+import cv2
+import numpy as np
+
+DEFAULT_MAX_DISTANCE = 6
+DEFAULT_TTL = 60.0
+
+
+def dhash(frame, hash_size=8):
+    """
+    Difference hash of a frame: a 64-bit fingerprint that survives small changes.
+
+    The frame is reduced to a (hash_size + 1) x hash_size gray thumbnail and
+    each bit records whether a pixel is brighter than its right neighbour, so
+    sensor noise, compression and slight exposure changes flip few bits.
+
+    Args:
+        frame (numpy.ndarray): RGB or BGR frame (or a gray image).
+        hash_size (int, optional): Hash width/height in bits. Default is 8.
+
+    Returns:
+        int: The hash as an integer of hash_size * hash_size bits.
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY) if frame.ndim == 3 else frame
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming_distance(a, b):
+    """Number of differing bits between two hashes."""
+    return bin(a ^ b).count("1")
+
+
+class SceneCache:
+    """
+    Remembers recent scene descriptions keyed by a perceptual hash of the frame.
+
+    A frame whose hash is within `max_distance` bits of a cached one, and
+    younger than `ttl` seconds, is treated as the same scene, so its Arabic
+    description can be spoken again without re-running captioning, face
+    recognition and translation (the speech itself comes from the TTS cache).
+
+    Args:
+        max_distance (int, optional): Largest Hamming distance (of 64 bits)
+            counted as the same scene. Default is 6.
+        ttl (float, optional): Seconds a description stays valid. Default is 60.
+        max_entries (int, optional): Scenes kept, least recently used dropped first. Default is 16.
+    """
+
+    def __init__(self, max_distance=DEFAULT_MAX_DISTANCE, ttl=DEFAULT_TTL, max_entries=16):
+        self.max_distance = max_distance
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, frame):
+        """
+        Return the cached result for a near-identical recent frame.
+
+        Returns:
+            dict or None: A copy of the stored result with "scene_distance" and
+            "scene_age" added, or None on a miss.
+        """
+        frame_hash = dhash(frame)
+        now = time.monotonic()
+        with self._lock:
+            best = None
+            for key, (stored_at, result) in list(self._entries.items()):
+                if now - stored_at > self.ttl:
+                    del self._entries[key]
+                    continue
+                distance = hamming_distance(frame_hash, key)
+                if distance <= self.max_distance and (best is None or distance < best[0]):
+                    best = (distance, key, stored_at, result)
+            if best is None:
+                self.misses += 1
+                return None
+            distance, key, stored_at, result = best
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(result, scene_distance=distance, scene_age=now - stored_at)
+
+    def store(self, frame, result):
+        """Remember the result (caption, translation, description, family, ...) for a frame."""
+        with self._lock:
+            key = dhash(frame)
+            self._entries[key] = (time.monotonic(), dict(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Forget every cached scene."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return hit/miss counters and the number of cached scenes."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+            }
+
+
+_scene_cache = None
+_scene_cache_lock = threading.Lock()
+
+
+def get_scene_cache():
+    """
+    Return the shared SceneCache, creating it on first use.
+
+    The radius and TTL come from MOBSIR_SCENE_MAX_DISTANCE and MOBSIR_SCENE_TTL
+    (a TTL of 0 turns the cache off).
+    """
+    global _scene_cache
+    with _scene_cache_lock:
+        if _scene_cache is None:
+            try:
+                max_distance = int(os.environ.get("MOBSIR_SCENE_MAX_DISTANCE", DEFAULT_MAX_DISTANCE))
+                ttl = float(os.environ.get("MOBSIR_SCENE_TTL", DEFAULT_TTL))
+            except ValueError as e:
+                print(f"⚠ Invalid scene cache setting: {e}")
+                max_distance, ttl = DEFAULT_MAX_DISTANCE, DEFAULT_TTL
+            _scene_cache = SceneCache(max_distance=max_distance, ttl=ttl)
+        return _scene_cache
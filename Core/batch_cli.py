@@ -0,0 +1,308 @@
+"""
+Headless batch processing of image folders: caption, translation and family faces.
+
+Usage:
+    python -m Core.batch_cli captured_images/ --output captions.jsonl
+    python -m Core.batch_cli "photos/*.jpg" --output out.jsonl --batch-size 16 --threads 4
+    python -m Core.batch_cli captured_images/ --output out.jsonl --processes 2
+
+One JSON record is appended (and flushed) per image, so an interrupted run
+continues where it stopped when it is started again with the same output.
+When a path has several records the latest one wins; a resumed run rewrites
+the output without superseded records, without the error records it is about
+to retry and without a line cut short by the interruption.
+"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+from Computer_Vision.camera import IMAGE_EXTENSIONS
+
+
+def find_images(inputs):
+    """
+    Expand folders, glob patterns and file paths into a sorted, de-duplicated image list.
+
+    Args:
+        inputs (list): Folders, glob patterns or image paths.
+
+    Returns:
+        list: Image paths.
+    """
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                paths += [os.path.join(root, f) for f in files if f.lower().endswith(IMAGE_EXTENSIONS)]
+        else:
+            paths += [p for p in glob.glob(item) if p.lower().endswith(IMAGE_EXTENSIONS)]
+    return sorted(dict.fromkeys(os.path.normpath(p) for p in paths))
+
+
+def load_records(output_path):
+    """
+    Read an existing JSONL output, keeping the latest record for each path.
+
+    Args:
+        output_path (str): JSONL output file.
+
+    Returns:
+        tuple: (records, clean). `records` maps each path to its latest record,
+        in file order; `clean` is False if the file has unreadable lines
+        (e.g. one cut short by an interruption), superseded records or no
+        newline at the end, i.e. if it should be rewritten before appending.
+    """
+    records, clean = {}, True
+    if not os.path.exists(output_path):
+        return records, clean
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            if not line.endswith("\n"):
+                clean = False
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by an interruption; the image is processed again.
+                clean = False
+                continue
+            path = record.get("path")
+            if path in records:
+                # Re-insert so the output keeps the order in which records were written.
+                del records[path]
+                clean = False
+            records[path] = record
+    return records, clean
+
+
+def load_done(output_path, retry_errors=True):
+    """
+    Read an existing JSONL output and return the paths that are already processed.
+
+    Args:
+        output_path (str): JSONL output file.
+        retry_errors (bool, optional): Treat paths whose latest record has an
+            "error" as not done. Default is True.
+
+    Returns:
+        set: Processed image paths.
+    """
+    records, _ = load_records(output_path)
+    return {path for path, record in records.items() if not (retry_errors and record.get("error"))}
+
+
+def _rewrite(output_path, records):
+    # Write to a temporary file first so an interruption never loses the existing output.
+    temp_path = output_path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as out:
+        for record in records:
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(temp_path, output_path)
+
+
+def _decode(path):
+    from Computer_Vision.frames import to_rgb_array
+
+    start = time.perf_counter()
+    image = to_rgb_array(path)
+    return image, time.perf_counter() - start
+
+
+def _recognize(family_folder, image, labels_path):
+    from Computer_Vision.face_recognition import recognize_family_faces
+
+    timings = {}
+    start = time.perf_counter()
+    faces = recognize_family_faces(family_folder, image, labels_path=labels_path, timings=timings)
+    timings["faces"] = time.perf_counter() - start
+    family = [{"label": f["label"], "score": round(f["score"], 4), "margin": round(f["margin"], 4),
+               "bbox": f["bbox"]} for f in faces if f["label"]]
+    return {"faces": len(faces), "family": family}, timings
+
+
+def process_chunk(paths, family_folder="family", labels_path="labels.json", faces=True,
+                  batch_size=8, threads=4, num_beams=None):
+    """
+    Caption, translate and recognize faces for a list of images.
+
+    Images are decoded and face recognition runs on a thread pool while the
+    captioner processes the decoded images in batches of `batch_size`;
+    the captions are then translated with one batched call.
+
+    Args:
+        paths (list): Image paths.
+        family_folder (str, optional): Known faces folder. Default is "family".
+        labels_path (str, optional): Path to labels.json. Default is "labels.json".
+        faces (bool, optional): Run family recognition. Default is True.
+        batch_size (int, optional): Images per caption/translation batch. Default is 8.
+        threads (int, optional): Worker threads for decoding and faces. Default is 4.
+        num_beams (int, optional): Beam width for captioning and translation.
+
+    Returns:
+        list: One record per path (see `main`).
+    """
+    from Computer_Vision.Image_Caption import get_captions, using_captioner
+    from Core.pipeline import contains_person_keywords, enhance_caption_with_family
+    from NLP.Translation import translate_batch
+
+    records = [{"path": path, "timings": {}} for path in paths]
+    with ThreadPoolExecutor(max_workers=max(1, threads), thread_name_prefix="batch") as pool:
+        decoded = list(pool.map(_decode, paths))
+        images = []
+        for record, (image, seconds) in zip(records, decoded):
+            record["timings"]["decode"] = seconds
+            if image is None:
+                record["error"] = "could not read image"
+            else:
+                images.append((record, image))
+
+        face_futures = {}
+        if faces:
+            for record, image in images:
+                face_futures[id(record)] = pool.submit(_recognize, family_folder, image, labels_path)
+
+        if images:
+            start = time.perf_counter()
+            try:
+                with using_captioner() as captioner:
+                    captions = list(get_captions(*captioner, [image for _, image in images],
+                                                 batch_size=batch_size, num_beams=num_beams))
+            except Exception as e:
+                captions = None
+                for record, _ in images:
+                    record["error"] = f"caption failed: {e}"
+            caption_seconds = (time.perf_counter() - start) / len(images)
+            if captions is not None:
+                for (record, _), caption in zip(images, captions):
+                    record["caption"] = caption
+                    record["timings"]["caption"] = caption_seconds
+
+        for record, _ in images:
+            future = face_futures.get(id(record))
+            if future is None:
+                continue
+            try:
+                result, timings = future.result()
+                record.update(result)
+                record["timings"].update(timings)
+            except Exception as e:
+                record["face_error"] = str(e)
+
+    captioned = [record for record, _ in images if "caption" in record]
+    if captioned:
+        texts = []
+        for record in captioned:
+            # As in the voice flow, names are only added when the caption mentions a person.
+            names = [f["label"] for f in record.get("family", [])] if contains_person_keywords(record["caption"]) else []
+            enhanced, _ = enhance_caption_with_family(record["caption"], names)
+            texts.append(enhanced)
+        start = time.perf_counter()
+        try:
+            translations = translate_batch(texts, batch_size=batch_size, num_beams=num_beams)
+        except Exception as e:
+            translations = None
+            for record in captioned:
+                record["error"] = f"translation failed: {e}"
+        translate_seconds = (time.perf_counter() - start) / len(captioned)
+        if translations is not None:
+            for record, translation in zip(captioned, translations):
+                record["translation"] = translation
+                record["timings"]["translate"] = translate_seconds
+
+    for record in records:
+        record["timings"] = {k: round(v, 4) for k, v in record["timings"].items()}
+    return records
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def run_batch(inputs, output_path, family_folder="family", labels_path="labels.json", faces=True,
+              batch_size=8, threads=4, processes=0, num_beams=None, retry_errors=True, limit=None):
+    """
+    Process every image under `inputs` that is not yet in `output_path`.
+
+    Args:
+        inputs (list): Folders, glob patterns or image paths.
+        output_path (str): JSONL file; records are appended and flushed one by one
+            (the latest record for a path wins, see `load_records`).
+        processes (int, optional): Worker processes, each with its own models.
+            0 processes everything in this process. Default is 0.
+        limit (int, optional): Process at most this many new images.
+        Other arguments: see `process_chunk`.
+
+    Returns:
+        dict: Counts of found, skipped, processed and failed images and the wall time.
+    """
+    paths = find_images(inputs)
+    records, clean = load_records(output_path)
+    done = {path for path, record in records.items() if not (retry_errors and record.get("error"))}
+    if not clean or len(done) < len(records):
+        # Error records that are about to be retried are dropped with the rest.
+        _rewrite(output_path, [record for path, record in records.items() if path in done])
+    pending = [p for p in paths if p not in done]
+    summary = {"found": len(paths), "skipped": len(paths) - len(pending), "processed": 0, "failed": 0}
+    if limit is not None:
+        pending = pending[:limit]
+    print(f"🖼️ {len(paths)} images, {summary['skipped']} already done, {len(pending)} to process")
+
+    folder = os.path.dirname(output_path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    options = dict(family_folder=family_folder, labels_path=labels_path, faces=faces,
+                   batch_size=batch_size, threads=threads, num_beams=num_beams)
+    started = time.perf_counter()
+
+    with open(output_path, "a", encoding="utf-8") as out:
+        def write(records):
+            for record in records:
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                summary["processed"] += 1
+                summary["failed"] += bool(record.get("error"))
+            out.flush()
+            print(f"✅ {summary['processed']}/{len(pending)}")
+
+        chunks = list(_chunks(pending, batch_size))
+        if processes and processes > 0:
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                futures = [pool.submit(process_chunk, chunk, **options) for chunk in chunks]
+                for future in as_completed(futures):
+                    write(future.result())
+        else:
+            for chunk in chunks:
+                write(process_chunk(chunk, **options))
+
+    summary["seconds"] = round(time.perf_counter() - started, 2)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Caption, translate and recognize family members in image folders.")
+    parser.add_argument("inputs", nargs="+", help="Image folders, glob patterns or files")
+    parser.add_argument("--output", "-o", required=True, help="JSONL output (appended; used to resume)")
+    parser.add_argument("--family-folder", default="family")
+    parser.add_argument("--labels", default="labels.json")
+    parser.add_argument("--no-faces", action="store_true", help="Skip family recognition")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--threads", type=int, default=4, help="Threads for decoding and faces")
+    parser.add_argument("--processes", type=int, default=0, help="Worker processes (each loads the models)")
+    parser.add_argument("--num-beams", type=int, default=None)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--keep-errors", action="store_true", help="Do not retry images that failed before")
+    args = parser.parse_args(argv)
+
+    summary = run_batch(args.inputs, args.output, family_folder=args.family_folder, labels_path=args.labels,
+                        faces=not args.no_faces, batch_size=args.batch_size, threads=args.threads,
+                        processes=args.processes, num_beams=args.num_beams,
+                        retry_errors=not args.keep_errors, limit=args.limit)
+    print(json.dumps(summary, ensure_ascii=False))
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
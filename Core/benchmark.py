@@ -0,0 +1,325 @@
+"""
+Offline end-to-end latency benchmark for the "explore" voice command.
+
+Drives the same command flow as app/app.py with stubbed devices:
+- ScriptedAudioSource plus FakeASRBackend stand in for the microphone and the recognizer;
+- FileFrameSource replays the `family/` photos (or any fixture images) as camera frames;
+- StubTTSBackend and NullPlayer replace Edge TTS and the speakers.
+Captioning, face recognition and translation run the real models.
+
+Usage:
+    python -m Core.benchmark --runs 10 --output bench.json
+    python -m Core.benchmark --runs 10 --baseline bench.json
+
+Results are only comparable between runs on the same machine and settings.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import platform
+import argparse
+import tempfile
+from datetime import datetime
+
+# Stages reported for the sequential flow, in order.
+STAGES = ("asr", "capture", "caption", "detect", "match", "translate", "tts", "total")
+
+
+def percentile(values, q):
+    """Linear-interpolated percentile (q in 0-100) of a list of numbers."""
+    values = sorted(values)
+    if not values:
+        return None
+    position = (len(values) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def summarize(samples):
+    """
+    Summarize per-run stage timings.
+
+    Args:
+        samples (list): One dict of stage -> seconds per run.
+
+    Returns:
+        dict: stage -> {"count", "mean", "p50", "p95", "max"} in seconds.
+    """
+    stages = [s for s in STAGES if any(s in sample for sample in samples)]
+    stages += sorted({key for sample in samples for key in sample} - set(stages))
+    summary = {}
+    for stage in stages:
+        values = [sample[stage] for sample in samples if sample.get(stage) is not None]
+        if not values:
+            continue
+        summary[stage] = {
+            "count": len(values),
+            "mean": sum(values) / len(values),
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "max": max(values),
+        }
+    return summary
+
+
+def machine_info():
+    """Details that must match for two benchmark reports to be comparable."""
+    info = {
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+    }
+    try:
+        import torch
+        info["torch"] = torch.__version__
+        info["torch_threads"] = torch.get_num_threads()
+    except ImportError:
+        pass
+    return info
+
+
+def compare_reports(current, baseline, tolerance=0.10):
+    """
+    Compare the p50/p95 of two reports.
+
+    Args:
+        current (dict): Report from `run_benchmark`.
+        baseline (dict): Earlier report (e.g. loaded from JSON).
+        tolerance (float, optional): Relative slowdown flagged as a regression. Default is 0.10.
+
+    Returns:
+        list: Rows with stage, metric, baseline, current, change (relative) and regression.
+    """
+    rows = []
+    for stage, stats in current["summary"].items():
+        previous = baseline.get("summary", {}).get(stage)
+        if not previous:
+            continue
+        for metric in ("p50", "p95"):
+            before, after = previous.get(metric), stats.get(metric)
+            if before is None or after is None:
+                continue
+            change = (after - before) / before if before > 0 else 0.0
+            rows.append({
+                "stage": stage,
+                "metric": metric,
+                "baseline": before,
+                "current": after,
+                "change": change,
+                "regression": change > tolerance,
+            })
+    return rows
+
+
+def setup_offline_devices(images="family", runs=1, realtime_audio=False, tts="stub"):
+    """
+    Swap the microphone, recognizer, camera, TTS and speakers for offline stand-ins.
+
+    Args:
+        images (str or list, optional): Frame source images (folder, glob or list). Default is "family".
+        runs (int, optional): Number of explore commands to script. Default is 1.
+        realtime_audio (bool, optional): Feed scripted speech at the real frame rate,
+            so VAD trailing-silence time is included in the ASR stage. Default is False.
+        tts (str, optional): "stub" for offline silent audio or "edge" for Edge TTS. Default is "stub".
+
+    Returns:
+        dict: The "source" (ScriptedAudioSource), "player" (NullPlayer) and "listener".
+    """
+    import NLP.Voice_Assistant as assistant
+    from NLP.asr import FakeASRBackend
+    from NLP.audio_capture import ScriptedAudioSource, VoiceListener
+    from NLP.audio_player import NullPlayer
+    from NLP.tts import EdgeTTSBackend, StubTTSBackend, TTSCache
+    from Computer_Vision.camera import FileFrameSource, get_camera
+
+    source = ScriptedAudioSource(realtime=realtime_audio)
+    asr = FakeASRBackend([assistant.EXPLORE_COMMANDS[0]] * runs)
+    listener = VoiceListener(asr, source=source, normalize=assistant.normalize_text)
+    assistant.set_voice_listener(listener)
+
+    player = NullPlayer()
+    assistant.set_audio_player(player)
+    assistant.set_tts_backend(StubTTSBackend() if tts == "stub" else EdgeTTSBackend())
+    # Keep benchmark audio out of the real TTS cache.
+    assistant.tts_cache = TTSCache(folder=tempfile.mkdtemp(prefix="mobsir-bench-tts-"))
+
+    camera = get_camera()
+    camera.set_source(FileFrameSource(images))
+    camera.start()
+    return {"source": source, "player": player, "listener": listener}
+
+
+async def _explore_once(source, flow, family_folder, use_cache):
+    """Run one scripted "explore" command and return its stage timings."""
+    import NLP.Voice_Assistant as assistant
+    from Core.pipeline import enhance_caption_with_family, explore_scene, explore_scene_incremental
+    from Computer_Vision.Image_Caption import get_caption, using_captioner
+    from Computer_Vision.face_recognition import recognize_family_faces
+    from NLP.Translation import translate_batch
+
+    async def speak(text, stream=False):
+        await assistant.edge_speak(text, stream=stream, use_cache=use_cache)
+
+    sample = {}
+    source.speech_ended_at = None
+    source.say(delay=0.05)
+    command = assistant.listen_once(commands=assistant.MAIN_COMMANDS)
+    heard = time.monotonic()
+    if not any(word in command for word in assistant.EXPLORE_COMMANDS):
+        raise RuntimeError(f"Scripted command was not recognized: {command!r}")
+    speech_end = source.speech_ended_at
+    # A command caught from a partial transcript is recognized before the speech ends.
+    sample["asr"] = max(0.0, heard - speech_end) if speech_end is not None else 0.0
+    started = time.perf_counter()
+
+    stage_start = time.perf_counter()
+    frame, _ = assistant.capture_frame(archive=False)
+    sample["capture"] = time.perf_counter() - stage_start
+    if frame is None:
+        raise RuntimeError("No frame from the benchmark camera source")
+
+    if flow == "sequential":
+        stage_start = time.perf_counter()
+        with using_captioner() as captioner:
+            caption = get_caption(*captioner, frame)
+        sample["caption"] = time.perf_counter() - stage_start
+
+        face_timings = {}
+        faces = recognize_family_faces(family_folder, frame, timings=face_timings)
+        sample.update(face_timings)
+        names = list(dict.fromkeys(f["label"] for f in faces if f["label"]))
+        enhanced_caption, _ = enhance_caption_with_family(caption, names)
+
+        stage_start = time.perf_counter()
+        translation = translate_batch([enhanced_caption], use_cache=use_cache)[0]
+        sample["translate"] = time.perf_counter() - stage_start
+
+        stage_start = time.perf_counter()
+        await speak(f"وصف الصورة: {translation}", stream=True)
+        sample["tts"] = time.perf_counter() - stage_start
+    else:
+        explore = explore_scene_incremental if flow == "incremental" else explore_scene
+        # Replayed frames repeat, so bypass the scene cache to measure the models.
+        result = await explore(frame, speak=speak, family_folder=family_folder, force_refresh=True)
+        timings = dict(result["timings"])
+        timings.pop("total", None)
+        if "speak" in timings:
+            timings["tts"] = timings.pop("speak")
+        sample.update(timings)
+
+    sample["total"] = sample["asr"] + time.perf_counter() - started
+    return sample
+
+
+async def run_benchmark(runs=10, warmup=1, images="family", family_folder="family", flow="sequential",
+                        use_cache=False, realtime_audio=False, tts="stub"):
+    """
+    Run the scripted "explore" command repeatedly and collect per-stage latencies.
+
+    Args:
+        runs (int, optional): Measured runs. Default is 10.
+        warmup (int, optional): Unmeasured runs first (model loading). Default is 1.
+        images (str or list, optional): Camera frames to replay. Default is "family".
+        family_folder (str, optional): Known faces folder. Default is "family".
+        flow (str, optional): "sequential" (per-stage breakdown), "overlapped"
+            (`explore_scene`) or "incremental" (`explore_scene_incremental`).
+        use_cache (bool, optional): Use the translation and TTS caches. Default is
+            False, so every run measures the models.
+        realtime_audio (bool, optional): See `setup_offline_devices`.
+        tts (str, optional): "stub" or "edge". Default is "stub".
+
+    Returns:
+        dict: created, machine, config, load_seconds, samples and summary.
+    """
+    import NLP.Translation as translation
+    from NLP.translation_cache import TranslationCache
+    from Core.model_registry import registry
+
+    devices = setup_offline_devices(images, runs + warmup, realtime_audio, tts)
+    if not use_cache:
+        # An in-memory cache that is cleared before every run; the on-disk cache is left alone.
+        translation.translation_cache = TranslationCache(db_path=None)
+
+    samples = []
+    for i in range(warmup + runs):
+        if not use_cache:
+            translation.translation_cache.clear()
+        sample = await _explore_once(devices["source"], flow, family_folder, use_cache)
+        if i >= warmup:
+            samples.append(sample)
+        print(f"run {i + 1}/{warmup + runs}{' (warm-up)' if i < warmup else ''}: "
+              + ", ".join(f"{k} {v * 1000:.0f}ms" for k, v in sample.items()))
+
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "machine": machine_info(),
+        "config": {"runs": runs, "warmup": warmup, "flow": flow, "use_cache": use_cache,
+                   "realtime_audio": realtime_audio, "tts": tts,
+                   "images": images if isinstance(images, str) else list(images)},
+        "load_seconds": dict(registry.load_seconds),
+        "samples": samples,
+        "summary": summarize(samples),
+    }
+
+
+def print_summary(report):
+    print(f"{'stage':10s} {'p50 ms':>9s} {'p95 ms':>9s} {'mean ms':>9s} {'n':>4s}")
+    for stage, stats in report["summary"].items():
+        print(f"{stage:10s} {stats['p50'] * 1000:9.1f} {stats['p95'] * 1000:9.1f} "
+              f"{stats['mean'] * 1000:9.1f} {stats['count']:4d}")
+
+
+def print_comparison(rows, current, baseline):
+    if baseline.get("machine") != current["machine"]:
+        print("⚠ The baseline was recorded on a different machine or setup; compare with care.")
+    if baseline.get("config", {}).get("flow") != current["config"]["flow"]:
+        print("⚠ The baseline used a different flow.")
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['stage']:10s} {row['metric']} {row['baseline'] * 1000:9.1f} -> "
+              f"{row['current'] * 1000:9.1f} ms ({row['change']:+.0%}){flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline latency benchmark for the explore command.")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--images", default="family", help="Folder or glob of frames to replay")
+    parser.add_argument("--family-folder", default="family")
+    parser.add_argument("--flow", default="sequential", choices=("sequential", "overlapped", "incremental"))
+    parser.add_argument("--use-cache", action="store_true", help="Allow translation/TTS cache hits")
+    parser.add_argument("--realtime-audio", action="store_true")
+    parser.add_argument("--tts", default="stub", choices=("stub", "edge"))
+    parser.add_argument("--output", help="Save the report as JSON")
+    parser.add_argument("--baseline", help="Earlier JSON report to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Relative slowdown reported as a regression (default 0.10)")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run_benchmark(
+        runs=args.runs, warmup=args.warmup, images=args.images, family_folder=args.family_folder,
+        flow=args.flow, use_cache=args.use_cache, realtime_audio=args.realtime_audio, tts=args.tts))
+    print_summary(report)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare_reports(report, baseline, args.tolerance)
+        report["comparison"] = {"baseline": args.baseline, "rows": rows}
+        print_comparison(rows, report, baseline)
+        regressions = [row for row in rows if row["regression"]]
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Saved {args.output}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""
+Thin client for the local inference server (Core/inference_server.py).
+
+When MOBSIR_INFERENCE_URL is set (e.g. http://127.0.0.1:8765), the caption,
+translation and face recognition functions send their work to the server
+instead of loading the models in this process; nothing changes for callers.
+"""
+import os
+import json
+import time
+import base64
+import urllib.error
+import urllib.request
+import numpy as np
+
+ENV_URL = "MOBSIR_INFERENCE_URL"
+
+# How long the server lets a request wait for its result. The client waits
+# longer, so a slow request is answered (or timed out) by the server rather
+# than abandoned while the server keeps computing it.
+SERVER_REQUEST_TIMEOUT = 120.0
+CLIENT_TIMEOUT = SERVER_REQUEST_TIMEOUT + 30.0
+
+
+class InferenceServerError(RuntimeError):
+    """The inference server rejected a request or could not be reached."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+def encode_image(image):
+    """
+    Encode an image (path, PIL image or RGB array) as raw RGB bytes for a request.
+
+    Raw pixels avoid a lossy or slow codec round trip; on a local socket the
+    extra bytes are cheaper than a JPEG/PNG encode.
+    """
+    from Computer_Vision.frames import to_rgb_array
+
+    array = to_rgb_array(image)
+    if array is None:
+        raise ValueError(f"Could not read image: {image}")
+    array = np.ascontiguousarray(array, dtype=np.uint8)
+    return {"shape": list(array.shape), "data": base64.b64encode(array.tobytes()).decode("ascii")}
+
+
+def decode_image(payload):
+    """Inverse of `encode_image`."""
+    data = base64.b64decode(payload["data"])
+    return np.frombuffer(data, dtype=np.uint8).reshape(payload["shape"])
+
+
+class InferenceClient:
+    """
+    Calls the inference server over HTTP.
+
+    Requests rejected because the server queue is full (HTTP 503) are retried
+    with exponential backoff before an InferenceServerError is raised.
+
+    Args:
+        url (str): Server base URL, e.g. "http://127.0.0.1:8765".
+        timeout (float, optional): Seconds to wait for a response. Default is 150,
+            longer than the server's own request timeout.
+        retries (int, optional): Retries after a 503. Default is 3.
+    """
+
+    def __init__(self, url, timeout=CLIENT_TIMEOUT, retries=3):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.retries = retries
+
+    def _request(self, path, payload=None):
+        data = None if payload is None else json.dumps(payload).encode("utf-8")
+        delay = 0.1
+        for attempt in range(self.retries + 1):
+            request = urllib.request.Request(self.url + path, data=data,
+                                             headers={"Content-Type": "application/json"})
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                    return json.loads(response.read().decode("utf-8"))
+            except urllib.error.HTTPError as e:
+                try:
+                    message = json.loads(e.read().decode("utf-8")).get("error", str(e))
+                except ValueError:
+                    message = str(e)
+                if e.code == 503 and attempt < self.retries:
+                    time.sleep(delay)
+                    delay *= 2
+                    continue
+                raise InferenceServerError(f"{path}: {message}", status=e.code) from None
+            except urllib.error.URLError as e:
+                raise InferenceServerError(f"{path}: server unreachable ({e.reason})") from None
+            except OSError as e:
+                # Read timeouts and dropped connections (TimeoutError, ConnectionResetError, ...).
+                raise InferenceServerError(f"{path}: no response from the server ({e})") from None
+
+    def caption(self, images, num_beams=None, max_new_tokens=None):
+        """Caption images on the server; returns one caption per image."""
+        payload = {"images": [encode_image(image) for image in images],
+                   "num_beams": num_beams, "max_new_tokens": max_new_tokens}
+        return self._request("/caption", payload)["captions"]
+
+    def translate(self, texts, max_length=50, num_beams=None):
+        """Translate English texts to Arabic on the server."""
+        payload = {"texts": list(texts), "max_length": max_length, "num_beams": num_beams}
+        return self._request("/translate", payload)["translations"]
+
+    def recognize(self, image, family_folder="family", labels_path="labels.json", threshold=0.5, margin=0.05):
+        """Recognize family faces on the server; same result format as `recognize_family_faces`."""
+        payload = {"image": encode_image(image), "family_folder": os.path.abspath(family_folder),
+                   "labels_path": os.path.abspath(labels_path), "threshold": threshold, "margin": margin}
+        return self._request("/recognize", payload)["faces"]
+
+    def stats(self):
+        """Return the server's per-endpoint statistics."""
+        return self._request("/stats")
+
+    def health(self):
+        return self._request("/health")
+
+
+class RemoteModel:
+    """
+    Stands in for a model that lives in the inference server.
+
+    Loaders return it instead of real weights when MOBSIR_INFERENCE_URL is
+    set, and the inference functions forward calls to `client`.
+    """
+
+    def __init__(self, client, kind):
+        self.client = client
+        self.kind = kind
+
+    def __repr__(self):
+        return f"RemoteModel({self.kind!r}, {self.client.url!r})"
+
+
+_clients = {}
+
+
+def get_client():
+    """Return the client for MOBSIR_INFERENCE_URL, or None when inference is local."""
+    url = os.environ.get(ENV_URL)
+    if not url:
+        return None
+    client = _clients.get(url)
+    if client is None:
+        client = _clients[url] = InferenceClient(url)
+    return client
+
+
+def remote_model(kind):
+    """Return a RemoteModel for `kind` when a server is configured, else None."""
+    client = get_client()
+    return RemoteModel(client, kind) if client is not None else None
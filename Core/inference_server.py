@@ -0,0 +1,422 @@
+"""
+Local inference server shared by several Mobsir assistants on one machine.
+
+The caption, translation and face models are loaded once, here. Requests
+from all clients go through a bounded queue per endpoint; the caption and
+translation workers merge the queued requests into one model batch. When a
+queue is full the server answers 503 right away (the client backs off and
+retries) instead of letting latency grow without bound.
+
+Usage:
+    python -m Core.inference_server --port 8765 --warmup
+    MOBSIR_INFERENCE_URL=http://127.0.0.1:8765 streamlit run app/app.py
+
+Endpoints (JSON):
+    POST /caption    {"images": [...], "num_beams": null, "max_new_tokens": null}
+    POST /translate  {"texts": [...], "max_length": 50, "num_beams": null}
+    POST /recognize  {"image": {...}, "family_folder": "...", "labels_path": "...",
+                      "threshold": 0.5, "margin": 0.05}
+    GET  /stats, GET /health
+"""
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# The server runs the models itself; never forward its own calls to a server.
+os.environ.pop("MOBSIR_INFERENCE_URL", None)
+
+from Core import tracing
+from Core.benchmark import percentile
+from Core.inference_client import SERVER_REQUEST_TIMEOUT, decode_image
+
+
+class QueueFull(Exception):
+    """The endpoint's request queue is full."""
+
+
+class BadRequest(ValueError):
+    """A request payload is malformed; only that request fails (HTTP 400)."""
+
+
+class BatchQueue:
+    """
+    Bounded request queue with a worker that serves requests in batches.
+
+    The worker takes the first waiting request, waits up to `max_wait_ms` for
+    more, and hands up to `max_batch` requests to `handler` at once.
+
+    Payloads are validated and decoded by `prepare` on the submitting thread,
+    so a malformed request is rejected on its own and never reaches a merged
+    batch. The handler may return an exception instance in place of a result
+    to fail a single request; an exception it raises fails the whole batch
+    (a real model error).
+
+    Args:
+        name (str): Endpoint name (used in stats and thread names).
+        handler (callable): Takes a list of prepared payloads and returns one result per payload.
+        prepare (callable, optional): Validates and decodes one payload; raises BadRequest.
+        max_queue (int, optional): Requests that may wait. Default is 64.
+        max_batch (int, optional): Requests per handler call. Default is 16.
+        max_wait_ms (float, optional): How long a batch waits to fill up. Default is 10.
+    """
+
+    def __init__(self, name, handler, prepare=None, max_queue=64, max_batch=16, max_wait_ms=10):
+        self.name = name
+        self.handler = handler
+        self.prepare = prepare
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._latencies = deque(maxlen=1000)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.rejected = 0
+        self.invalid = 0
+        self.batches = 0
+        self.batched_requests = 0
+        self._worker = threading.Thread(target=self._run, name=f"serve-{name}", daemon=True)
+        self._worker.start()
+
+    def submit(self, payload):
+        """
+        Queue a request.
+
+        Returns:
+            Future: Resolves to the handler's result for this payload.
+
+        Raises:
+            BadRequest: If `prepare` rejects the payload.
+            QueueFull: If the queue is at capacity.
+        """
+        if self.prepare is not None:
+            try:
+                payload = self.prepare(payload)
+            except BadRequest:
+                with self._lock:
+                    self.invalid += 1
+                raise
+            except (KeyError, TypeError, ValueError) as e:
+                with self._lock:
+                    self.invalid += 1
+                raise BadRequest(f"{type(e).__name__}: {e}") from None
+        future = Future()
+        future.submitted_at = time.perf_counter()
+        try:
+            self._queue.put_nowait((payload, future))
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            tracing.incr("inference_rejected", endpoint=self.name)
+            raise QueueFull(self.name) from None
+        tracing.set_gauge("queue_depth", self._queue.qsize(), queue=f"inference_{self.name}")
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            live = [(payload, future) for payload, future in batch if future.set_running_or_notify_cancel()]
+            if not live:
+                continue
+            try:
+                with tracing.span(f"inference_{self.name}", batch=len(live)):
+                    results = self.handler([payload for payload, _ in live])
+                failed = 0
+                for (_, future), result in zip(live, results):
+                    if isinstance(result, Exception):
+                        future.set_exception(result)
+                        failed += 1
+                    else:
+                        future.set_result(result)
+            except Exception as e:
+                for _, future in live:
+                    future.set_exception(e)
+                failed = len(live)
+            now = time.perf_counter()
+            with self._lock:
+                self.requests += len(live)
+                self.errors += failed
+                self.batches += 1
+                self.batched_requests += len(live)
+                for _, future in live:
+                    self._latencies.append(now - future.submitted_at)
+
+    def stats(self):
+        """Return request, error and rejection counts, batch sizes, queue depth and latency percentiles."""
+        with self._lock:
+            latencies = list(self._latencies)
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "rejected": self.rejected,
+                "invalid": self.invalid,
+                "queue_depth": self._queue.qsize(),
+                "queue_capacity": self._queue.maxsize,
+                "batches": self.batches,
+                "mean_batch_size": self.batched_requests / self.batches if self.batches else 0.0,
+                "latency_ms_p50": 1000 * percentile(latencies, 50) if latencies else None,
+                "latency_ms_p95": 1000 * percentile(latencies, 95) if latencies else None,
+            }
+
+
+def _grouped(payloads, keys):
+    """Group payload indices by the given settings so each group shares one model call."""
+    groups = {}
+    for i, payload in enumerate(payloads):
+        groups.setdefault(tuple(payload.get(key) for key in keys), []).append(i)
+    return groups
+
+
+def _optional_int(payload, key, default=None):
+    value = payload.get(key, default)
+    if value is not None and (isinstance(value, bool) or not isinstance(value, int) or value < 1):
+        raise BadRequest(f"{key} must be a positive integer")
+    return value
+
+
+def _decode(image):
+    try:
+        return decode_image(image)
+    except Exception as e:
+        raise BadRequest(f"invalid image: {e}") from None
+
+
+def prepare_caption(payload):
+    """Validate a /caption payload and decode its images."""
+    images = payload.get("images")
+    if not isinstance(images, list) or not images:
+        raise BadRequest("images must be a non-empty list")
+    return {"images": [_decode(image) for image in images],
+            "num_beams": _optional_int(payload, "num_beams"),
+            "max_new_tokens": _optional_int(payload, "max_new_tokens")}
+
+
+def prepare_translate(payload):
+    """Validate a /translate payload."""
+    texts = payload.get("texts")
+    if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+        raise BadRequest("texts must be a list of strings")
+    return {"texts": texts,
+            "max_length": _optional_int(payload, "max_length", 50) or 50,
+            "num_beams": _optional_int(payload, "num_beams")}
+
+
+def prepare_recognize(payload):
+    """Validate a /recognize payload and decode its image."""
+    if "image" not in payload:
+        raise BadRequest("image is required")
+    prepared = {"image": _decode(payload["image"])}
+    for key, default in (("family_folder", "family"), ("labels_path", "labels.json")):
+        value = payload.get(key, default)
+        if not isinstance(value, str):
+            raise BadRequest(f"{key} must be a string")
+        prepared[key] = value
+    for key, default in (("threshold", 0.5), ("margin", 0.05)):
+        value = payload.get(key, default)
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise BadRequest(f"{key} must be a number")
+        prepared[key] = float(value)
+    return prepared
+
+
+def caption_handler(payloads):
+    """Caption the images of every request with shared `generate` batches."""
+    from Computer_Vision.Image_Caption import get_captions, using_captioner
+
+    results = [None] * len(payloads)
+    for (num_beams, max_new_tokens), indices in _grouped(payloads, ("num_beams", "max_new_tokens")).items():
+        images, owners = [], []
+        for i in indices:
+            for image in payloads[i]["images"]:
+                images.append(image)
+                owners.append(i)
+            results[i] = []
+        # Requests share batches, but each `generate` call keeps the captioner's
+        # usual batch size (get_captions' default) however many images are queued.
+        with using_captioner() as captioner:
+            captions = list(get_captions(*captioner, images, num_beams=num_beams,
+                                         max_new_tokens=max_new_tokens))
+        for owner, caption in zip(owners, captions):
+            results[owner].append(caption)
+    return [{"captions": captions} for captions in results]
+
+
+def translate_handler(payloads):
+    """Translate the texts of every request with shared, cached batches."""
+    from NLP.Translation import translate_batch
+
+    results = [None] * len(payloads)
+    for (max_length, num_beams), indices in _grouped(payloads, ("max_length", "num_beams")).items():
+        texts = [text for i in indices for text in payloads[i]["texts"]]
+        translations = iter(translate_batch(texts, max_length=max_length, num_beams=num_beams))
+        for i in indices:
+            results[i] = {"translations": [next(translations) for _ in payloads[i]["texts"]]}
+    return results
+
+
+def recognize_handler(payloads):
+    """Recognize faces one image at a time (detection does not batch across images)."""
+    from Computer_Vision.face_recognition import recognize_family_faces
+
+    results = []
+    for payload in payloads:
+        # Each image is its own model call, so a failure only fails its request.
+        try:
+            faces = recognize_family_faces(payload["family_folder"], payload["image"],
+                                           labels_path=payload["labels_path"],
+                                           threshold=payload["threshold"], margin=payload["margin"])
+            results.append({"faces": faces})
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+class InferenceServer(ThreadingHTTPServer):
+    """
+    HTTP server with one BatchQueue per endpoint.
+
+    Args:
+        address (tuple): (host, port) to listen on.
+        max_queue (int, optional): Waiting requests per endpoint. Default is 64.
+        max_batch (int, optional): Requests merged per model call. Default is 16.
+        max_wait_ms (float, optional): Batch fill wait. Default is 10.
+        request_timeout (float, optional): Seconds a request may wait for its result.
+            Default is 120 (SERVER_REQUEST_TIMEOUT; clients wait longer).
+    """
+
+    daemon_threads = True
+    # Many clients may connect at once; the queues, not the listen backlog, apply backpressure.
+    request_queue_size = 128
+
+    def __init__(self, address, max_queue=64, max_batch=16, max_wait_ms=10, request_timeout=SERVER_REQUEST_TIMEOUT):
+        super().__init__(address, InferenceRequestHandler)
+        self.request_timeout = request_timeout
+        self.started_at = time.time()
+        self.endpoints = {
+            "caption": BatchQueue("caption", caption_handler, prepare_caption,
+                                  max_queue, max_batch, max_wait_ms),
+            "translate": BatchQueue("translate", translate_handler, prepare_translate,
+                                    max_queue, max_batch, max_wait_ms),
+            # Recognition is served one image at a time, so it gets no batching wait.
+            "recognize": BatchQueue("recognize", recognize_handler, prepare_recognize, max_queue, 1, 0),
+        }
+
+    def stats(self):
+        from Core.model_registry import registry
+
+        return {
+            "uptime_seconds": time.time() - self.started_at,
+            "endpoints": {name: endpoint.stats() for name, endpoint in self.endpoints.items()},
+            "models": registry.stats(),
+            "memory": registry.memory_stats(),
+        }
+
+
+class InferenceRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _send(self, status, body, headers=None):
+        data = json.dumps(body, ensure_ascii=False, default=float).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, {"status": "ok"})
+        elif self.path == "/stats":
+            self._send(200, self.server.stats())
+        else:
+            self._send(404, {"error": f"unknown path {self.path}"})
+
+    def do_POST(self):
+        endpoint = self.server.endpoints.get(self.path.strip("/"))
+        if endpoint is None:
+            self._send(404, {"error": f"unknown path {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length).decode("utf-8"))
+        except ValueError as e:
+            self._send(400, {"error": f"invalid JSON: {e}"})
+            return
+        if not isinstance(payload, dict):
+            self._send(400, {"error": "request body must be a JSON object"})
+            return
+        try:
+            future = endpoint.submit(payload)
+        except BadRequest as e:
+            self._send(400, {"error": str(e)})
+            return
+        except QueueFull:
+            self._send(503, {"error": f"{endpoint.name} queue is full"}, {"Retry-After": "1"})
+            return
+        try:
+            self._send(200, future.result(timeout=self.server.request_timeout))
+        except FutureTimeout:
+            future.cancel()
+            self._send(504, {"error": f"{endpoint.name} timed out"})
+        except Exception as e:
+            self._send(500, {"error": str(e)})
+
+    def log_message(self, format, *args):
+        # Per-request logs are replaced by /stats and tracing.
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the Mobsir models to local clients.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--queue-size", type=int, default=64, help="Waiting requests per endpoint")
+    parser.add_argument("--max-batch", type=int, default=16, help="Requests merged per model call")
+    parser.add_argument("--max-wait-ms", type=float, default=10, help="How long a batch waits to fill")
+    parser.add_argument("--warmup", action="store_true", help="Load every model before serving")
+    args = parser.parse_args(argv)
+
+    # Importing these registers the models with the registry.
+    import Computer_Vision.Image_Caption  # noqa: F401
+    import Computer_Vision.face_recognizer  # noqa: F401
+    import NLP.Translation  # noqa: F401
+    from Core.model_registry import registry
+
+    if args.warmup:
+        registry.warmup()
+    server = InferenceServer((args.host, args.port), max_queue=args.queue_size,
+                             max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+    print(f"🚀 Mobsir inference server on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
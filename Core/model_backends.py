@@ -0,0 +1,135 @@
+"""
+Shared plumbing for the model backend modules (Computer_Vision/caption_backends.py
+and NLP/translation_backends.py): backend selection, int8 quantization, the
+one-time ONNX export, torch thread scoping and the timing loop used to
+compare backends.
+"""
+import os
+import gc
+import time
+import threading
+from contextlib import contextmanager
+from Core.model_registry import MB, _rss_bytes
+
+BACKENDS = ("eager", "int8", "onnx")
+
+_threads_lock = threading.Lock()
+
+
+def backend_from_env(variable, default="eager"):
+    """Backend named by the environment variable `variable`, lower-cased."""
+    return os.environ.get(variable, default).lower()
+
+
+def select_loader(kind, loaders, name):
+    """
+    Look up the loader of a backend.
+
+    Args:
+        kind (str): Model kind for the error message, e.g. "caption".
+        loaders (dict): Backend name -> loader.
+        name (str): Backend name (any case).
+
+    Returns:
+        callable: The backend's loader.
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    name = name.lower()
+    if name not in loaders:
+        raise ValueError(f"Unknown {kind} backend: {name} (choose from {', '.join(loaders)})")
+    return loaders[name]
+
+
+def quantize_int8(model):
+    """Dynamically quantize a torch model's nn.Linear layers to int8."""
+    import torch
+
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def export_onnx_once(model_class, model_name, export_dir, label, **kwargs):
+    """
+    Export a model to ONNX with KV-cache decoding, unless `export_dir` already has it.
+
+    Args:
+        model_class: optimum.onnxruntime model class (e.g. ORTModelForSeq2SeqLM).
+        model_name (str): Hugging Face model name.
+        export_dir (str): Export folder.
+        label (str): Model description for the progress message.
+        **kwargs: Extra `from_pretrained` arguments (e.g. cache_dir).
+
+    Returns:
+        str: The export folder.
+    """
+    if not os.path.exists(os.path.join(export_dir, "config.json")):
+        print(f"Exporting the {label} to ONNX in {export_dir} (one time)...")
+        model = model_class.from_pretrained(model_name, export=True, use_cache=True, **kwargs)
+        model.save_pretrained(export_dir)
+    return export_dir
+
+
+@contextmanager
+def torch_threads(threads):
+    """
+    Run the block with torch's intra-op thread count set to `threads`.
+
+    torch's thread count is process-wide, so it is restored afterwards and
+    the blocks that set it run one at a time; work on other threads (e.g. the
+    captioner) still sees the value while a block runs. Does nothing when
+    `threads` is falsy.
+    """
+    if not threads:
+        yield
+        return
+    import torch
+
+    with _threads_lock:
+        previous = torch.get_num_threads()
+        torch.set_num_threads(threads)
+        try:
+            yield
+        finally:
+            torch.set_num_threads(previous)
+
+
+def measure_backend(load, run, repeats=1):
+    """
+    Load a backend, run it once as a warm-up and time `repeats` more runs.
+
+    Args:
+        load (callable): Returns the backend's components.
+        run (callable): Takes the components and returns the outputs.
+        repeats (int, optional): Timed runs after the warm-up. Default is 1.
+
+    Returns:
+        dict: load_seconds, outputs (of the warm-up run), run_seconds (one
+        entry per timed run) and rss_delta_mb (None where RSS cannot be read).
+
+    Raises:
+        ValueError: If `repeats` is less than 1.
+    """
+    if repeats < 1:
+        raise ValueError(f"repeats must be at least 1, got {repeats}")
+    gc.collect()
+    rss_before = _rss_bytes()
+    start = time.perf_counter()
+    components = load()
+    load_seconds = time.perf_counter() - start
+
+    outputs = run(components)
+    run_seconds = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run(components)
+        run_seconds.append(time.perf_counter() - start)
+    rss_after = _rss_bytes()
+    del components
+    known = rss_before is not None and rss_after is not None
+    return {
+        "load_seconds": load_seconds,
+        "outputs": outputs,
+        "run_seconds": run_seconds,
+        "rss_delta_mb": (rss_after - rss_before) / MB if known else None,
+    }
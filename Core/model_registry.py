@@ -0,0 +1,330 @@
+import gc
+import os
+import time
+import threading
+from contextlib import contextmanager
+from Core import tracing
+
+# Reference point for time-to-ready measurements (module import ~ process start).
+STARTED_AT = time.monotonic()
+
+MB = 1024 * 1024
+
+
+def _rss_bytes():
+    """Resident set size of this process, or None where it cannot be read."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def estimate_size(model):
+    """
+    Estimate the memory held by a loaded model, in bytes.
+
+    torch modules count their parameters and buffers; insightface apps and
+    ONNX models count their model files. Tuples (e.g. model, processor,
+    tokenizer) are summed; anything else counts as 0.
+    """
+    if isinstance(model, (tuple, list)):
+        return sum(estimate_size(part) for part in model)
+    if hasattr(model, "parameters") and hasattr(model, "buffers"):
+        try:
+            tensors = list(model.parameters()) + list(model.buffers())
+            return sum(t.numel() * t.element_size() for t in tensors)
+        except Exception:
+            return 0
+    models = getattr(model, "models", None)
+    if isinstance(models, dict):
+        return sum(estimate_size(part) for part in models.values())
+    path = getattr(model, "model_file", None) or getattr(model, "model_path", None)
+    if isinstance(path, (str, os.PathLike)) and os.path.isfile(path):
+        return os.path.getsize(path)
+    return 0
+
+
+class ModelRegistry:
+    """
+    Registry of named models that are loaded on first use.
+
+    Modules register a loader at import time instead of loading weights at
+    module level, so importing them is cheap. `get` loads a model the first
+    time it is requested (once, even under concurrent requests), and
+    `warmup_async` loads them in the background after the app has started.
+    Load durations and time-to-ready are recorded per model.
+
+    On small devices the registry also keeps memory in check: with a budget,
+    loading a model first evicts the least recently used ones until it fits,
+    and with an idle timeout a background thread unloads models that have not
+    been used for that long. Evicted models are loaded again by the next
+    `get`. Models used inside a `use` block are pinned and never evicted.
+
+    A model's size is the larger of `estimate_size` and the growth of the
+    process RSS while it loaded; the largest value seen is kept so a reload
+    (which often reuses freed memory) does not shrink it.
+
+    Args:
+        budget_mb (float, optional): Memory allowed for loaded models. Default is no limit.
+        idle_seconds (float, optional): Unload models unused for this long. Default is never.
+    """
+
+    def __init__(self, budget_mb=None, idle_seconds=None):
+        self._loaders = {}
+        self._unloaders = {}
+        self._models = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self._pins = {}
+        self._last_used = {}
+        self._reaper = None
+        self.budget_mb = budget_mb
+        self.idle_seconds = idle_seconds
+        self.load_seconds = {}
+        self.ready_after = {}
+        self.sizes = {}
+        self.loads = {}
+        self.evictions = {}
+
+    def register(self, name, loader, unloader=None, size_mb=None):
+        """
+        Register a model loader.
+
+        Args:
+            name (str): Model name, e.g. "captioner".
+            loader (callable): Returns the loaded model (any object).
+            unloader (callable, optional): Called with the model to release it.
+            size_mb (float, optional): Expected size, used to make room before
+                the first load. Measured sizes replace it afterwards.
+        """
+        with self._lock:
+            self._loaders[name] = loader
+            self._unloaders[name] = unloader
+            self._locks.setdefault(name, threading.Lock())
+            if size_mb is not None:
+                self.sizes.setdefault(name, int(size_mb * MB))
+
+    def names(self):
+        return list(self._loaders)
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def get(self, name):
+        """Return the model, loading it on first use (or again after an eviction)."""
+        model = self._models.get(name)
+        if model is not None:
+            self._last_used[name] = time.monotonic()
+            return model
+        if name not in self._loaders:
+            raise KeyError(f"Unknown model: {name}")
+        with self._locks[name]:
+            model = self._models.get(name)
+            if model is None:
+                self._make_room(self.sizes.get(name, 0), keep=name)
+                rss_before = _rss_bytes()
+                start = time.monotonic()
+                with tracing.span("model_load", model=name):
+                    model = self._loaders[name]()
+                end = time.monotonic()
+                rss_after = _rss_bytes()
+                grown = rss_after - rss_before if rss_before is not None and rss_after is not None else 0
+                with self._lock:
+                    self._models[name] = model
+                    self._last_used[name] = end
+                    self.sizes[name] = max(self.sizes.get(name, 0), estimate_size(model), grown)
+                    self.loads[name] = self.loads.get(name, 0) + 1
+                tracing.incr("model_loads", model=name)
+                self.load_seconds[name] = end - start
+                self.ready_after.setdefault(name, end - STARTED_AT)
+                self._make_room(0, keep=name)
+                self._start_reaper()
+            self._last_used[name] = time.monotonic()
+        return model
+
+    @contextmanager
+    def use(self, name):
+        """
+        Get a model and keep it loaded for the duration of the block.
+
+        Example:
+            with registry.use("captioner") as (model, processor, tokenizer):
+                ...
+        """
+        with self._lock:
+            self._pins[name] = self._pins.get(name, 0) + 1
+        try:
+            yield self.get(name)
+        finally:
+            with self._lock:
+                self._pins[name] -= 1
+                self._last_used[name] = time.monotonic()
+
+    def unload(self, name):
+        """Release a loaded model; the next `get` loads it again."""
+        with self._locks[name]:
+            self._release(name)
+
+    def _release(self, name, reason=None):
+        with self._lock:
+            model = self._models.pop(name, None)
+            if model is not None and reason is not None:
+                self.evictions[name] = self.evictions.get(name, 0) + 1
+        if model is None:
+            return False
+        unloader = self._unloaders.get(name)
+        if unloader is not None:
+            unloader(model)
+        del model
+        # Model graphs hold reference cycles; collect them so the memory is returned now.
+        gc.collect()
+        if reason is None:
+            tracing.incr("model_unloads", model=name)
+        else:
+            tracing.incr("model_evictions", model=name, reason=reason)
+        return True
+
+    def _evict(self, name, reason):
+        """Unload `name` unless it is pinned or busy loading; returns True if it was unloaded."""
+        lock = self._locks[name]
+        if not lock.acquire(blocking=False):
+            return False
+        try:
+            with self._lock:
+                if self._pins.get(name) or name not in self._models:
+                    return False
+            return self._release(name, reason)
+        finally:
+            lock.release()
+
+    def resident_bytes(self):
+        """Estimated memory held by the loaded models."""
+        return sum(self.sizes.get(name, 0) for name in list(self._models))
+
+    def _make_room(self, needed, keep=None):
+        """Evict least recently used models until `needed` more bytes fit the budget."""
+        if not self.budget_mb:
+            return
+        budget = self.budget_mb * MB
+        candidates = sorted((self._last_used.get(name, 0.0), name) for name in list(self._models) if name != keep)
+        for _, name in candidates:
+            if self.resident_bytes() + needed <= budget:
+                return
+            self._evict(name, "budget")
+        if self.resident_bytes() + needed > budget:
+            print(f"⚠ Models need {(self.resident_bytes() + needed) / MB:.0f} MB, "
+                  f"over the {self.budget_mb:.0f} MB budget (the rest are in use)")
+
+    def evict_idle(self, now=None):
+        """
+        Unload models that have not been used for `idle_seconds`.
+
+        Returns:
+            list: Names of the evicted models.
+        """
+        if not self.idle_seconds:
+            return []
+        now = time.monotonic() if now is None else now
+        idle = [name for name in list(self._models) if now - self._last_used.get(name, now) >= self.idle_seconds]
+        return [name for name in idle if self._evict(name, "idle")]
+
+    def _start_reaper(self):
+        if not self.idle_seconds or (self._reaper is not None and self._reaper.is_alive()):
+            return
+        self._reaper = threading.Thread(target=self._reap, name="model-reaper", daemon=True)
+        self._reaper.start()
+
+    def _reap(self):
+        while self.idle_seconds and self._models:
+            time.sleep(min(max(self.idle_seconds / 4, 1.0), 30.0))
+            self.evict_idle()
+
+    def warmup(self, names=None):
+        """Load the given models (default: all registered ones) now."""
+        for name in names or self.names():
+            try:
+                self.get(name)
+                print(f"⏱ {name} ready in {self.load_seconds[name]:.2f}s "
+                      f"({self.ready_after[name]:.2f}s after start)")
+            except Exception as e:
+                print(f"⚠ Failed to load {name}: {e}")
+
+    def warmup_async(self, names=None):
+        """
+        Load models on a background thread.
+
+        Returns:
+            threading.Thread: The started warm-up thread.
+        """
+        thread = threading.Thread(target=self.warmup, args=(names,), name="model-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self):
+        """
+        Return per-model state: loaded/pinned, size and resident size in MB,
+        load and eviction counts, seconds since last use, last load duration
+        and time-to-ready in seconds.
+        """
+        now = time.monotonic()
+        stats = {}
+        for name in self.names():
+            loaded = name in self._models
+            size = self.sizes.get(name, 0) / MB
+            last_used = self._last_used.get(name)
+            stats[name] = {
+                "loaded": loaded,
+                "pinned": bool(self._pins.get(name)),
+                "size_mb": size,
+                "resident_mb": size if loaded else 0.0,
+                "loads": self.loads.get(name, 0),
+                "evictions": self.evictions.get(name, 0),
+                "idle_seconds": now - last_used if loaded and last_used is not None else None,
+                "load_seconds": self.load_seconds.get(name),
+                "ready_after_start": self.ready_after.get(name),
+            }
+        return stats
+
+    def memory_stats(self):
+        """Return the budget, total resident size (MB) and total load/eviction counts."""
+        return {
+            "budget_mb": self.budget_mb,
+            "idle_seconds": self.idle_seconds,
+            "resident_mb": self.resident_bytes() / MB,
+            "loads": sum(self.loads.values()),
+            "evictions": sum(self.evictions.values()),
+        }
+
+
+def _env_float(name):
+    value = os.environ.get(name)
+    try:
+        return float(value) if value else None
+    except ValueError:
+        print(f"⚠ Ignoring {name}={value!r} (not a number)")
+        return None
+
+
+# Shared registry used by the caption, translation and face modules.
+# MOBSIR_MODEL_BUDGET_MB and MOBSIR_MODEL_IDLE_SECONDS enable eviction.
+registry = ModelRegistry(budget_mb=_env_float("MOBSIR_MODEL_BUDGET_MB"),
+                         idle_seconds=_env_float("MOBSIR_MODEL_IDLE_SECONDS"))
+
+
+def _collect_registry_metrics():
+    # Loads and evictions are exported as the model_loads/model_evictions counters.
+    for name, info in registry.stats().items():
+        yield "model_loaded", int(info["loaded"]), {"model": name}
+        yield "model_resident_bytes", int(info["resident_mb"] * MB), {"model": name}
+        if info["load_seconds"] is not None:
+            yield "model_load_seconds", info["load_seconds"], {"model": name}
+            yield "model_ready_after_start_seconds", info["ready_after_start"], {"model": name}
+
+
+tracing.add_collector(_collect_registry_metrics)
@@ -0,0 +1,402 @@
+import re
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from Core import tracing
+from Computer_Vision.Image_Caption import get_caption, stream_caption, using_captioner
+from Computer_Vision.face_recognition import recognize_family_faces
+from Computer_Vision.scene_cache import get_scene_cache
+from NLP.Translation import translate_text
+
+FAMILY_FOLDER = "family"
+PROMPT_DESCRIBING = "تم التقاط الصورة، جاري إنشاء الوصف..."
+
+# Blocking model calls run here so they never stall the asyncio loop.
+_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="explore")
+tracing.add_collector(lambda: [("queue_depth", _executor._work_queue.qsize(), {"queue": "explore_executor"})])
+tracing.add_collector(lambda: [("scene_cache_" + name, value, {})
+                               for name, value in get_scene_cache().stats().items()])
+
+
+def contains_person_keywords(text):
+    """Check if the caption contains person-related keywords."""
+    english_keywords = [
+        'person', 'people', 'man', 'woman', 'men', 'women',
+        'boy', 'girl', 'child', 'children', 'baby', 'adult',
+        'guy', 'lady', 'gentleman', 'individual', 'human',
+        'someone', 'somebody', 'figure', 'character'
+    ]
+
+    arabic_keywords = [
+        'شخص', 'أشخاص', 'رجل', 'امرأة', 'رجال', 'نساء',
+        'ولد', 'بنت', 'طفل', 'أطفال', 'طفلة', 'بالغ',
+        'شاب', 'فتاة', 'سيدة', 'أحد', 'شخصية', 'فرد'
+    ]
+
+    all_keywords = english_keywords + arabic_keywords
+    text_lower = text.lower()
+
+    for keyword in all_keywords:
+        if re.search(r'\b' + re.escape(keyword) + r'\b', text_lower):
+            return True
+    return False
+
+
+def enhance_caption_with_family(original_caption, family_members):
+    """Enhance the caption with family member names if any were recognized."""
+    valid_names = [name for name in family_members if name and name.strip()]
+    if valid_names:
+        names_text = "، ".join(valid_names)
+        return f"{original_caption} كما يوجد في الصورة: {names_text}.", valid_names
+    return original_caption, []
+
+
+class PhraseSegmenter:
+    """
+    Groups streamed caption text into phrases that are worth translating alone.
+
+    The first phrase is cut at punctuation or before a connector word ("with",
+    "and", "while", ...) once it has at least `min_words` words, so the first
+    translated segment can be spoken early. Everything after it is kept
+    together and released by `flush`, so the rest of the caption is still
+    translated with its full context, like the full-sentence path.
+
+    Args:
+        min_words (int, optional): Words needed before the first cut. Default is 4.
+        max_segments (int, optional): Maximum number of phrases. Default is 2.
+    """
+
+    BOUNDARY_WORDS = {"with", "and", "while", "near", "next", "beside", "behind", "under", "holding"}
+
+    def __init__(self, min_words=4, max_segments=2):
+        self.min_words = min_words
+        self.max_segments = max_segments
+        self._text = ""
+        self._emitted = 0
+
+    def feed(self, piece):
+        """
+        Add decoded text; return the list of phrases completed by it.
+        """
+        self._text += piece
+        if self._emitted >= self.max_segments - 1:
+            return []
+        words = self._text.split()
+        # The last word may still be incomplete, so only cut before it.
+        for i in range(self.min_words, len(words) - 1):
+            previous = words[i - 1]
+            if words[i].lower() in self.BOUNDARY_WORDS or previous[-1] in ",;:.!?":
+                phrase = " ".join(words[:i]).rstrip(",;:")
+                self._text = " ".join(words[i:]) + (" " if self._text.endswith(" ") else "")
+                self._emitted += 1
+                return [phrase]
+        return []
+
+    def flush(self):
+        """Return the remaining text as the last phrase (if any)."""
+        rest = self._text.strip()
+        self._text = ""
+        return [rest] if rest else []
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def _caption_frame(frame):
+    with using_captioner() as captioner:
+        return get_caption(*captioner, frame)
+
+
+def _discard_result(task):
+    # Retrieve the outcome so an unused failure is not reported as unhandled.
+    if not task.cancelled():
+        task.exception()
+
+
+async def _run_blocking(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, lambda: _timed(fn, *args, **kwargs))
+
+
+def _family_sentence(family_members):
+    return f"كما يوجد من أفراد العائلة: {'، '.join(family_members)}"
+
+
+async def _replay_cached_scene(frame, speak, cache, started):
+    """Speak the stored description of a near-identical recent frame, if there is one."""
+    cached = cache.lookup(frame)
+    if cached is None:
+        return None
+    print(f"♻ Same scene as {cached['scene_age']:.0f}s ago, reusing its description")
+    timings = {}
+    if speak:
+        speak_start = time.perf_counter()
+        # Speak exactly the texts spoken the first time, so the audio comes from the TTS cache.
+        segments = cached.get("segments") or [cached["translation"]]
+        for i, segment in enumerate(segments):
+            await speak(f"وصف الصورة: {segment}" if i == 0 else segment, stream=True)
+        if cached["family"]:
+            await speak(_family_sentence(cached["family"]))
+        timings["speak"] = time.perf_counter() - speak_start
+    timings["total"] = time.perf_counter() - started
+    tracing.record_timings("explore_cached", timings)
+    cached.update(timings=timings, cached=True)
+    return cached
+
+
+def _remember_scene(cache, frame, result):
+    if cache.ttl > 0:
+        cache.store(frame, {key: value for key, value in result.items() if key != "timings"})
+
+
+async def explore_scene(frame, speak=None, family_folder=FAMILY_FOLDER, prompt=PROMPT_DESCRIBING,
+                        force_refresh=False, scene_cache=None):
+    """
+    Describe a captured scene with the caption, face and speech stages overlapped.
+
+    A frame that looks like one described in the last minute (see
+    Computer_Vision/scene_cache.py) gets the stored description right away,
+    unless `force_refresh` is set.
+
+    Stages:
+    - The "generating description" prompt is spoken while inference runs.
+    - Captioning and face recognition start together on worker threads; the
+      face result is used only if the caption mentions a person, as before,
+      but it no longer has to wait for the caption to start.
+    - The (family-enhanced) caption is translated on a worker thread and spoken.
+
+    Args:
+        frame (numpy.ndarray): RGB frame from `capture_frame`.
+        speak (coroutine function, optional): `speak(text, stream=False)`,
+            e.g. `edge_speak`. Without it nothing is spoken.
+        family_folder (str, optional): Family folder for face recognition.
+        prompt (str, optional): Spoken while the description is generated.
+        force_refresh (bool, optional): Ignore the scene cache and describe the
+            frame again. Default is False.
+        scene_cache (SceneCache, optional): Defaults to the shared one.
+
+    Returns:
+        dict: caption, translation, description, family, faces, cached (True if
+        the description was reused) and per-stage timings in seconds (caption,
+        faces, translate, prompt_wait, speak, total).
+    """
+    started = time.perf_counter()
+    cache = scene_cache or get_scene_cache()
+    if not force_refresh:
+        cached = await _replay_cached_scene(frame, speak, cache, started)
+        if cached is not None:
+            return cached
+    timings = {}
+
+    prompt_task = asyncio.create_task(speak(prompt)) if speak and prompt else None
+    caption_task = asyncio.create_task(_run_blocking(_caption_frame, frame))
+    faces_task = asyncio.create_task(_run_blocking(recognize_family_faces, family_folder, frame))
+
+    try:
+        caption, timings["caption"] = await caption_task
+    except Exception:
+        faces_task.add_done_callback(_discard_result)
+        if prompt_task is not None:
+            await asyncio.gather(prompt_task, return_exceptions=True)
+        raise
+    print(f"Original caption: {caption}")
+
+    faces, family_members = [], []
+    if contains_person_keywords(caption):
+        print("Person detected in caption. Using family recognition...")
+        try:
+            faces, timings["faces"] = await faces_task
+            family_members = list(dict.fromkeys(f["label"] for f in faces if f["label"]))
+        except Exception as e:
+            print(f"Warning: Family recognition failed: {e}")
+    else:
+        print("No person mentioned in caption. Skipping family recognition.")
+        # The speculative face run finishes on its own in the background.
+        faces_task.add_done_callback(_discard_result)
+
+    enhanced_caption, family_members = enhance_caption_with_family(caption, family_members)
+    translation, timings["translate"] = await _run_blocking(translate_text, enhanced_caption)
+    description = f"وصف الصورة: {translation}"
+
+    if prompt_task is not None:
+        prompt_start = time.perf_counter()
+        await prompt_task
+        timings["prompt_wait"] = time.perf_counter() - prompt_start
+
+    if speak:
+        speak_start = time.perf_counter()
+        await speak(description, stream=True)
+        if family_members:
+            await speak(_family_sentence(family_members))
+        timings["speak"] = time.perf_counter() - speak_start
+
+    timings["total"] = time.perf_counter() - started
+    tracing.record_timings("explore", timings)
+    result = {
+        "caption": caption,
+        "translation": translation,
+        "description": description,
+        "family": family_members,
+        "faces": faces,
+        "cached": False,
+        "timings": timings,
+    }
+    _remember_scene(cache, frame, result)
+    return result
+
+
+async def explore_scene_incremental(frame, speak=None, family_folder=FAMILY_FOLDER, prompt=PROMPT_DESCRIBING,
+                                    force_refresh=False, scene_cache=None):
+    """
+    Describe a scene while the caption is still being generated.
+
+    Caption tokens are streamed from the model, grouped into phrases by
+    PhraseSegmenter, translated phrase by phrase and spoken as soon as the
+    first translated phrase is ready. Face recognition runs alongside; when
+    the caption mentions a person the recognized family members are spoken
+    after the description. Recent near-identical scenes are answered from the
+    scene cache as in `explore_scene`.
+
+    Args:
+        frame (numpy.ndarray): RGB frame from `capture_frame`.
+        speak (coroutine function, optional): `speak(text, stream=False)`.
+        family_folder (str, optional): Family folder for face recognition.
+        prompt (str, optional): Spoken while the first phrase is prepared.
+        force_refresh (bool, optional): Ignore the scene cache. Default is False.
+        scene_cache (SceneCache, optional): Defaults to the shared one.
+
+    Returns:
+        dict: Same keys as `explore_scene`, plus "segments"; timings also
+        include first_token and first_audio (seconds from the start).
+    """
+    started = time.perf_counter()
+    cache = scene_cache or get_scene_cache()
+    if not force_refresh:
+        cached = await _replay_cached_scene(frame, speak, cache, started)
+        if cached is not None:
+            return cached
+    timings = {}
+    loop = asyncio.get_running_loop()
+    pieces = asyncio.Queue()
+    done = object()
+
+    stop = threading.Event()
+
+    def hand_off(item):
+        # The explore call may have been cancelled (and its loop closed) meanwhile.
+        if stop.is_set() or loop.is_closed():
+            return False
+        try:
+            loop.call_soon_threadsafe(pieces.put_nowait, item)
+        except RuntimeError:
+            return False
+        return True
+
+    def produce_caption():
+        try:
+            with using_captioner() as captioner:
+                for piece in stream_caption(*captioner, frame):
+                    if not hand_off(piece):
+                        break
+        except Exception as e:
+            hand_off(e)
+        finally:
+            hand_off(done)
+
+    prompt_task = asyncio.create_task(speak(prompt)) if speak and prompt else None
+    faces_task = asyncio.create_task(_run_blocking(recognize_family_faces, family_folder, frame))
+    caption_future = loop.run_in_executor(_executor, produce_caption)
+
+    segments = asyncio.Queue()
+
+    async def translate_phrases():
+        segmenter = PhraseSegmenter()
+        caption = ""
+        try:
+            while True:
+                piece = await pieces.get()
+                if piece is done:
+                    break
+                if isinstance(piece, Exception):
+                    raise piece
+                if not caption:
+                    timings["first_token"] = time.perf_counter() - started
+                caption += piece
+                for phrase in segmenter.feed(piece):
+                    translated, _ = await _run_blocking(translate_text, phrase)
+                    await segments.put(translated)
+            timings["caption"] = time.perf_counter() - started
+            for phrase in segmenter.flush():
+                translated, _ = await _run_blocking(translate_text, phrase)
+                await segments.put(translated)
+            return caption.strip()
+        finally:
+            await segments.put(done)
+
+    translate_task = asyncio.create_task(translate_phrases())
+    finished = False
+    try:
+        spoken = []
+        if prompt_task is not None:
+            await prompt_task
+        while True:
+            segment = await segments.get()
+            if segment is done:
+                break
+            if not spoken:
+                timings["first_audio"] = time.perf_counter() - started
+                segment_text = f"وصف الصورة: {segment}"
+            else:
+                segment_text = segment
+            spoken.append(segment)
+            if speak:
+                await speak(segment_text, stream=True)
+
+        await caption_future
+        caption = await translate_task
+        print(f"Original caption: {caption}")
+
+        faces, family_members = [], []
+        if contains_person_keywords(caption):
+            try:
+                faces, timings["faces"] = await faces_task
+                family_members = list(dict.fromkeys(f["label"] for f in faces if f["label"]))
+            except Exception as e:
+                print(f"Warning: Family recognition failed: {e}")
+        else:
+            faces_task.add_done_callback(_discard_result)
+
+        if speak and family_members:
+            await speak(_family_sentence(family_members))
+
+        translation = " ".join(spoken)
+        timings["total"] = time.perf_counter() - started
+        tracing.record_timings("explore_incremental", timings)
+        result = {
+            "caption": caption,
+            "translation": translation,
+            "description": f"وصف الصورة: {translation}",
+            "family": family_members,
+            "faces": faces,
+            "segments": spoken,
+            "cached": False,
+            "timings": timings,
+        }
+        finished = True
+    finally:
+        if not finished:
+            # Cancelled or failed: stop the caption thread and do not leave the
+            # child tasks running (or their failures unretrieved).
+            stop.set()
+            children = [task for task in (prompt_task, faces_task, translate_task) if task is not None]
+            for task in children:
+                task.cancel()
+            await asyncio.gather(*children, return_exceptions=True)
+            caption_future.add_done_callback(_discard_result)
+
+    _remember_scene(cache, frame, result)
+    return result
@@ -0,0 +1,331 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import Future
+import cv2
+import numpy as np
+from Core import tracing
+from Computer_Vision.camera import get_camera
+from Computer_Vision.frames import bgr_to_rgb
+
+
+def frame_signature(frame, size=(32, 24)):
+    """
+    Cheap fingerprint for change detection: a small, blurred, mean-centred gray thumbnail.
+
+    Removing the mean makes the comparison ignore global exposure changes
+    (auto-exposure, a cloud passing), so only changes in the scene's content count.
+
+    Args:
+        frame (numpy.ndarray): BGR frame.
+        size (tuple, optional): Thumbnail (width, height). Default is (32, 24).
+
+    Returns:
+        numpy.ndarray: float32 thumbnail.
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    small = cv2.resize(gray, size, interpolation=cv2.INTER_AREA).astype(np.float32)
+    small = cv2.GaussianBlur(small, (3, 3), 0)
+    return small - small.mean()
+
+
+def change_score(a, b):
+    """Mean absolute difference of two signatures, scaled to 0-1."""
+    return float(np.mean(np.abs(a - b)) / 255.0)
+
+
+def _done_future():
+    future = Future()
+    future.set_result(None)
+    return future
+
+
+class SceneMonitor:
+    """
+    Watches the camera at a low frame rate and describes the scene when it changes.
+
+    Each sample costs one thumbnail comparison. A description (the `describe`
+    callback, e.g. the explore pipeline) is only requested when the frame
+    differs from the last described one by more than `threshold` and has been
+    steady for `settle_samples` samples, so walking past or turning the
+    camera does not trigger a burst of descriptions.
+
+    The CPU budget caps the monitor's average CPU use (process CPU time, so
+    the model threads are counted) as a fraction of one core: after a
+    description that took `c` CPU seconds, the next one waits until the
+    average is back under the budget, and sampling slows down if even the
+    comparisons exceed it.
+
+    With a FaceTracker, every sample also runs face detection (identity
+    matching only for new or uncertain faces) and `announce` is called with
+    the family members who just arrived.
+
+    `describe` and `announce` may be coroutine functions. They then run on an
+    event loop owned by the monitor thread, and `pause` and `stop` cancel a
+    description or announcement that is still running (its speech stops with
+    it), so the monitor never talks over or delays the answer to a command.
+    Both return a concurrent.futures.Future that completes once the monitor
+    has gone quiet; async callers await it with `asyncio.wrap_future`
+    instead of blocking their event loop.
+
+    Args:
+        describe (callable): Called with the RGB frame when the scene changed.
+        camera (CameraManager, optional): Frame provider. Defaults to the shared camera.
+        source (FrameSource, optional): Read frames directly from this source
+            instead of the camera (e.g. FileFrameSource for offline tests).
+        fps (float, optional): Samples per second. Default is 1.
+        threshold (float, optional): Change score that counts as a new scene. Default is 0.08.
+        settle_samples (int, optional): Steady samples needed before describing. Default is 2.
+        cpu_budget (float, optional): Average CPU share (of one core) allowed. Default is 0.25.
+        min_interval (float, optional): Minimum seconds between descriptions. Default is 5.
+        tracker (FaceTracker, optional): Follows faces between samples.
+        announce (callable, optional): Called with the list of newly arrived names.
+    """
+
+    def __init__(self, describe, camera=None, source=None, fps=1.0, threshold=0.08, settle_samples=2,
+                 cpu_budget=0.25, min_interval=5.0, tracker=None, announce=None):
+        self.describe = describe
+        self.camera = camera
+        self.source = source
+        self.fps = fps
+        self.threshold = threshold
+        self.settle_samples = settle_samples
+        self.cpu_budget = cpu_budget
+        self.min_interval = min_interval
+        self.tracker = tracker
+        self.announce = announce
+        self._reference = None
+        self._previous = None
+        self._steady = 0
+        self._next_allowed = 0.0
+        self._interval = 1.0 / fps
+        self._running = False
+        self._paused = threading.Event()
+        self._thread = None
+        self._stopping = None
+        self._inflight = None
+        self._inflight_lock = threading.Lock()
+        self.stats = {"samples": 0, "changes": 0, "descriptions": 0, "deferred": 0, "cancelled": 0,
+                      "arrivals": 0, "errors": 0, "sample_cpu": 0.0, "describe_cpu": 0.0}
+
+    @property
+    def is_running(self):
+        return self._running
+
+    def start(self):
+        """Start monitoring on a background thread (no-op if already running)."""
+        if self._running:
+            return
+        if self._stopping is not None:
+            # Let the previous run finish shutting down first.
+            self._stopping.result()
+            self._stopping = None
+        if self.source is not None:
+            self.source.open()
+        self._running = True
+        self._paused.clear()
+        self._thread = threading.Thread(target=self._run, name="scene-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop monitoring, cancel a running description and forget the reference scene.
+
+        The monitor thread is joined on a helper thread, so this returns at once.
+
+        Returns:
+            concurrent.futures.Future: Done when the monitor thread has exited
+            and the frame source is released.
+        """
+        self._running = False
+        self._cancel_inflight()
+        thread, self._thread = self._thread, None
+        if thread is None or thread is threading.current_thread():
+            self._finish_stop(None)
+            return _done_future()
+        stopping = Future()
+
+        def finish():
+            try:
+                self._finish_stop(thread)
+                stopping.set_result(None)
+            except Exception as e:
+                stopping.set_exception(e)
+
+        threading.Thread(target=finish, name="scene-monitor-stop", daemon=True).start()
+        self._stopping = stopping
+        return stopping
+
+    def _finish_stop(self, thread):
+        if thread is not None:
+            thread.join(timeout=5)
+        if self.source is not None:
+            self.source.release()
+        self._reference = None
+        self._previous = None
+        self._steady = 0
+        if self.tracker is not None:
+            self.tracker.reset()
+
+    def pause(self):
+        """
+        Skip sampling (e.g. while a voice command is being handled) and cancel
+        a description or announcement that is still running.
+
+        Returns:
+            concurrent.futures.Future: Done when the cancelled call has finished
+            (already done if nothing was running).
+        """
+        self._paused.set()
+        return self._cancel_inflight()
+
+    def resume(self):
+        self._paused.clear()
+
+    def _call(self, callback, *args):
+        """
+        Run a callback; coroutine functions run on a private event loop and
+        can be cancelled from other threads by `_cancel_inflight`.
+
+        Returns:
+            bool: False if the call was cancelled.
+        """
+        if not asyncio.iscoroutinefunction(callback):
+            callback(*args)
+            return True
+        loop = asyncio.new_event_loop()
+        finished = Future()
+        try:
+            task = loop.create_task(callback(*args))
+            with self._inflight_lock:
+                self._inflight = (loop, task, finished)
+            # A pause or stop that came just before the task was registered.
+            if self._paused.is_set() or (self._thread is not None and not self._running):
+                task.cancel()
+            try:
+                loop.run_until_complete(task)
+            except asyncio.CancelledError:
+                self.stats["cancelled"] += 1
+                return False
+            return True
+        finally:
+            with self._inflight_lock:
+                self._inflight = None
+            loop.close()
+            finished.set_result(None)
+
+    def _cancel_inflight(self):
+        """Cancel the running coroutine callback; return a future done when it has ended."""
+        with self._inflight_lock:
+            if self._inflight is None:
+                return _done_future()
+            loop, task, finished = self._inflight
+        try:
+            loop.call_soon_threadsafe(task.cancel)
+        except RuntimeError:
+            # The loop has just finished.
+            pass
+        return finished
+
+    def _read(self):
+        if self.source is not None:
+            ok, frame = self.source.read()
+            return frame if ok else None
+        camera = self.camera or get_camera()
+        return camera.get_frame(timeout=1.0, sharpest=False)
+
+    def step(self, frame=None):
+        """
+        Process one sample.
+
+        Args:
+            frame (numpy.ndarray, optional): BGR frame; read from the source if omitted.
+
+        Returns:
+            bool: True if the scene was described.
+        """
+        cpu_start = time.process_time()
+        frame = self._read() if frame is None else frame
+        if frame is None:
+            return False
+        signature = frame_signature(frame)
+        rgb = bgr_to_rgb(frame)
+        self.stats["samples"] += 1
+        if self.tracker is not None:
+            self._track_faces(rgb)
+
+        if self._reference is None:
+            # The first frame is the starting scene; it is described once.
+            changed, score = True, 1.0
+        else:
+            score = change_score(signature, self._reference)
+            changed = score > self.threshold
+        steady = self._previous is not None and change_score(signature, self._previous) <= self.threshold / 2
+        self._previous = signature
+        self._steady = self._steady + 1 if steady else 0
+        self.stats["sample_cpu"] += time.process_time() - cpu_start
+        tracing.observe("scene_change_score", score, buckets=(0.02, 0.05, 0.08, 0.12, 0.2, 0.3, 0.5, 1.0))
+
+        if not changed or (self._reference is not None and self._steady < self.settle_samples - 1):
+            return False
+        self.stats["changes"] += 1
+        now = time.monotonic()
+        if now < self._next_allowed:
+            self.stats["deferred"] += 1
+            return False
+
+        if self._paused.is_set():
+            return False
+        cpu_start = time.process_time()
+        wall_start = time.monotonic()
+        try:
+            with tracing.span("scene_describe", score=round(score, 3)):
+                if not self._call(self.describe, rgb):
+                    # Cancelled by `pause`/`stop`: describe this scene again later.
+                    return False
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"⚠ Scene monitor failed to describe the scene: {e}")
+        cpu = time.process_time() - cpu_start
+        self.stats["describe_cpu"] += cpu
+        self.stats["descriptions"] += 1
+        self._reference = signature
+        self._steady = 0
+        # Rest long enough that this description averages out to the CPU budget.
+        rest = cpu / self.cpu_budget - (time.monotonic() - wall_start) if self.cpu_budget else 0.0
+        self._next_allowed = time.monotonic() + max(self.min_interval, rest)
+        return True
+
+    def _track_faces(self, rgb):
+        try:
+            _, arrivals = self.tracker.update(rgb)
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"⚠ Scene monitor failed to track faces: {e}")
+            return
+        if arrivals:
+            self.stats["arrivals"] += len(arrivals)
+            if self.announce is not None and not self._paused.is_set():
+                try:
+                    self._call(self.announce, arrivals)
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    print(f"⚠ Scene monitor failed to announce arrivals: {e}")
+
+    def _run(self):
+        while self._running:
+            started = time.monotonic()
+            if not self._paused.is_set():
+                cpu_start = time.process_time()
+                described = self.step()
+                sample_cpu = time.process_time() - cpu_start
+                # Sampling alone must also stay within the budget.
+                if self.cpu_budget and not described:
+                    self._interval = max(1.0 / self.fps, sample_cpu / self.cpu_budget)
+            elapsed = time.monotonic() - started
+            if self._interval > elapsed:
+                time.sleep(self._interval - elapsed)
+
+    def get_stats(self):
+        """Return the counters plus the current sampling interval in seconds."""
+        return dict(self.stats, interval=self._interval)
@@ -0,0 +1,384 @@
+"""
+Lightweight tracing and metrics: spans, counters, gauges and histograms.
+
+Disabled by default. When disabled, `span` returns a shared no-op object and
+the metric functions return after a single flag check, so instrumented code
+pays almost nothing.
+
+Enable it with `configure(...)` or by setting MOBSIR_TRACE_DIR before the
+first import. Events (finished spans and explore timings) are appended to a
+size-rotated JSONL file, and every metric is written periodically to a
+Prometheus text-format file (for node_exporter's textfile collector or
+manual inspection).
+
+Environment variables:
+    MOBSIR_TRACE_DIR: Folder for trace.jsonl and mobsir.prom; enables tracing.
+    MOBSIR_TRACE_INTERVAL: Seconds between Prometheus file writes. Default is 15.
+    MOBSIR_TRACE_MAX_BYTES: JSONL size before rotation. Default is 5 MB.
+"""
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+from logging.handlers import RotatingFileHandler
+
+METRIC_PREFIX = "mobsir_"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_enabled = False
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_histograms = {}
+_collectors = []
+_events = None
+_prometheus_path = None
+_flush_interval = 15.0
+_flush_thread = None
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def is_enabled():
+    return _enabled
+
+
+class _NoopSpan:
+    duration = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """
+    A timed section of work. Use through `span(...)`.
+
+    On exit its duration is added to the `span_seconds` histogram (labelled
+    with the span name) and written to the JSONL event log with its attributes.
+    """
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.duration = None
+        self._start = None
+
+    def set(self, **attrs):
+        """Attach attributes discovered while the span is running."""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._start
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        record_span(self.name, self.duration, **self.attrs)
+        return False
+
+
+def span(name, **attrs):
+    """
+    Time a block of code: `with tracing.span("caption", batch=4): ...`.
+
+    Returns:
+        Span: A context manager (a shared no-op one when tracing is disabled).
+    """
+    if not _enabled:
+        return _NOOP_SPAN
+    return Span(name, attrs)
+
+
+def traced(name=None):
+    """Decorator that wraps every call of a function in a span."""
+    def decorate(fn):
+        span_name = name or fn.__name__
+
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with Span(span_name, {}):
+                return fn(*args, **kwargs)
+
+        wrapper.__name__ = fn.__name__
+        wrapper.__doc__ = fn.__doc__
+        wrapper.__wrapped__ = fn
+        return wrapper
+    return decorate
+
+
+def record_span(name, seconds, **attrs):
+    """Record a span that was already timed by the caller."""
+    if not _enabled:
+        return
+    observe("span_seconds", seconds, span=name)
+    if attrs.get("error"):
+        incr("span_errors", span=name)
+    emit("span", name=name, duration_ms=round(seconds * 1000, 3), **attrs)
+
+
+def record_timings(flow, timings):
+    """
+    Record a dict of stage timings (seconds), e.g. the "timings" of `explore_scene`.
+
+    Each stage goes to the `stage_seconds` histogram labelled with the flow
+    and stage, and the whole dict is written as one JSONL event.
+    """
+    if not _enabled:
+        return
+    for stage, seconds in timings.items():
+        if seconds is not None:
+            observe("stage_seconds", seconds, flow=flow, stage=stage)
+    emit("timings", flow=flow, **{stage: round(s * 1000, 3) for stage, s in timings.items() if s is not None})
+
+
+def incr(name, value=1, **labels):
+    """Add to a counter (exported as `mobsir_<name>_total`)."""
+    if not _enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def set_gauge(name, value, **labels):
+    """Set a gauge, e.g. a queue depth."""
+    if not _enabled:
+        return
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def observe(name, value, buckets=DEFAULT_BUCKETS, **labels):
+    """Add a value (usually seconds) to a histogram."""
+    if not _enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {"buckets": buckets, "counts": [0] * len(buckets),
+                                            "sum": 0.0, "count": 0}
+        for i, bound in enumerate(histogram["buckets"]):
+            if value <= bound:
+                histogram["counts"][i] += 1
+        histogram["sum"] += value
+        histogram["count"] += 1
+
+
+def add_collector(collector):
+    """
+    Register a function polled at export time for gauges it does not push itself.
+
+    Args:
+        collector (callable): Returns an iterable of (name, value, labels_dict).
+    """
+    with _lock:
+        _collectors.append(collector)
+
+
+def emit(event_type, **fields):
+    """Write one event to the JSONL log."""
+    if not _enabled or _events is None:
+        return
+    record = {"ts": round(time.time(), 3), "type": event_type, "thread": threading.current_thread().name}
+    record.update(fields)
+    _events.info(json.dumps(record, ensure_ascii=False, default=str))
+
+
+def _collect():
+    samples = []
+    for collector in list(_collectors):
+        try:
+            samples.extend(collector())
+        except Exception as e:
+            print(f"⚠ Metrics collector failed: {e}")
+    return samples
+
+
+def snapshot():
+    """
+    Return the current metrics as plain data.
+
+    Returns:
+        dict: "counters", "gauges" (including collected ones) and "histograms",
+        each keyed by "name{label=value,...}".
+    """
+    def label(name, labels):
+        return name + ("{" + ",".join(f"{k}={v}" for k, v in labels) + "}" if labels else "")
+
+    collected = _collect()
+    with _lock:
+        gauges = {label(n, l): v for (n, l), v in _gauges.items()}
+        gauges.update({label(n, tuple(sorted(l.items()))): v for n, v, l in collected})
+        return {
+            "counters": {label(n, l): v for (n, l), v in _counters.items()},
+            "gauges": gauges,
+            "histograms": {label(n, l): {"count": h["count"], "sum": h["sum"]}
+                           for (n, l), h in _histograms.items()},
+        }
+
+
+def _format_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    escaped = []
+    for k, v in items:
+        value = str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        escaped.append(f'{k}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+def render_prometheus():
+    """Render every metric in the Prometheus text exposition format."""
+    collected = _collect()
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+        histograms = {k: dict(v, counts=list(v["counts"])) for k, v in _histograms.items()}
+    for name, value, labels in collected:
+        gauges[_key(name, labels)] = value
+
+    lines = []
+
+    def by_name(metrics):
+        grouped = {}
+        for (name, labels), value in metrics.items():
+            grouped.setdefault(name, []).append((labels, value))
+        return sorted(grouped.items())
+
+    for name, series in by_name(counters):
+        metric = f"{METRIC_PREFIX}{name}_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines += [f"{metric}{_format_labels(labels)} {value}" for labels, value in series]
+    for name, series in by_name(gauges):
+        metric = f"{METRIC_PREFIX}{name}"
+        lines.append(f"# TYPE {metric} gauge")
+        lines += [f"{metric}{_format_labels(labels)} {float(value)}" for labels, value in series]
+    for name, series in by_name(histograms):
+        metric = f"{METRIC_PREFIX}{name}"
+        lines.append(f"# TYPE {metric} histogram")
+        for labels, histogram in series:
+            for bound, count in zip(histogram["buckets"], histogram["counts"]):
+                lines.append(f"{metric}_bucket{_format_labels(labels, [('le', bound)])} {count}")
+            lines.append(f"{metric}_bucket{_format_labels(labels, [('le', '+Inf')])} {histogram['count']}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {histogram['sum']}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {histogram['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def export_prometheus(path=None):
+    """
+    Write the metrics to a Prometheus text file (atomically).
+
+    Returns:
+        str or None: The path written, or None if no path is configured.
+    """
+    path = path or _prometheus_path
+    if not path:
+        return None
+    try:
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(render_prometheus())
+        os.replace(tmp_path, path)
+        return path
+    except OSError as e:
+        print(f"⚠ Failed to write metrics to {path}: {e}")
+        return None
+
+
+def _flush_loop():
+    while _enabled:
+        time.sleep(_flush_interval)
+        export_prometheus()
+
+
+def configure(enabled=True, jsonl_path=None, prometheus_path=None, flush_interval=15.0,
+              max_bytes=5 * 1024 * 1024, backup_count=3):
+    """
+    Turn tracing on or off and choose where it is exported.
+
+    Args:
+        enabled (bool, optional): Record spans and metrics. Default is True.
+        jsonl_path (str, optional): Event log, rotated at `max_bytes`.
+        prometheus_path (str, optional): Prometheus text file, rewritten every
+            `flush_interval` seconds and at exit.
+        flush_interval (float, optional): Seconds between Prometheus writes. Default is 15.
+        max_bytes (int, optional): JSONL size before rotation. Default is 5 MB.
+        backup_count (int, optional): Rotated JSONL files kept. Default is 3.
+    """
+    global _enabled, _events, _prometheus_path, _flush_interval, _flush_thread
+    if _events is not None:
+        for handler in list(_events.handlers):
+            _events.removeHandler(handler)
+            handler.close()
+        _events = None
+
+    if enabled and jsonl_path:
+        folder = os.path.dirname(jsonl_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        handler = RotatingFileHandler(jsonl_path, maxBytes=max_bytes, backupCount=backup_count,
+                                      encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        _events = logging.getLogger("mobsir.trace")
+        _events.setLevel(logging.INFO)
+        _events.propagate = False
+        _events.addHandler(handler)
+
+    _prometheus_path = prometheus_path if enabled else None
+    _flush_interval = flush_interval
+    _enabled = enabled
+    if enabled and prometheus_path and (_flush_thread is None or not _flush_thread.is_alive()):
+        _flush_thread = threading.Thread(target=_flush_loop, name="metrics-export", daemon=True)
+        _flush_thread.start()
+
+
+def configure_from_env():
+    """Enable tracing if MOBSIR_TRACE_DIR is set."""
+    folder = os.environ.get("MOBSIR_TRACE_DIR")
+    if not folder:
+        return False
+    try:
+        interval = float(os.environ.get("MOBSIR_TRACE_INTERVAL", "15"))
+        max_bytes = int(os.environ.get("MOBSIR_TRACE_MAX_BYTES", str(5 * 1024 * 1024)))
+    except ValueError as e:
+        print(f"⚠ Invalid tracing setting: {e}")
+        interval, max_bytes = 15.0, 5 * 1024 * 1024
+    configure(jsonl_path=os.path.join(folder, "trace.jsonl"),
+              prometheus_path=os.path.join(folder, "mobsir.prom"),
+              flush_interval=interval, max_bytes=max_bytes)
+    return True
+
+
+def reset():
+    """Clear every recorded metric (collectors stay registered)."""
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _histograms.clear()
+
+
+configure_from_env()
+atexit.register(lambda: _enabled and export_prometheus())
@@ -1,17 +1,142 @@
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
-import torch
+from Core import tracing
+from Core.model_registry import registry
+from Core.inference_client import RemoteModel, remote_model
+from NLP.translation_cache import TranslationCache, make_cache_key, normalize_source_text
+from Core.model_backends import torch_threads
+from NLP.translation_backends import TRANSLATION_MODEL_NAME, default_backend, load_translation_backend
 
-tokenizer = AutoTokenizer.from_pretrained("marefa-nlp/marefa-mt-en-ar")
-model = AutoModelForSeq2SeqLM.from_pretrained("marefa-nlp/marefa-mt-en-ar")
+MODEL_NAME = TRANSLATION_MODEL_NAME
 
-def translate_text(text):
-    """ Translate English text to Arabic using the Marefa model """
-    inputs = tokenizer(text, return_tensors="pt", padding=True, truncation=True)
-    with torch.no_grad():
-        outputs = model.generate(**inputs, max_length=50)
-    return tokenizer.decode(outputs[0], skip_special_tokens=True)
+# "eager", "int8" or "onnx" (see NLP/translation_backends.py); set with
+# MOBSIR_TRANSLATION_BACKEND or set_translation_backend().
+translation_backend = default_backend()
+
+def _load_translator():
+    """ Load the Marefa tokenizer and model with the selected backend """
+    # With MOBSIR_INFERENCE_URL set the model lives in the inference server.
+    remote = remote_model("translate")
+    if remote is not None:
+        return None, remote
+    return load_translation_backend(translation_backend)
+
+registry.register("translator", _load_translator)
+
+def load_translator():
+    """ Return (tokenizer, model), loading them on first use """
+    return registry.get("translator")
+
+def set_translation_backend(name):
+    """ Switch the translator backend; the model is reloaded on the next translation """
+    global translation_backend
+    name = name.lower()
+    if name != translation_backend:
+        translation_backend = name
+        registry.unload("translator")
+
+# Captions and object names repeat a lot, so translations are cached in memory
+# and on disk, keyed by the normalized text and the generation settings.
+translation_cache = TranslationCache()
+
+def _collect_cache_metrics():
+    stats = translation_cache.stats()
+    return [("translation_cache_" + name, stats[name], {})
+            for name in ("hits", "misses", "hit_rate", "memory_entries")]
+
+tracing.add_collector(_collect_cache_metrics)
+
+def generate_translations(components, texts, max_length=50, num_beams=None):
+    """
+    Translate a batch of texts with one padded generate call.
+
+    Args:
+        components (tuple): (tokenizer, model) from any translation backend.
+        texts (list): English texts.
+        max_length (int, optional): Maximum output length. Default is 50.
+        num_beams (int, optional): 1 for greedy search, >1 for beam search.
+            Default is the model's own setting.
+
+    Returns:
+        list: Arabic translations in the same order as `texts`.
+    """
+    tokenizer, model = components
+    if isinstance(model, RemoteModel):
+        return model.client.translate(texts, max_length=max_length, num_beams=num_beams)
+    import torch
+    generation = {"max_length": max_length}
+    if num_beams is not None:
+        generation["num_beams"] = num_beams
+    inputs = tokenizer(texts, return_tensors="pt", padding=True, truncation=True)
+    # The torch backends carry their thread count; it is set for this call only.
+    with torch_threads(getattr(model, "torch_threads", None)), torch.inference_mode():
+        outputs = model.generate(**inputs, **generation)
+    return tokenizer.batch_decode(outputs, skip_special_tokens=True)
+
+def _generate_batch(texts, max_length, num_beams=None):
+    """ Translate a batch of texts with the loaded translator """
+    with registry.use("translator") as components:
+        return generate_translations(components, texts, max_length, num_beams)
+
+def _cache_settings(max_length, num_beams):
+    """ Generation settings that identify a cached translation """
+    settings = {"model": MODEL_NAME, "max_length": max_length}
+    # Eager default-search keys are left as they were so existing caches stay valid.
+    if translation_backend != "eager":
+        settings["backend"] = translation_backend
+    if num_beams is not None:
+        settings["num_beams"] = num_beams
+    return settings
+
+def translate_batch(texts, batch_size=16, max_length=50, use_cache=True, num_beams=None):
+    """
+    Translate a list of English texts to Arabic.
+
+    Cached translations are returned directly; the remaining unique texts are
+    padded together and translated with one `generate` call per batch.
+
+    Args:
+        texts (list): English texts to translate.
+        batch_size (int, optional): Texts per `generate` call. Default is 16.
+        max_length (int, optional): Maximum output length. Default is 50.
+        use_cache (bool, optional): Read and fill the translation cache. Default is True.
+        num_beams (int, optional): 1 for fast greedy search, >1 for beam search.
+            Default is the model's own setting.
+
+    Returns:
+        list: Arabic translations in the same order as `texts`.
+    """
+    settings = _cache_settings(max_length, num_beams)
+    normalized = [normalize_source_text(text) for text in texts]
+    results = {}
+    pending = []
+    for text in dict.fromkeys(normalized):
+        if not text:
+            results[text] = ""
+            continue
+        cached = translation_cache.get(make_cache_key(text, settings)) if use_cache else None
+        if cached is not None:
+            results[text] = cached
+        else:
+            pending.append(text)
+
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        with tracing.span("translate", batch=len(batch), backend=translation_backend):
+            translations = _generate_batch(batch, max_length, num_beams)
+        for text, translation in zip(batch, translations):
+            results[text] = translation
+            if use_cache:
+                translation_cache.put(make_cache_key(text, settings), translation)
+
+    return [results[text] for text in normalized]
+
+def translate_text(text, max_length=50, num_beams=None):
+    """ Translate English text to Arabic using the Marefa model (num_beams=1 for greedy search) """
+    return translate_batch([text], max_length=max_length, num_beams=num_beams)[0]
 
 def translate_objects(object_names):
     """   Translate a list of object names from English to Arabic."""
-    return [translate_text(name) for name in object_names]
+    return translate_batch(object_names)
 
+def get_translation_cache_stats():
+    """ Return the translation cache hit/miss counters """
+    return translation_cache.stats()
@@ -1,25 +1,32 @@
 import asyncio
 import cv2
 import time
-import sounddevice as sd
-from scipy.io.wavfile import write
-import speech_recognition as sr
-import edge_tts
 import os
-import pygame
 import unicodedata
+import threading
+from contextlib import nullcontext
 from datetime import datetime
+from NLP.tts import (DEFAULT_RATE, DEFAULT_VOICE, EdgeTTSBackend, TTSCache,
+                     prerender, split_sentences, write_temp_audio)
+from NLP.audio_player import PygamePlayer
+from NLP.audio_capture import VoiceListener
+from NLP.barge_in import BargeIn
+from NLP.asr import create_asr_backend
+from Core import tracing
+from Computer_Vision.camera import get_camera
+from Computer_Vision.frames import bgr_to_rgb, get_archiver
 
 
 FAMILY_FOLDER = "family"
 CAPTURE_FOLDER = "captured_images"
+# Keep a PNG copy of every explore capture in CAPTURE_FOLDER (written in the background).
+ARCHIVE_CAPTURES = True
+# Let the user interrupt the assistant by speaking over it (e.g. "خروج" during a long description).
+BARGE_IN = True
 for folder in [FAMILY_FOLDER, CAPTURE_FOLDER]:
     if not os.path.exists(folder):
         os.makedirs(folder)
 
-# Initialize pygame mixer for playing TTS audio
-pygame.mixer.init()
-
 def normalize_text(text):
     """
     Normalize Arabic text by removing diacritics and converting to lowercase.
@@ -42,96 +49,338 @@ START_COMMANDS = [normalize_text(cmd) for cmd in ["أَهْلًا مُبْصِر
 EXPLORE_COMMANDS = [normalize_text(cmd) for cmd in ["اِسْتَكْشِفْ المَكَان", "اِسْتَكْشَاف المَكَان", "اِسْتِكْشَاف"]]
 PHOTO_COMMANDS = [normalize_text(cmd) for cmd in ["اِلْتَقِطْ صُورَة", "صَوِّرْ", "أَخَذْ صُورَة"]]
 EXIT_COMMANDS = [normalize_text(cmd) for cmd in ["شُكْرًا مُبْصِر", "إِنْهَاء", "خُرُوج"]]
+# Explore again without reusing the description of a scene that looks the same.
+REFRESH_COMMANDS = [normalize_text(cmd) for cmd in ["وَصْف جَدِيد", "اِسْتَكْشِفْ مِنْ جَدِيد"]]
+MONITOR_START_COMMANDS = [normalize_text(cmd) for cmd in ["رَاقِبْ المَكَان", "اِبْدَأْ المُرَاقَبَة"]]
+MONITOR_STOP_COMMANDS = [normalize_text(cmd) for cmd in ["أَوْقِفْ المُرَاقَبَة", "تَوَقَّفْ عَنْ المُرَاقَبَة"]]
+MAIN_COMMANDS = (REFRESH_COMMANDS + EXPLORE_COMMANDS + PHOTO_COMMANDS + EXIT_COMMANDS
+                 + MONITOR_START_COMMANDS + MONITOR_STOP_COMMANDS)
+
+# Fixed prompts spoken by the app; they are pre-rendered into the TTS cache
+# so they play without any synthesis delay.
+FIXED_PROMPTS = [
+    "أهلاً بك! أنا مُبصر. قل: أهلا مبصر لنبدأ.",
+    "أهلا بك صديق مبصر! يمكنك قول استكشف المكان، التقط صورة، أو شكرًا مبصر.",
+    "تمام! يمكنك قول استكشف المكان، التقط صورة، أو شكرًا مبصر.",
+    "لم أسمع أهلا مبصر، حاول مرة أخرى.",
+    "تم التقاط الصورة وحفظها.",
+    "تم التقاط الصورة، جاري إنشاء الوصف...",
+    "لا يوجد أحد من أفراد العائلة في الصورة.",
+    "لم أتمكن من التعرف على الأشخاص في الصورة.",
+    "لم أتمكن من إنشاء وصف للصورة.",
+    "وقعت مشكلة أثناء التصوير.",
+    "لم أفهم الطلب، أعد المحاولة.",
+    "إلى اللقاء!",
+    "حدث خطأ في النظام.",
+    "بدأت مراقبة المكان، سأخبرك عندما يتغير المشهد.",
+    "تم إيقاف مراقبة المكان.",
+]
+
+# Synthesis backend and audio cache; tests can swap in NLP.tts.StubTTSBackend.
+_tts_backend = EdgeTTSBackend()
+tts_cache = TTSCache()
+
+def _collect_tts_metrics():
+    stats = tts_cache.stats()
+    return [("tts_cache_" + name, stats[name], {}) for name in ("hits", "misses", "hit_rate")]
+
+tracing.add_collector(_collect_tts_metrics)
+
+def set_tts_backend(backend):
+    """
+    Replace the speech synthesis backend (e.g. with a StubTTSBackend in tests).
+
+    Args:
+        backend (TTSBackend): Backend used for cache misses.
+    """
+    global _tts_backend
+    _tts_backend = backend
+
+async def prerender_prompts(prompts=None):
+    """
+    Synthesize the fixed prompts into the TTS cache ahead of time.
+
+    Args:
+        prompts (list, optional): Prompts to render. Defaults to FIXED_PROMPTS.
+
+    Returns:
+        int: Number of prompts ready in the cache.
+    """
+    return await prerender(tts_cache, _tts_backend, prompts or FIXED_PROMPTS)
+
+def prerender_prompts_in_background(prompts=None):
+    """Run `prerender_prompts` on a background thread and return the thread."""
+    thread = threading.Thread(target=lambda: asyncio.run(prerender_prompts(prompts)),
+                              name="tts-prerender", daemon=True)
+    thread.start()
+    return thread
+
+# Audio output; plays on its own thread and can be stopped from any thread.
+audio_player = PygamePlayer()
+
+def set_audio_player(player):
+    """
+    Replace the audio output (e.g. with a MemoryPlayer or NullPlayer in tests or benchmarks).
+
+    Args:
+        player: Object with async `play_file(path)` and `play_bytes(data, extension)`
+            returning False when stopped, and a thread-safe `stop()`.
+    """
+    global audio_player
+    audio_player = player
+    if _barge_in is not None:
+        _barge_in.player = player
+
+_barge_in = None
+
+def get_barge_in():
+    """Return the shared BargeIn (None when BARGE_IN is off), creating it on first use."""
+    global _barge_in
+    if BARGE_IN and _barge_in is None:
+        _barge_in = BargeIn(get_voice_listener(), audio_player)
+    return _barge_in if BARGE_IN else None
+
+def _user_has_floor():
+    barge_in = get_barge_in()
+    return barge_in is not None and barge_in.user_has_floor
 
 # Text-to-Speech using Edge TTS
-async def edge_speak(text):
+async def edge_speak(text, voice=DEFAULT_VOICE, rate=DEFAULT_RATE, use_cache=True, stream=False):
     """
     Convert Arabic text to speech using Edge TTS and play it.
 
-    This function creates an MP3 file using Edge TTS with an Arabic voice,
-    plays it using pygame, and then deletes the file after playback.
+    Audio is looked up in the content-addressed TTS cache (keyed by text,
+    voice and rate) and only synthesized on a miss. With the cache disabled
+    the audio goes to a unique temporary file that is deleted after playback,
+    so concurrent calls cannot overwrite each other.
 
     Args:
         text (str): Arabic text to speak.
+        voice (str, optional): Edge TTS voice. Default is "ar-EG-SalmaNeural".
+        rate (str, optional): Speaking rate, e.g. "+10%". Default is "+0%".
+        use_cache (bool, optional): Use the TTS cache. Default is True.
+        stream (bool, optional): Speak sentence by sentence from memory with
+            `speak_streaming`. Default is False.
+
+    Returns:
+        bool: False if the user interrupted (barge-in), so nothing more should
+        be said until the next command; True otherwise.
+    """
+    barge_in = get_barge_in()
+    if _user_has_floor():
+        return False
+    # `since` makes the player skip clips queued after an interruption that
+    # arrived while the audio was still being synthesized.
+    with tracing.span("speak", chars=len(text), stream=stream, backend=_tts_backend.name), \
+            (barge_in.speaking() if barge_in is not None else nullcontext()) as since:
+        if stream:
+            return await speak_streaming(text, voice=voice, rate=rate, use_cache=use_cache, since=since)
+
+        if use_cache:
+            path = await tts_cache.get_or_synthesize(_tts_backend, text, voice, rate)
+            if _user_has_floor():
+                return False
+            return await audio_player.play_file(path, since=since) is not False
+
+        data = await _tts_backend.synthesize(text, voice, rate)
+        filename = write_temp_audio(data, _tts_backend.extension)
+        try:
+            if _user_has_floor():
+                return False
+            return await audio_player.play_file(filename, since=since) is not False
+        finally:
+            if os.path.exists(filename):
+                os.remove(filename)
+
+async def _synthesize_sentence(sentence, voice, rate, use_cache):
+    """Return the audio bytes for one sentence, from the cache or the backend stream."""
+    key = tts_cache.make_key(sentence, voice, rate, _tts_backend.name)
+    if use_cache:
+        data = tts_cache.read(key, _tts_backend.extension)
+        if data is not None:
+            return data
+
+    audio = bytearray()
+    with tracing.span("tts_synthesize", chars=len(sentence), backend=_tts_backend.name):
+        async for chunk in _tts_backend.stream(sentence, voice, rate):
+            audio.extend(chunk)
+    data = bytes(audio)
+    if use_cache and data:
+        tts_cache.put(key, _tts_backend.extension, data)
+    return data
+
+async def speak_streaming(text, voice=DEFAULT_VOICE, rate=DEFAULT_RATE, use_cache=True, lookahead=2, since=None):
     """
-    voice = "ar-EG-SalmaNeural"
-    filename = "temp.mp3"
-    communicate = edge_tts.Communicate(text, voice)
-    await communicate.save(filename)
+    Speak long text sentence by sentence, starting before synthesis finishes.
+
+    The text is split at sentence boundaries. Audio chunks for each sentence
+    are collected in memory as the backend streams them, and playback of the
+    first sentence starts while the following ones are still being synthesized.
+
+    Args:
+        text (str): Arabic text to speak.
+        voice (str, optional): Edge TTS voice. Default is "ar-EG-SalmaNeural".
+        rate (str, optional): Speaking rate. Default is "+0%".
+        use_cache (bool, optional): Reuse and fill the per-sentence TTS cache. Default is True.
+        lookahead (int, optional): Sentences synthesized ahead of playback. Default is 2.
+        since (int, optional): Player stop count when speaking began; sentences
+            are skipped once the player has been stopped after it.
 
+    Returns:
+        bool: False if playback was stopped (barge-in) before the last sentence.
+    """
+    sentences = split_sentences(text)
+    if not sentences:
+        return True
+    ready = asyncio.Queue(maxsize=lookahead)
+
+    async def produce():
+        try:
+            for sentence in sentences:
+                await ready.put(await _synthesize_sentence(sentence, voice, rate, use_cache))
+        except Exception as e:
+            await ready.put(e)
+            return
+        await ready.put(None)
+
+    producer = asyncio.create_task(produce())
     try:
-        pygame.mixer.music.load(filename)
-        pygame.mixer.music.play()
-        while pygame.mixer.music.get_busy():
-            pygame.time.Clock().tick(10)
+        while True:
+            data = await ready.get()
+            if data is None:
+                break
+            if isinstance(data, Exception):
+                raise data
+            if _user_has_floor():
+                return False
+            if data and await audio_player.play_bytes(data, _tts_backend.extension, since=since) is False:
+                return False
+        await producer
+        return True
     finally:
-        pygame.mixer.music.unload()
-        if os.path.exists(filename):
-            os.remove(filename)
+        if not producer.done():
+            producer.cancel()
 
 # Speech recognition
-def listen_once(duration=3, fs=16000):
+_listener = None
+
+def get_voice_listener(fs=16000):
+    """Return the shared always-on VoiceListener, creating it on first use."""
+    global _listener
+    if _listener is None:
+        _listener = VoiceListener(create_asr_backend(), fs=fs, normalize=normalize_text)
+    return _listener
+
+def set_voice_listener(listener):
     """
-    Record a short audio clip from the microphone and transcribe it to text.
+    Replace the shared VoiceListener (e.g. one fed by a ScriptedAudioSource in benchmarks).
 
-    Uses Google Speech Recognition (with Arabic language) to convert speech to text.
-    Normalizes the result before returning.
+    Args:
+        listener (VoiceListener): Listener used by `listen_once`.
+    """
+    global _listener
+    if _listener is not None and _listener is not listener:
+        _listener.stop()
+    _listener = listener
+    if _barge_in is not None:
+        _barge_in.attach(listener)
+
+def set_asr_backend(backend):
+    """
+    Replace the speech recognition backend (e.g. VoskASRBackend or FakeASRBackend).
 
     Args:
-        duration (int, optional): Recording duration in seconds. Default is 3.
+        backend (ASRBackend): Backend used for the next utterances.
+    """
+    get_voice_listener().set_asr(backend)
+
+def listen_once(duration=None, fs=16000, timeout=10, commands=None):
+    """
+    Wait for the next spoken utterance from the microphone and transcribe it to text.
+
+    The microphone stays open and voice-activity detection ends the utterance
+    on trailing silence (with a short pre-roll so the first syllable is kept).
+    Audio goes to the recognizer straight from memory, on a worker thread.
+    With a streaming backend the call returns as soon as a partial transcript
+    contains one of `commands`. Normalizes the result before returning.
+
+    Args:
+        duration (float, optional): Maximum utterance length in seconds. Defaults
+            to the listener's setting (10 seconds).
         fs (int, optional): Sample rate in Hz. Default is 16000.
+        timeout (float, optional): Seconds to wait for speech. Default is 10.
+        commands (list, optional): Normalized command phrases for early detection.
 
     Returns:
         str: Normalized recognized text, or an empty string if recognition fails.
     """
+    listener = get_voice_listener(fs)
+    barge_in = get_barge_in()
+    since = None
+    if barge_in is not None:
+        # The user's turn. An utterance that interrupted the assistant counts
+        # even if it ended before this call (e.g. while the caption was still
+        # being generated).
+        since = barge_in.interrupted_at
+        barge_in.reset()
+    segmenter = listener.segmenter
+    max_frames = segmenter.max_frames
+    if duration is not None:
+        segmenter.max_frames = max(1, int(duration * 1000 // segmenter.frame_ms))
     print("🎤 يَسْتَمِعُ...")
-    recording = sd.rec(int(duration * fs), samplerate=fs, channels=1, dtype='int16')
-    sd.wait()
-    filename = "temp.wav"
-    write(filename, fs, recording)
-
-    recognizer = sr.Recognizer()
-    with sr.AudioFile(filename) as source:
-        audio = recognizer.record(source)
     try:
-        text = recognizer.recognize_google(audio, language="ar-EG")
-        print(f" قُلْتَ: {text}")
-        return normalize_text(text)
-    except sr.UnknownValueError:
-        print("لَمْ أَفْهَمِ الكَلَامَ")
-        return ""
-    except sr.RequestError as e:
-        print(f"خَطَأٌ فِي خِدْمَةِ التَّعَرُّفِ: {e}")
-        return ""
+        text, latency = listener.listen(timeout=timeout, commands=commands, since=since)
     finally:
-        if os.path.exists(filename):
-            os.remove(filename)
+        # The listener is shared; the limit only applies to this call.
+        segmenter.max_frames = max_frames
+    if text:
+        print(f" قُلْتَ: {text} ({latency:.2f}s)")
+    return normalize_text(text)
+
+async def listen_async(duration=None, fs=16000, timeout=10, commands=None):
+    """
+    `listen_once` for coroutines: waits on a worker thread, so playback and
+    other tasks on the event loop keep running while the user is listened to.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, lambda: listen_once(duration, fs, timeout, commands))
 
 # Image capture functions
 
+def _enroll_family_image(img_path, frame):
+    """
+    Append a newly captured family photo to the face embedding gallery.
+
+    Failures are only reported: the next recognition request re-syncs the
+    gallery with the family folder and picks the photo up anyway.
+    """
+    try:
+        from Computer_Vision.face_recognition import enroll_family_image
+        if not enroll_family_image(img_path, frame=frame, family_folder=FAMILY_FOLDER):
+            print("⚠ لَمْ يُعْثَرْ عَلَى وَجْهٍ وَاضِحٍ فِي الصُّورَةِ.")
+    except Exception as e:
+        print(f"⚠ تَعَذَّرَ تَسْجِيلُ الوَجْهِ: {e}")
+
 def capture_Family_image():
     """
     Capture an image and save it to the 'family' folder with a custom name.
 
-    Prompts the user to enter a filename, checks for duplicates, and saves
-    the captured photo using OpenCV.
+    Counts down so the person can pose, takes the sharpest recent frame from
+    the shared camera session, prompts the user to enter a filename, checks
+    for duplicates, and saves the captured photo using OpenCV.
 
     Returns:
         str or None: File path of the saved image if successful, or None if failed.
     """
+    camera = get_camera()
+    camera.start()  # already running in the background after the first capture
     print("سَيَتِمُّ التَّصْوِيرُ بَعْدَ ٣ ثَوَانٍ... اِبْتَسِمْ ")
     time.sleep(3)
 
     try:
-        cam = cv2.VideoCapture(0)
-        if not cam.isOpened():
-            raise Exception("📷 لَمْ أَتَمَكَّنْ مِنْ فَتْحِ الكَامِيرَا")
-
-        ret, frame = cam.read()
-        cam.release()
-
-        if not ret:
-            raise Exception("لَمْ أَتَمَكَّنْ مِنْ التَّقَاطِ الصُّورَة")
+        frame = camera.get_frame()
+        if frame is None:
+            raise Exception(camera.error or "لَمْ أَتَمَكَّنْ مِنْ التَّقَاطِ الصُّورَة")
 
         while True:
             img_name_input = input("أَدْخِلِ اسْمَ الصُّورَةِ (بدون امتداد): ").strip()
@@ -153,6 +402,7 @@ def capture_Family_image():
 
         cv2.imwrite(img_path, frame)
         print("تَمَّ التَّقَاطُ الصُّورَةِ.")
+        _enroll_family_image(img_path, frame)
         return img_path
 
     except Exception as e:
@@ -163,26 +413,17 @@ def capture_image():
     """
     Capture an image and save it to the 'captured_images' folder using a unique timestamp.
 
-    Uses OpenCV to take the photo, waits for 3 seconds before capturing, and
-    saves the image file with a timestamp-based name.
+    Takes the sharpest recent frame from the shared camera session (the
+    camera stays open between captures) and saves it with a timestamp-based name.
 
     Returns:
         str or None: File path of the saved image if successful, or None if failed.
     """
-    print(" سَيَتِمُّ التَّصْوِيرُ بَعْدَ ٣ ثَوَانٍ... اِبْتَسِمْ ")
-    time.sleep(3)
-
     try:
-        cam = cv2.VideoCapture(0)
-        if not cam.isOpened():
-            raise Exception("📷 لَمْ أَتَمَكَّنْ مِنْ فَتْحِ الكَامِيرَا")
-
-        ret, frame = cam.read()
-        cam.release()
-
-        if not ret:
-            raise Exception("📷 لَمْ أَتَمَكَّنْ مِنْ التَّقَاطِ الصُّورَة")
-
+        camera = get_camera()
+        frame = camera.get_frame()
+        if frame is None:
+            raise Exception(camera.error or "📷 لَمْ أَتَمَكَّنْ مِنْ التَّقَاطِ الصُّورَة")
 
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         img_filename = f"image_{timestamp}.png"
@@ -196,3 +437,38 @@ def capture_image():
     except Exception as e:
         print(f"خَطَأٌ: {e}")
         return None
+
+
+def capture_frame(archive=None):
+    """
+    Capture a frame for in-memory processing by the caption and face APIs.
+
+    The frame is converted to RGB once here and never goes through a PNG
+    round trip; the archive copy in CAPTURE_FOLDER is written asynchronously.
+
+    Args:
+        archive (bool, optional): Save a PNG copy. Defaults to ARCHIVE_CAPTURES.
+
+    Returns:
+        tuple: (rgb_frame, archive_path); the path is None when archiving is
+        off, and both are None if the capture failed.
+    """
+    camera = get_camera()
+    with tracing.span("capture"):
+        frame = camera.get_frame()
+    if frame is None:
+        tracing.incr("capture_failures")
+        print(f"خَطَأٌ: {camera.error or '📷 لَمْ أَتَمَكَّنْ مِنْ التَّقَاطِ الصُّورَة'}")
+        return None, None
+
+    img_path = None
+    if ARCHIVE_CAPTURES if archive is None else archive:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        img_path = get_archiver().archive(frame, os.path.join(CAPTURE_FOLDER, f"image_{timestamp}.png"))
+    return bgr_to_rgb(frame), img_path
+
+
+if __name__ == "__main__":
+    # Install step: pre-render the fixed prompts into the TTS cache.
+    ready = asyncio.run(prerender_prompts())
+    print(f"{ready}/{len(FIXED_PROMPTS)} prompts ready in {tts_cache.folder}")
@@ -0,0 +1,194 @@
+import os
+import json
+import threading
+import numpy as np
+import speech_recognition as sr
+
+try:
+    import vosk  # optional, offline recognition
+except ImportError:
+    vosk = None
+
+DEFAULT_VOSK_MODEL = os.path.join("models_cache", "vosk-model-ar")
+
+
+class ASRStream:
+    """
+    One streaming recognition session.
+
+    The default implementation only buffers audio and recognizes it in
+    `finish`; streaming backends override `accept` to return partial text.
+    """
+
+    def __init__(self, backend, fs):
+        self.backend = backend
+        self.fs = fs
+        self._chunks = []
+
+    def accept(self, samples):
+        """Feed int16 samples; return the current partial transcript or None."""
+        self._chunks.append(samples)
+        return None
+
+    def finish(self):
+        """Return the final transcript for everything fed so far."""
+        if not self._chunks:
+            return ""
+        return self.backend.recognize(np.concatenate(self._chunks), self.fs)
+
+
+class ASRBackend:
+    """
+    Interface for speech recognition backends.
+
+    `recognize` transcribes a complete utterance. Backends with
+    `supports_partials = True` also return partial hypotheses from
+    `start_stream(fs).accept(...)` while the user is still speaking.
+    """
+
+    name = "base"
+    supports_partials = False
+
+    def recognize(self, samples, fs):
+        """Transcribe mono int16 samples; return an empty string on failure."""
+        raise NotImplementedError
+
+    def start_stream(self, fs):
+        return ASRStream(self, fs)
+
+
+class GoogleASRBackend(ASRBackend):
+    """Google Web Speech recognition (online, full utterances only)."""
+
+    name = "google"
+
+    def __init__(self, language="ar-EG"):
+        self.language = language
+
+    def recognize(self, samples, fs):
+        audio = sr.AudioData(np.asarray(samples, dtype=np.int16).tobytes(), fs, 2)
+        try:
+            return sr.Recognizer().recognize_google(audio, language=self.language)
+        except sr.UnknownValueError:
+            print("لَمْ أَفْهَمِ الكَلَامَ")
+            return ""
+        except sr.RequestError as e:
+            print(f"خَطَأٌ فِي خِدْمَةِ التَّعَرُّفِ: {e}")
+            return ""
+
+
+class _VoskStream(ASRStream):
+    def __init__(self, backend, fs):
+        super().__init__(backend, fs)
+        self._recognizer = vosk.KaldiRecognizer(backend.model, fs)
+        self._final = []
+
+    def accept(self, samples):
+        data = np.asarray(samples, dtype=np.int16).tobytes()
+        if self._recognizer.AcceptWaveform(data):
+            text = json.loads(self._recognizer.Result()).get("text", "")
+            if text:
+                self._final.append(text)
+            return " ".join(self._final) or None
+        partial = json.loads(self._recognizer.PartialResult()).get("partial", "")
+        return " ".join(self._final + ([partial] if partial else [])) or None
+
+    def finish(self):
+        text = json.loads(self._recognizer.FinalResult()).get("text", "")
+        return " ".join(self._final + ([text] if text else []))
+
+
+class VoskASRBackend(ASRBackend):
+    """
+    Offline recognition with a local Vosk (Kaldi) model, with partial results.
+
+    Args:
+        model_path (str, optional): Folder of the Vosk model. Defaults to the
+            `MOBSIR_VOSK_MODEL` environment variable or "models_cache/vosk-model-ar".
+    """
+
+    name = "vosk"
+    supports_partials = True
+
+    def __init__(self, model_path=None):
+        if vosk is None:
+            raise ImportError("vosk is not installed; run `pip install vosk`")
+        self.model_path = model_path or os.environ.get("MOBSIR_VOSK_MODEL", DEFAULT_VOSK_MODEL)
+        self.model = vosk.Model(self.model_path)
+
+    def recognize(self, samples, fs):
+        stream = self.start_stream(fs)
+        stream.accept(samples)
+        return stream.finish()
+
+    def start_stream(self, fs):
+        return _VoskStream(self, fs)
+
+
+class _FakeStream(ASRStream):
+    def __init__(self, backend, fs):
+        super().__init__(backend, fs)
+        self._transcript = backend._next_transcript()
+        self._accepted = 0
+
+    def accept(self, samples):
+        self._accepted += 1
+        words = self._transcript.split()
+        shown = min(len(words), self._accepted // self.backend.chunks_per_word)
+        return " ".join(words[:shown]) or None
+
+    def finish(self):
+        return self._transcript
+
+
+class FakeASRBackend(ASRBackend):
+    """
+    Deterministic recognizer for tests: returns scripted transcripts in order.
+
+    Each utterance (or stream) consumes the next transcript; streams reveal it
+    one word per `chunks_per_word` accepted chunks as partial results. Once the
+    script is exhausted every utterance is recognized as "".
+
+    Args:
+        transcripts (list): Transcripts to return, in order.
+        chunks_per_word (int, optional): Chunks per revealed word. Default is 5.
+    """
+
+    name = "fake"
+    supports_partials = True
+
+    def __init__(self, transcripts, chunks_per_word=5):
+        self.transcripts = list(transcripts)
+        self.chunks_per_word = max(1, chunks_per_word)
+        self._index = 0
+        self._lock = threading.Lock()
+
+    def _next_transcript(self):
+        with self._lock:
+            if self._index >= len(self.transcripts):
+                return ""
+            text = self.transcripts[self._index]
+            self._index += 1
+            return text
+
+    def recognize(self, samples, fs):
+        return self._next_transcript()
+
+    def start_stream(self, fs):
+        return _FakeStream(self, fs)
+
+
+def create_asr_backend(name=None):
+    """
+    Build an ASR backend by name ("google", "vosk").
+
+    Args:
+        name (str, optional): Backend name. Defaults to the `MOBSIR_ASR`
+            environment variable, or "google".
+    """
+    name = (name or os.environ.get("MOBSIR_ASR", "google")).lower()
+    if name == "vosk":
+        return VoskASRBackend()
+    if name == "google":
+        return GoogleASRBackend()
+    raise ValueError(f"Unknown ASR backend: {name}")
@@ -0,0 +1,386 @@
+import time
+import queue
+import threading
+from collections import deque
+import numpy as np
+from Core import tracing
+
+
+class EnergyVAD:
+    """
+    Adaptive energy-based voice-activity detector.
+
+    A frame counts as speech when its RMS level is `ratio` times above the
+    running noise floor (and above `min_rms`). The noise floor follows the
+    level of non-speech frames, so the detector adapts to the room.
+
+    Args:
+        ratio (float, optional): Speech/noise level ratio (3.0 is about 10 dB). Default is 3.0.
+        min_rms (float, optional): Absolute int16 RMS below which nothing is speech. Default is 300.
+        noise_alpha (float, optional): Noise floor smoothing factor. Default is 0.05.
+    """
+
+    def __init__(self, ratio=3.0, min_rms=300.0, noise_alpha=0.05):
+        self.ratio = ratio
+        self.min_rms = min_rms
+        self.noise_alpha = noise_alpha
+        self.noise_rms = None
+
+    def is_speech(self, frame):
+        rms = float(np.sqrt(np.mean(np.square(frame, dtype=np.float64)))) if len(frame) else 0.0
+        if self.noise_rms is None:
+            self.noise_rms = rms
+        speech = rms > max(self.min_rms, self.noise_rms * self.ratio)
+        if not speech:
+            self.noise_rms += self.noise_alpha * (rms - self.noise_rms)
+        return speech
+
+
+class UtteranceSegmenter:
+    """
+    Cuts a continuous stream of audio frames into utterances.
+
+    An utterance starts after `start_ms` of consecutive speech and includes
+    the `pre_roll_ms` of audio before it, so the first syllable is not lost.
+    It ends after `trailing_silence_ms` of silence or at `max_utterance_s`.
+
+    Args:
+        fs (int, optional): Sample rate in Hz. Default is 16000.
+        frame_ms (int, optional): Frame length in milliseconds. Default is 30.
+        pre_roll_ms (int, optional): Audio kept before speech starts. Default is 300.
+        start_ms (int, optional): Speech needed to open an utterance. Default is 90.
+        trailing_silence_ms (int, optional): Silence that closes an utterance. Default is 700.
+        max_utterance_s (float, optional): Hard cap on utterance length. Default is 10.
+        vad (EnergyVAD, optional): Voice-activity detector.
+    """
+
+    def __init__(self, fs=16000, frame_ms=30, pre_roll_ms=300, start_ms=90,
+                 trailing_silence_ms=700, max_utterance_s=10, vad=None):
+        self.fs = fs
+        self.frame_ms = frame_ms
+        self.frame_samples = int(fs * frame_ms / 1000)
+        self.pre_roll = deque(maxlen=max(1, pre_roll_ms // frame_ms))
+        self.start_frames = max(1, start_ms // frame_ms)
+        self.trailing_frames = max(1, trailing_silence_ms // frame_ms)
+        self.max_frames = max(1, int(max_utterance_s * 1000 // frame_ms))
+        self.vad = vad or EnergyVAD()
+        self.reset()
+
+    def reset(self):
+        """Drop any partial utterance."""
+        self.in_speech = False
+        self._frames = []
+        self._speech_run = 0
+        self._silence_run = 0
+        self.pre_roll.clear()
+
+    @property
+    def current_frames(self):
+        """Frames of the utterance in progress, including the pre-roll."""
+        return self._frames
+
+    def feed(self, frame):
+        """
+        Process one frame of int16 samples.
+
+        Returns:
+            numpy.ndarray or None: The complete utterance when this frame ends one.
+        """
+        speech = self.vad.is_speech(frame)
+        if not self.in_speech:
+            self.pre_roll.append(frame)
+            self._speech_run = self._speech_run + 1 if speech else 0
+            if self._speech_run >= self.start_frames:
+                self.in_speech = True
+                self._frames = list(self.pre_roll)
+                self._silence_run = 0
+            return None
+
+        self._frames.append(frame)
+        self._silence_run = 0 if speech else self._silence_run + 1
+        if self._silence_run >= self.trailing_frames or len(self._frames) >= self.max_frames:
+            utterance = np.concatenate(self._frames)
+            self.reset()
+            return utterance
+        return None
+
+
+class MicrophoneStream:
+    """
+    Continuous microphone input delivered as fixed-size int16 frames.
+
+    Args:
+        fs (int, optional): Sample rate in Hz. Default is 16000.
+        frame_samples (int, optional): Samples per frame. Default is 480 (30 ms).
+    """
+
+    def __init__(self, fs=16000, frame_samples=480):
+        self.fs = fs
+        self.frame_samples = frame_samples
+        self._frames = queue.Queue(maxsize=1000)
+        self._stream = None
+
+    def _callback(self, indata, frames, time_info, status):
+        try:
+            self._frames.put_nowait(indata[:, 0].copy())
+        except queue.Full:
+            pass
+
+    def start(self):
+        if self._stream is None:
+            import sounddevice as sd
+
+            self._stream = sd.InputStream(samplerate=self.fs, channels=1, dtype="int16",
+                                          blocksize=self.frame_samples, callback=self._callback)
+            self._stream.start()
+
+    def read(self, timeout=None):
+        """Return the next frame, or None if none arrived within `timeout` seconds."""
+        try:
+            return self._frames.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def stop(self):
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+
+class ScriptedAudioSource:
+    """
+    Stand-in microphone for tests and benchmarks: silence plus queued "utterances".
+
+    Each `say` queues a burst of tone loud enough for EnergyVAD, followed by
+    enough silence to close the utterance. Between utterances low-level noise
+    frames are produced at the real frame rate; utterance frames are produced
+    as fast as they are read unless `realtime` is set.
+
+    Args:
+        fs (int, optional): Sample rate in Hz. Default is 16000.
+        frame_samples (int, optional): Samples per frame. Default is 480 (30 ms).
+        realtime (bool, optional): Pace utterance frames at the real frame rate. Default is False.
+        seed (int, optional): Random seed for the background noise. Default is 0.
+    """
+
+    def __init__(self, fs=16000, frame_samples=480, realtime=False, seed=0):
+        self.fs = fs
+        self.frame_samples = frame_samples
+        self.realtime = realtime
+        self._frame_seconds = frame_samples / fs
+        self._rng = np.random.default_rng(seed)
+        self._pending = queue.Queue()
+        self._frames = deque()
+        self.speech_ended_at = None
+
+    def say(self, seconds=1.0, trailing_silence_s=1.0, delay=0.0, amplitude=6000):
+        """
+        Queue one utterance; it starts after `delay` seconds.
+
+        `speech_ended_at` is set (time.monotonic) when its last speech frame is read.
+        """
+        self._pending.put((time.monotonic() + delay, seconds, trailing_silence_s, amplitude))
+
+    def _noise(self):
+        return self._rng.normal(0, 30, self.frame_samples).astype(np.int16)
+
+    def _queue_utterance(self, seconds, trailing_silence_s, amplitude):
+        t = np.arange(self.frame_samples) / self.fs
+        tone = (amplitude * np.sin(2 * np.pi * 220 * t)).astype(np.int16)
+        speech_frames = max(1, int(seconds / self._frame_seconds))
+        for i in range(speech_frames):
+            self._frames.append((tone, i == speech_frames - 1))
+        for _ in range(max(1, int(trailing_silence_s / self._frame_seconds))):
+            self._frames.append((self._noise(), False))
+
+    def start(self):
+        pass
+
+    def read(self, timeout=None):
+        if not self._frames:
+            try:
+                starts_at, seconds, silence, amplitude = self._pending.queue[0]
+            except IndexError:
+                starts_at = None
+            if starts_at is not None and time.monotonic() >= starts_at:
+                self._pending.get_nowait()
+                self._queue_utterance(seconds, silence, amplitude)
+            else:
+                time.sleep(self._frame_seconds)
+                return self._noise()
+        elif self.realtime:
+            time.sleep(self._frame_seconds)
+        frame, last_speech = self._frames.popleft()
+        if last_speech:
+            self.speech_ended_at = time.monotonic()
+        return frame
+
+    def stop(self):
+        pass
+
+
+class VoiceListener:
+    """
+    Always-on listener: VAD-segmented capture plus a recognition worker.
+
+    A capture thread turns microphone frames into utterances; a worker thread
+    recognizes them from memory, so the next utterance is captured while the
+    previous one is still being recognized. With a backend that produces
+    partial results, audio is streamed to it while the user speaks and the
+    utterance is cut short as soon as a partial transcript contains one of
+    the phrases passed to `listen(commands=...)`.
+
+    `on_speech_start`, if set, is called on the capture thread as soon as the
+    VAD opens an utterance (used for barge-in, see NLP/barge_in.py).
+
+    Args:
+        asr (ASRBackend): Speech recognition backend.
+        source (MicrophoneStream, optional): Frame source. Defaults to the microphone.
+        fs (int, optional): Sample rate in Hz. Default is 16000.
+        normalize (callable, optional): Applied to partial transcripts before
+            they are compared with the command phrases.
+        **segmenter_kwargs: Options for UtteranceSegmenter.
+    """
+
+    def __init__(self, asr, source=None, fs=16000, normalize=None, **segmenter_kwargs):
+        self.asr = asr
+        self.fs = fs
+        self.normalize = normalize or (lambda text: text.lower().strip())
+        self.segmenter = UtteranceSegmenter(fs=fs, **segmenter_kwargs)
+        self.source = source or MicrophoneStream(fs=fs, frame_samples=self.segmenter.frame_samples)
+        self.latencies = deque(maxlen=100)
+        self.on_speech_start = None
+        self._commands = ()
+        self._session = None
+        self._utterances = queue.Queue()
+        self._results = queue.Queue()
+        self._running = False
+        self._threads = []
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self.source.start()
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name="vad-capture", daemon=True),
+            threading.Thread(target=self._recognize_loop, name="asr-worker", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._running = False
+        self._utterances.put(None)
+        self.source.stop()
+        for thread in self._threads:
+            thread.join(timeout=1)
+
+    def set_asr(self, asr):
+        """Switch the recognition backend; takes effect from the next utterance."""
+        self.asr = asr
+
+    def _matches_command(self, partial):
+        text = self.normalize(partial)
+        return any(command in text for command in self._commands)
+
+    def _capture_loop(self):
+        while self._running:
+            frame = self.source.read(timeout=0.1)
+            if frame is None:
+                continue
+            self._process_frame(frame)
+
+    def _process_frame(self, frame):
+        was_in_speech = self.segmenter.in_speech
+        utterance = self.segmenter.feed(frame)
+        if not was_in_speech and self.segmenter.in_speech and self.on_speech_start is not None:
+            self.on_speech_start()
+        if not self.asr.supports_partials:
+            if utterance is not None:
+                self._utterances.put(("audio", utterance, time.monotonic()))
+            return
+
+        if not was_in_speech and self.segmenter.in_speech:
+            # Utterance just opened: start a session and feed the pre-roll.
+            self._session = self.asr.start_stream(self.fs)
+            partial = self._session.accept(np.concatenate(self.segmenter.current_frames))
+        elif self._session is not None:
+            partial = self._session.accept(frame)
+        else:
+            return
+
+        if utterance is not None:
+            self._utterances.put(("stream", self._session, time.monotonic()))
+            self._session = None
+        elif partial and self._commands and self._matches_command(partial):
+            # Early command detection: act on the partial transcript now and
+            # ignore the rest of this utterance until the speaker pauses.
+            self._session = None
+            self._record_result(partial, time.monotonic(), 0.0)
+
+    def _recognize_loop(self):
+        while True:
+            item = self._utterances.get()
+            if item is None:
+                return
+            kind, payload, ended_at = item
+            tracing.set_gauge("queue_depth", self._utterances.qsize(), queue="asr_utterances")
+            try:
+                if kind == "stream":
+                    text = payload.finish()
+                else:
+                    text = self.asr.recognize(payload, self.fs)
+            except Exception as e:
+                print(f"خَطَأٌ فِي التَّعَرُّفِ: {e}")
+                text = ""
+            self._record_result(text, ended_at, time.monotonic() - ended_at)
+
+    def _record_result(self, text, ended_at, latency):
+        self.latencies.append(latency)
+        tracing.record_span("asr", latency, backend=self.asr.name, early=latency == 0.0, chars=len(text))
+        self._results.put((text, ended_at, latency))
+
+    def latency_stats(self):
+        """Return count, mean, max and last recognition latency in seconds."""
+        values = list(self.latencies)
+        if not values:
+            return {"count": 0, "mean": None, "max": None, "last": None}
+        return {
+            "count": len(values),
+            "mean": sum(values) / len(values),
+            "max": max(values),
+            "last": values[-1],
+        }
+
+    def listen(self, timeout=None, commands=None, since=None):
+        """
+        Wait for the next recognized utterance that ended after this call.
+
+        Utterances that finished before the call (for example the assistant's
+        own voice while it was speaking) are discarded.
+
+        Args:
+            timeout (float, optional): Seconds to wait. Default waits forever.
+            commands (list, optional): Normalized phrases that end the utterance
+                as soon as a partial transcript contains one of them.
+            since (float, optional): Also accept utterances that ended after this
+                time.monotonic() value (e.g. one that interrupted the assistant).
+
+        Returns:
+            tuple: (text, latency_seconds), or ("", None) on timeout. The latency
+            is measured from the end of the utterance to the transcript.
+        """
+        called_at = time.monotonic()
+        self._commands = tuple(commands or ())
+        self.start()
+        deadline = None if timeout is None else called_at + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                text, ended_at, latency = self._results.get(timeout=remaining)
+            except queue.Empty:
+                return "", None
+            if ended_at >= (called_at if since is None else min(since, called_at)):
+                return text, latency
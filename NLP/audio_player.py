@@ -0,0 +1,251 @@
+import io
+import os
+import time
+import queue
+import asyncio
+import threading
+import pygame
+
+
+def _settle(future, completed, error):
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(completed)
+
+
+class _Clip:
+    """A queued clip and the state needed to cancel just this clip."""
+
+    def __init__(self, source, extension, since, loop, done):
+        self.source = source
+        self.extension = extension
+        self.since = since
+        self.loop = loop
+        self.done = done
+        self.cancelled = False
+        self.stop_event = None
+
+
+class ThreadedPlayer:
+    """
+    Base class for audio outputs that play on their own thread.
+
+    Clips are queued to a single playback thread, so the event loop only
+    awaits a future, and callers on different threads (the main loop and the
+    scene monitor) never drive the device at the same time. `stop` can be
+    called from any thread: it cuts the current clip short and drops the
+    queued ones. Each clip has its own stop flag, so a stop never leaks into
+    (or is cleared by) a later clip. Cancelling the task awaiting a clip only
+    stops or drops that clip; other callers' clips and `stops` are untouched.
+
+    `stops` counts the `stop` calls. A caller that passes `since=stops` (read
+    when it started speaking) to `play_file`/`play_bytes` gets False back
+    without any playback if a stop came in the meantime, e.g. while the next
+    sentence was still being synthesized.
+
+    Subclasses implement `_render(source, extension, stop_event)`: play one
+    clip (a file path when `extension` is None, else encoded bytes) and
+    return False if `stop_event` ended it early.
+
+    Args:
+        poll_interval (float, optional): Seconds between stop/finish checks. Default is 0.01.
+    """
+
+    def __init__(self, poll_interval=0.01):
+        self.poll_interval = poll_interval
+        self.silenced_at = None
+        self.stops = 0
+        self._current = None
+        self._on_silent = []
+        self._clips = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_playing(self):
+        return self._current is not None
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="audio-playback", daemon=True)
+                self._thread.start()
+
+    async def _play(self, source, extension, since):
+        loop = asyncio.get_running_loop()
+        clip = _Clip(source, extension, since, loop, loop.create_future())
+        self._ensure_thread()
+        self._clips.put(clip)
+        try:
+            return await clip.done
+        except asyncio.CancelledError:
+            self._cancel(clip)
+            raise
+
+    def _cancel(self, clip):
+        # Stop this clip if it is playing, or make the playback thread skip it.
+        with self._lock:
+            clip.cancelled = True
+            if clip.stop_event is not None:
+                clip.stop_event.set()
+
+    async def play_file(self, path, since=None):
+        """
+        Play an audio file and return when playback ends.
+
+        Args:
+            path (str): Audio file.
+            since (int, optional): Skip the clip if `stops` has grown past this value.
+
+        Returns:
+            bool: True if the clip played to the end, False if it was stopped or skipped.
+        """
+        return await self._play(path, None, since)
+
+    async def play_bytes(self, data, extension="mp3", since=None):
+        """Play encoded audio held in memory; arguments and result as in `play_file`."""
+        return await self._play(bytes(data), extension, since)
+
+    def stop(self, on_silent=None):
+        """
+        Stop the current clip and drop the queued ones (thread-safe).
+
+        Args:
+            on_silent (callable, optional): Called with the time.monotonic() at
+                which the output actually went quiet: right away if nothing was
+                playing, else from the playback thread once the clip has stopped.
+        """
+        with self._lock:
+            self.stops += 1
+            current = self._current
+            if current is not None:
+                current.set()
+                if on_silent is not None:
+                    self._on_silent.append(on_silent)
+        if current is None and on_silent is not None:
+            on_silent(time.monotonic())
+        while True:
+            try:
+                clip = self._clips.get_nowait()
+            except queue.Empty:
+                break
+            self._notify(clip.loop, clip.done, False, None)
+
+    def _notify(self, loop, done, completed, error):
+        try:
+            loop.call_soon_threadsafe(_settle, done, completed, error)
+        except RuntimeError:
+            # The caller's event loop is already closed; nobody is waiting.
+            pass
+
+    def _run(self):
+        while True:
+            clip = self._clips.get()
+            completed, error = False, None
+            with self._lock:
+                skip = clip.cancelled or (clip.since is not None and self.stops > clip.since)
+                if not skip:
+                    clip.stop_event = threading.Event()
+                self._current = clip.stop_event
+            if not skip:
+                try:
+                    completed = self._render(clip.source, clip.extension, clip.stop_event)
+                except Exception as e:
+                    error = e
+                finally:
+                    with self._lock:
+                        self._current = None
+                        callbacks, self._on_silent = self._on_silent, []
+                    self.silenced_at = time.monotonic()
+                    for callback in callbacks:
+                        callback(self.silenced_at)
+            self._notify(clip.loop, clip.done, completed, error)
+
+    def _render(self, source, extension, stop_event):
+        raise NotImplementedError
+
+
+class PygamePlayer(ThreadedPlayer):
+    """
+    Plays encoded audio (MP3/WAV) through pygame's mixer on a playback thread.
+
+    Audio can come from a file or straight from memory, so streamed speech
+    never has to be written to disk before it is played. All mixer calls are
+    made from the playback thread.
+
+    Args:
+        poll_interval (float, optional): Seconds between playback checks. Default is 0.01.
+    """
+
+    def _render(self, source, extension, stop_event):
+        if not pygame.mixer.get_init():
+            pygame.mixer.init()
+        if extension is None:
+            pygame.mixer.music.load(source)
+        else:
+            pygame.mixer.music.load(io.BytesIO(source), extension)
+        pygame.mixer.music.play()
+        try:
+            while pygame.mixer.music.get_busy():
+                if stop_event.wait(self.poll_interval):
+                    pygame.mixer.music.stop()
+                    return False
+            return True
+        finally:
+            pygame.mixer.music.unload()
+
+
+class MemoryPlayer(ThreadedPlayer):
+    """
+    In-memory audio output for tests: clips "play" for their real duration
+    without a sound device, and can be interrupted like the real player.
+
+    `clips` records (size_bytes, completed) for every clip played.
+
+    Args:
+        bytes_per_second (float, optional): Encoded bitrate used to work out a
+            clip's duration. Default is 6000 (48 kbit/s MP3, as Edge TTS produces).
+        clip_seconds (float, optional): Fixed duration for every clip instead.
+    """
+
+    def __init__(self, bytes_per_second=6000, clip_seconds=None):
+        super().__init__()
+        self.bytes_per_second = bytes_per_second
+        self.clip_seconds = clip_seconds
+        self.clips = []
+
+    def _render(self, source, extension, stop_event):
+        size = os.path.getsize(source) if extension is None else len(source)
+        duration = self.clip_seconds if self.clip_seconds is not None else size / self.bytes_per_second
+        completed = not stop_event.wait(duration)
+        self.clips.append((size, completed))
+        return completed
+
+
+class NullPlayer:
+    """
+    Silent audio sink for tests and benchmarks; playback returns immediately.
+
+    `played` counts the clips and `played_bytes` their total encoded size.
+    """
+
+    def __init__(self):
+        self.played = 0
+        self.played_bytes = 0
+
+    async def play_file(self, path, since=None):
+        self.played += 1
+        self.played_bytes += os.path.getsize(path)
+        return True
+
+    async def play_bytes(self, data, extension="mp3", since=None):
+        self.played += 1
+        self.played_bytes += len(data)
+        return True
+
+    def stop(self, on_silent=None):
+        if on_silent is not None:
+            on_silent(time.monotonic())
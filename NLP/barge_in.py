@@ -0,0 +1,122 @@
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from Core import tracing
+
+
+class BargeIn:
+    """
+    Lets the user interrupt the assistant by talking over it.
+
+    Speech is wrapped in `speaking()`. While inside it, the listener's VAD
+    needs `vad_boost` times more energy to detect speech, so the assistant's
+    own voice coming back through the microphone is less likely to trigger
+    it. When the user does start talking, playback is stopped and the user
+    "has the floor": later speech is skipped until `reset` (called when the
+    next command is awaited), so a multi-part answer stops as a whole rather
+    than one sentence at a time.
+
+    `speaking()` yields the player's stop count at the start of the block;
+    passing it as `since` to the player's `play_*` skips any clip queued
+    after an interruption, even one that arrived between two sentences.
+
+    The interrupt-to-silence latency (from the VAD detecting the user's
+    speech to the player reporting that the output went quiet) is recorded
+    for every interruption; it is ~0 when nothing was playing.
+
+    Args:
+        listener (VoiceListener): Always-on listener whose speech starts interrupt.
+        player: Audio output with `stop(on_silent)` (see NLP/audio_player.py).
+        vad_boost (float, optional): VAD ratio multiplier while speaking. Default is 2.0.
+    """
+
+    def __init__(self, listener, player, vad_boost=2.0):
+        self.player = player
+        self.vad_boost = vad_boost
+        self.listener = None
+        self.interrupted_at = None
+        self.interruptions = 0
+        self.latencies = deque(maxlen=100)
+        self._speakers = 0
+        self._saved_ratio = None
+        self._lock = threading.Lock()
+        self.attach(listener)
+
+    def attach(self, listener):
+        """Take speech-start events from `listener`, detaching from the previous one."""
+        if self.listener is not None and self.listener.on_speech_start == self._on_speech_start:
+            self.listener.on_speech_start = None
+        self.listener = listener
+        if listener is not None:
+            listener.on_speech_start = self._on_speech_start
+
+    @property
+    def user_has_floor(self):
+        """True after an interruption, until `reset`."""
+        return self.interrupted_at is not None
+
+    def reset(self):
+        """Let the assistant speak again (the user's command is being awaited)."""
+        self.interrupted_at = None
+
+    @contextmanager
+    def speaking(self):
+        """
+        Mark the assistant as speaking for the duration of the block.
+
+        Yields:
+            int or None: The player's stop count (`since` for its `play_*` calls),
+            or None if the player does not count stops.
+        """
+        with self._lock:
+            self._speakers += 1
+            if self._speakers == 1:
+                self._boost_vad()
+        try:
+            yield getattr(self.player, "stops", None)
+        finally:
+            with self._lock:
+                self._speakers -= 1
+                if self._speakers == 0:
+                    self._restore_vad()
+
+    def _boost_vad(self):
+        vad = self.listener.segmenter.vad if self.listener is not None else None
+        if vad is not None and self.vad_boost != 1:
+            self._saved_ratio = vad.ratio
+            vad.ratio *= self.vad_boost
+
+    def _restore_vad(self):
+        vad = self.listener.segmenter.vad if self.listener is not None else None
+        if vad is not None and self._saved_ratio is not None:
+            vad.ratio = self._saved_ratio
+        self._saved_ratio = None
+
+    def _on_speech_start(self):
+        # Runs on the listener's capture thread.
+        if self._speakers == 0 or self.interrupted_at is not None:
+            return
+        interrupted_at = time.monotonic()
+        self.interrupted_at = interrupted_at
+        self.interruptions += 1
+        tracing.incr("barge_ins")
+
+        def record(silent_at):
+            latency = max(0.0, silent_at - interrupted_at)
+            self.latencies.append(latency)
+            tracing.record_span("barge_in", latency)
+
+        self.player.stop(on_silent=record)
+
+    def latency_stats(self):
+        """Return count, mean, max and last interrupt-to-silence latency in seconds."""
+        values = list(self.latencies)
+        if not values:
+            return {"count": 0, "mean": None, "max": None, "last": None}
+        return {
+            "count": len(values),
+            "mean": sum(values) / len(values),
+            "max": max(values),
+            "last": values[-1],
+        }
@@ -0,0 +1,231 @@
+"""
+Inference backends for the Marefa English->Arabic translator.
+
+- "eager": the original fp32 PyTorch model.
+- "int8":  dynamic int8 quantization of the model's nn.Linear layers.
+- "onnx":  an ONNX Runtime graph exported once to models_cache/onnx with
+           cached decoder states (requires `optimum[onnxruntime]`).
+
+The thread count comes from MOBSIR_TRANSLATION_THREADS (default: the
+runtime's own choice). ONNX sessions keep it per session; torch's setting is
+process-wide, so for the torch backends it is only applied around each
+`generate` call (see Core.model_backends.torch_threads). Run
+`python -m NLP.translation_backends` to check a backend's Arabic output
+against the eager model on a fixed caption corpus.
+"""
+import os
+import sys
+import json
+import argparse
+
+from Core.model_backends import (BACKENDS, backend_from_env, select_loader, quantize_int8,
+                                 export_onnx_once, measure_backend)
+
+TRANSLATION_MODEL_NAME = "marefa-nlp/marefa-mt-en-ar"
+CACHE_DIR = "./models_cache"
+ONNX_EXPORT_DIR = os.path.join(CACHE_DIR, "onnx", "marefa-mt-en-ar")
+
+# Captions of the kind the captioner produces, used by the accuracy check.
+REFERENCE_CAPTIONS = [
+    "a man sitting on a bench in a park",
+    "a woman holding a cup of coffee",
+    "a group of people standing around a table",
+    "a cat laying on top of a bed",
+    "a dog running through a grassy field",
+    "a kitchen with a stove and a refrigerator",
+    "a living room with a couch and a television",
+    "a young boy riding a bike down a street",
+    "a plate of food with rice and vegetables",
+    "a car parked on the side of the road",
+    "two children playing with a ball",
+    "a person using a laptop on a desk",
+]
+
+
+def default_backend():
+    """Backend chosen by the MOBSIR_TRANSLATION_BACKEND environment variable (default "eager")."""
+    return backend_from_env("MOBSIR_TRANSLATION_BACKEND")
+
+
+def default_threads():
+    """Thread count from MOBSIR_TRANSLATION_THREADS, or None to keep the runtime default."""
+    value = os.environ.get("MOBSIR_TRANSLATION_THREADS")
+    try:
+        return int(value) if value else None
+    except ValueError:
+        print(f"⚠ Ignoring invalid MOBSIR_TRANSLATION_THREADS: {value}")
+        return None
+
+
+def _load_tokenizer():
+    from transformers import AutoTokenizer
+
+    return AutoTokenizer.from_pretrained(TRANSLATION_MODEL_NAME)
+
+
+def _load_eager(threads):
+    from transformers import AutoModelForSeq2SeqLM
+
+    model = AutoModelForSeq2SeqLM.from_pretrained(TRANSLATION_MODEL_NAME).eval()
+    # Applied around generate by generate_translations, not process-wide here.
+    model.torch_threads = threads
+    return model
+
+
+def _load_int8(threads):
+    return quantize_int8(_load_eager(threads))
+
+
+def export_onnx(export_dir=ONNX_EXPORT_DIR):
+    """
+    Export the translator to ONNX (encoder, decoder and decoder-with-past) once.
+
+    Returns:
+        str: The export folder.
+    """
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+
+    return export_onnx_once(ORTModelForSeq2SeqLM, TRANSLATION_MODEL_NAME, export_dir, "translator")
+
+
+def _load_onnx(threads):
+    import onnxruntime
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+
+    session_options = onnxruntime.SessionOptions()
+    if threads:
+        session_options.intra_op_num_threads = threads
+        session_options.inter_op_num_threads = 1
+    return ORTModelForSeq2SeqLM.from_pretrained(
+        export_onnx(), use_cache=True, session_options=session_options)
+
+
+_LOADERS = {"eager": _load_eager, "int8": _load_int8, "onnx": _load_onnx}
+
+
+def load_translation_backend(name=None, threads=None):
+    """
+    Load the translator with the given backend.
+
+    Args:
+        name (str, optional): "eager", "int8" or "onnx". Defaults to `default_backend()`.
+        threads (int, optional): Intra-op threads. Defaults to `default_threads()`.
+
+    Returns:
+        tuple: (tokenizer, model); every model has a `generate(**inputs)`
+        compatible with `translate_batch`.
+    """
+    model = select_loader("translation", _LOADERS, name or default_backend())(threads or default_threads())
+    return _load_tokenizer(), model
+
+
+def _char_ngrams(text, n):
+    text = "".join(text.split())
+    return [text[i:i + n] for i in range(len(text) - n + 1)]
+
+
+def chrf(hypothesis, reference, max_n=6, beta=2):
+    """
+    Character n-gram F-score (chrF) of a hypothesis against a reference, 0-100.
+
+    Works on Arabic without a tokenizer, which makes it a better fit than
+    word-level BLEU for short caption translations.
+    """
+    from collections import Counter
+
+    precisions, recalls = [], []
+    for n in range(1, max_n + 1):
+        hyp, ref = Counter(_char_ngrams(hypothesis, n)), Counter(_char_ngrams(reference, n))
+        if not hyp or not ref:
+            continue
+        overlap = sum((hyp & ref).values())
+        precisions.append(overlap / sum(hyp.values()))
+        recalls.append(overlap / sum(ref.values()))
+    if not precisions:
+        return 100.0 if hypothesis.strip() == reference.strip() else 0.0
+    precision = sum(precisions) / len(precisions)
+    recall = sum(recalls) / len(recalls)
+    if precision + recall == 0:
+        return 0.0
+    return 100 * (1 + beta ** 2) * precision * recall / (beta ** 2 * precision + recall)
+
+
+def check_translation_accuracy(backend, corpus=REFERENCE_CAPTIONS, num_beams=None, min_chrf=90.0,
+                               threads=None, reference_backend="eager"):
+    """
+    Translate a fixed caption corpus with a backend and compare it with the eager model.
+
+    Args:
+        backend (str): Backend to check.
+        corpus (list, optional): English captions. Defaults to REFERENCE_CAPTIONS.
+        num_beams (int, optional): Beams for both runs. Default is the model default.
+        min_chrf (float, optional): Mean chrF needed to pass. Default is 90.
+        threads (int, optional): Intra-op threads for both backends.
+        reference_backend (str, optional): Backend that gives the reference output. Default is "eager".
+
+    Returns:
+        dict: backend, passed, mean_chrf, exact_match, seconds (candidate
+        translation time), reference_seconds and per-sentence rows
+        (source, reference, hypothesis, chrf).
+    """
+    from NLP.Translation import generate_translations
+
+    corpus = list(corpus)
+    timings = {}
+    outputs = {}
+    for name in (reference_backend, backend):
+        if name in outputs:
+            continue
+        measured = measure_backend(
+            lambda: load_translation_backend(name, threads=threads),
+            lambda components: generate_translations(components, corpus, num_beams=num_beams))
+        outputs[name] = measured["outputs"]
+        timings[name] = measured["run_seconds"][0]
+
+    rows = []
+    for source, reference, hypothesis in zip(corpus, outputs[reference_backend], outputs[backend]):
+        rows.append({"source": source, "reference": reference, "hypothesis": hypothesis,
+                     "chrf": chrf(hypothesis, reference)})
+    mean_chrf = sum(row["chrf"] for row in rows) / max(1, len(rows))
+    return {
+        "backend": backend,
+        "passed": mean_chrf >= min_chrf,
+        "mean_chrf": mean_chrf,
+        "exact_match": sum(row["reference"] == row["hypothesis"] for row in rows) / max(1, len(rows)),
+        "seconds": timings[backend],
+        "reference_seconds": timings[reference_backend],
+        "rows": rows,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check a translator backend against the eager model.")
+    parser.add_argument("--backend", default="int8", choices=BACKENDS)
+    parser.add_argument("--num-beams", type=int, default=None)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--min-chrf", type=float, default=90.0)
+    parser.add_argument("--export-only", action="store_true", help="Only export the ONNX model")
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    args = parser.parse_args(argv)
+
+    if args.export_only:
+        print(export_onnx())
+        return 0
+
+    report = check_translation_accuracy(args.backend, num_beams=args.num_beams,
+                                        min_chrf=args.min_chrf, threads=args.threads)
+    for row in report["rows"]:
+        marker = "=" if row["reference"] == row["hypothesis"] else "~"
+        print(f"{marker} {row['chrf']:5.1f}  {row['source']}\n    eager: {row['reference']}\n"
+              f"    {args.backend}: {row['hypothesis']}")
+    print(f"{args.backend}: chrF {report['mean_chrf']:.1f}  exact {report['exact_match']:.2f}  "
+          f"time {report['seconds']:.2f}s (eager {report['reference_seconds']:.2f}s)  "
+          f"{'PASS' if report['passed'] else 'FAIL'}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0 if report["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
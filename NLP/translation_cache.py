@@ -0,0 +1,118 @@
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+
+DEFAULT_CACHE_PATH = os.path.join("models_cache", "translations.sqlite3")
+
+
+def normalize_source_text(text):
+    """Normalize source text for caching: NFKC, collapsed whitespace, stripped."""
+    text = unicodedata.normalize("NFKC", text)
+    return " ".join(text.split())
+
+
+def make_cache_key(text, settings):
+    """
+    Build the cache key for a source text and its generation settings.
+
+    Args:
+        text (str): Normalized source text.
+        settings (dict): Model name and generation options that affect the output.
+
+    Returns:
+        str: SHA-256 hex digest identifying the translation.
+    """
+    payload = json.dumps({"text": text, "settings": settings}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TranslationCache:
+    """
+    Two-level translation cache: an in-memory LRU in front of a SQLite file.
+
+    Args:
+        max_entries (int, optional): Size of the in-memory LRU. Default is 1024.
+        db_path (str, optional): SQLite file for the persistent cache, or None
+            to keep the cache in memory only.
+    """
+
+    def __init__(self, max_entries=1024, db_path=DEFAULT_CACHE_PATH):
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if db_path:
+            try:
+                folder = os.path.dirname(db_path)
+                if folder:
+                    os.makedirs(folder, exist_ok=True)
+                self._db = sqlite3.connect(db_path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS translations (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"⚠ Translation cache disabled on disk: {e}")
+                self._db = None
+
+    def get(self, key):
+        """Return the cached translation for a key, or None on a miss."""
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                self.memory_hits += 1
+                return value
+            if self._db is not None:
+                row = self._db.execute("SELECT value FROM translations WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._remember(key, row[0])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        """Store a translation in memory and on disk."""
+        with self._lock:
+            self._remember(key, value)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO translations (key, value) VALUES (?, ?)", (key, value))
+                self._db.commit()
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self):
+        """Drop every cached translation, in memory and on disk."""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM translations")
+                self._db.commit()
+
+    def stats(self):
+        """Return hit/miss counters and the in-memory size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+            }
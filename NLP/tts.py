@@ -0,0 +1,268 @@
+import io
+import os
+import re
+import wave
+import hashlib
+import tempfile
+import threading
+
+DEFAULT_VOICE = "ar-EG-SalmaNeural"
+DEFAULT_RATE = "+0%"
+DEFAULT_CACHE_FOLDER = os.path.join("models_cache", "tts")
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+
+# Sentence ends (Latin and Arabic punctuation) followed by whitespace.
+_SENTENCE_END = re.compile(r"(?<=[.!?؟…:])\s+|\n+")
+
+
+def split_sentences(text, min_chars=2):
+    """
+    Split text at sentence boundaries so long texts can be spoken piece by piece.
+
+    Fragments shorter than `min_chars` are merged into the previous piece.
+
+    Args:
+        text (str): Text to split.
+        min_chars (int, optional): Smallest fragment kept on its own. Default is 2.
+
+    Returns:
+        list: Non-empty sentences in order.
+    """
+    sentences = []
+    for part in _SENTENCE_END.split(text.strip()):
+        part = part.strip()
+        if not part:
+            continue
+        if sentences and len(part) < min_chars:
+            sentences[-1] = f"{sentences[-1]} {part}"
+        else:
+            sentences.append(part)
+    return sentences
+
+
+class TTSBackend:
+    """
+    Interface for speech synthesis backends.
+
+    Subclasses set `name` and `extension` and implement `synthesize`.
+    """
+
+    name = "base"
+    extension = "mp3"
+
+    async def synthesize(self, text, voice, rate):
+        """Return the encoded audio for `text` as bytes."""
+        raise NotImplementedError
+
+    async def stream(self, text, voice, rate):
+        """Yield the encoded audio in chunks as it is produced."""
+        yield await self.synthesize(text, voice, rate)
+
+
+class EdgeTTSBackend(TTSBackend):
+    """Microsoft Edge online TTS (the default backend)."""
+
+    name = "edge"
+    extension = "mp3"
+
+    async def synthesize(self, text, voice, rate):
+        audio = bytearray()
+        async for chunk in self.stream(text, voice, rate):
+            audio.extend(chunk)
+        return bytes(audio)
+
+    async def stream(self, text, voice, rate):
+        import edge_tts
+
+        communicate = edge_tts.Communicate(text, voice, rate=rate)
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                yield chunk["data"]
+
+
+class StubTTSBackend(TTSBackend):
+    """
+    Offline stand-in that renders deterministic silent WAV audio.
+
+    The clip length grows with the text so playback timing stays realistic
+    in tests; `calls` counts how many texts were synthesized.
+
+    Args:
+        seconds_per_char (float, optional): Audio length per character. Default is 0.05.
+        sample_rate (int, optional): WAV sample rate. Default is 16000.
+    """
+
+    name = "stub"
+    extension = "wav"
+
+    def __init__(self, seconds_per_char=0.05, sample_rate=16000):
+        self.seconds_per_char = seconds_per_char
+        self.sample_rate = sample_rate
+        self.calls = 0
+
+    async def synthesize(self, text, voice, rate):
+        self.calls += 1
+        frames = int(len(text) * self.seconds_per_char * self.sample_rate)
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(b"\x00\x00" * frames)
+        return buffer.getvalue()
+
+
+class TTSCache:
+    """
+    Content-addressed, size-bounded cache of synthesized speech.
+
+    Audio is stored as `<sha256(text, voice, rate, backend)>.<ext>` files in
+    `folder`. A hit refreshes the file's mtime, and when the folder grows past
+    `max_bytes` the least recently used files are deleted first. Pinned keys
+    (the pre-rendered fixed prompts) are never evicted.
+
+    Args:
+        folder (str, optional): Cache directory. Default is "models_cache/tts".
+        max_bytes (int, optional): Size budget. Default is 64 MB.
+    """
+
+    def __init__(self, folder=DEFAULT_CACHE_FOLDER, max_bytes=DEFAULT_CACHE_BYTES):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._pinned = set()
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+
+    @staticmethod
+    def make_key(text, voice, rate, backend_name):
+        payload = "\x1f".join([backend_name, voice, rate, text])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key, extension):
+        return os.path.join(self.folder, f"{key}.{extension}")
+
+    def get(self, key, extension):
+        """Return the cached file path for a key, or None on a miss."""
+        path = self._path(key, extension)
+        with self._lock:
+            if os.path.exists(path):
+                try:
+                    os.utime(path)
+                except OSError:
+                    pass
+                self.hits += 1
+                return path
+            self.misses += 1
+            return None
+
+    def read(self, key, extension):
+        """Return the cached audio bytes for a key, or None on a miss."""
+        path = self.get(key, extension)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, key, extension, data):
+        """Store audio bytes atomically and return the cached file path."""
+        path = self._path(key, extension)
+        fd, tmp_path = tempfile.mkstemp(dir=self.folder, suffix=".part")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self._evict()
+        return path
+
+    def pin(self, key):
+        """Protect a key from eviction."""
+        self._pinned.add(key)
+
+    def _evict(self):
+        with self._lock:
+            files = []
+            total = 0
+            for name in os.listdir(self.folder):
+                if name.endswith(".part"):
+                    continue
+                path = os.path.join(self.folder, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                total += stat.st_size
+                files.append((stat.st_mtime, stat.st_size, name, path))
+            for _, size, name, path in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                if os.path.splitext(name)[0] in self._pinned:
+                    continue
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+
+    async def get_or_synthesize(self, backend, text, voice=DEFAULT_VOICE, rate=DEFAULT_RATE, pin=False):
+        """
+        Return a file path with the audio for `text`, synthesizing it on a miss.
+
+        Args:
+            backend (TTSBackend): Backend used on a cache miss.
+            text (str): Text to speak.
+            voice (str, optional): Voice name. Default is "ar-EG-SalmaNeural".
+            rate (str, optional): Speaking rate, e.g. "+10%". Default is "+0%".
+            pin (bool, optional): Never evict this entry. Default is False.
+
+        Returns:
+            str: Path of the cached audio file.
+        """
+        key = self.make_key(text, voice, rate, backend.name)
+        if pin:
+            self.pin(key)
+        path = self.get(key, backend.extension)
+        if path is None:
+            data = await backend.synthesize(text, voice, rate)
+            path = self.put(key, backend.extension, data)
+        return path
+
+    def stats(self):
+        """Return hit/miss counters."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+async def prerender(cache, backend, prompts, voice=DEFAULT_VOICE, rate=DEFAULT_RATE):
+    """
+    Synthesize and pin a set of fixed prompts so they play without delay.
+
+    Prompts that are already cached are only pinned. Failures (for example no
+    network for Edge TTS) are reported and skipped.
+
+    Returns:
+        int: Number of prompts available in the cache.
+    """
+    ready = 0
+    for prompt in prompts:
+        try:
+            await cache.get_or_synthesize(backend, prompt, voice, rate, pin=True)
+            ready += 1
+        except Exception as e:
+            print(f"⚠ TTS prerender failed for {prompt!r}: {e}")
+    return ready
+
+
+def write_temp_audio(data, extension):
+    """Write audio bytes to a unique temporary file and return its path."""
+    fd, path = tempfile.mkstemp(prefix="mobsir_tts_", suffix=f".{extension}")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    return path
@@ -1,5 +1,5 @@
-import re
 import os
+import sys
 import asyncio
 from PIL import Image
 import streamlit as st
@@ -13,10 +13,23 @@ try:
     from NLP.Translation import *
     from Computer_Vision.Image_Caption import *
     from Computer_Vision.face_recognition import *
+    from Core.model_registry import registry
+    from Computer_Vision.camera import get_camera
+    from Core.pipeline import explore_scene, explore_scene_incremental
+    from Core.scene_monitor import SceneMonitor
+    from Computer_Vision.face_tracker import FaceTracker
 except ImportError as e:
     st.error(f"Import error: {e}")
     st.stop()
 
+# Speak the description phrase by phrase while the caption is still being
+# generated. Off by default: it decodes greedily instead of with beam search,
+# so keep the full-sentence path until its captions are shown to be as good.
+INCREMENTAL_DESCRIPTION = False
+
+# Render the fixed prompts into the TTS cache so they play without delay.
+prerender_prompts_in_background()
+
 # Safe favicon loading
 try:
     if os.path.exists("assets/favicon.jpg"):
@@ -72,29 +85,6 @@ st.markdown(
     unsafe_allow_html=True
 )
 
-def contains_person_keywords(text):
-    """Check if the caption contains person-related keywords."""
-    english_keywords = [
-        'person', 'people', 'man', 'woman', 'men', 'women', 
-        'boy', 'girl', 'child', 'children', 'baby', 'adult',
-        'guy', 'lady', 'gentleman', 'individual', 'human',
-        'someone', 'somebody', 'figure', 'character'
-    ]
-    
-    arabic_keywords = [
-        'شخص', 'أشخاص', 'رجل', 'امرأة', 'رجال', 'نساء',
-        'ولد', 'بنت', 'طفل', 'أطفال', 'طفلة', 'بالغ',
-        'شاب', 'فتاة', 'سيدة', 'أحد', 'شخصية', 'فرد'
-    ]
-    
-    all_keywords = english_keywords + arabic_keywords
-    text_lower = text.lower()
-    
-    for keyword in all_keywords:
-        if re.search(r'\b' + re.escape(keyword) + r'\b', text_lower):
-            return True
-    return False
-
 def run_async_function(coro):
     """Helper function to run async functions in Streamlit."""
     try:
@@ -105,23 +95,19 @@ def run_async_function(coro):
         print(f"Async execution error: {e}")
         return None
 
-async def enhance_caption_with_family(original_caption, img_path):
-    """Enhance the caption with family member names if they are detected."""
-    try:
-        family_members = await check_family_in_image("family",img_path)
-        
-        if family_members:
-            valid_names = [name for name in family_members if name and name.strip()]
-            
-            if valid_names:
-                names_text = "، ".join(valid_names)
-                enhanced_caption = f"{original_caption} كما يوجد في الصورة: {names_text}."
-                return enhanced_caption, valid_names
-    
-    except Exception as e:
-        print(f"Warning: Family recognition failed: {e}")
-    
-    return original_caption, []
+async def describe_scene_change(frame):
+    """Speak a description of a changed scene (on the scene monitor's thread; cancelled by pause)."""
+    await explore_scene(frame, speak=edge_speak, prompt=None)
+
+async def announce_family_arrivals(names):
+    """Announce family members who just came into view (on the scene monitor's thread; cancelled by pause)."""
+    await edge_speak(f"وصل الآن: {'، '.join(names)}")
+
+# Continuous mode: describes the scene whenever it changes, at low FPS and
+# within a CPU budget, and announces family members as they arrive (faces
+# are tracked, so each person is identified once). Started and stopped by voice.
+scene_monitor = SceneMonitor(describe_scene_change, tracker=FaceTracker(FAMILY_FOLDER),
+                             announce=announce_family_arrivals)
 
 def run_voice_assistant():
     """Main function to run the voice assistant."""
@@ -129,10 +115,16 @@ def run_voice_assistant():
     async def start_point():
         try:
             await edge_speak("أهلاً بك! أنا مُبصر. قل: أهلا مبصر لنبدأ.")
+
+            # Models load on first use; warm them up in the background now
+            # that the greeting has played.
+            registry.warmup_async()
+            # Open the camera now so captures skip the open/auto-exposure delay.
+            get_camera().start()
             
             # Initial greeting loop
             while True:
-                command = listen_once(duration=3)
+                command = await listen_async(commands=START_COMMANDS)
                 if any(word in command for word in START_COMMANDS):
                     await edge_speak("أهلا بك صديق مبصر! يمكنك قول استكشف المكان، التقط صورة، أو شكرًا مبصر.")
                     break
@@ -141,9 +133,23 @@ def run_voice_assistant():
             
             # Main command loop
             while True:
-                command = listen_once(duration=3)
+                scene_monitor.resume()
+                command = await listen_async(commands=MAIN_COMMANDS)
+                if command:
+                    # Keep the monitor quiet while the command is answered; a
+                    # description or announcement still in progress is cancelled
+                    # and has stopped speaking before the answer starts.
+                    await asyncio.wrap_future(scene_monitor.pause())
                 
-                if any(word in command for word in PHOTO_COMMANDS):
+                if any(word in command for word in MONITOR_START_COMMANDS):
+                    scene_monitor.start()
+                    await edge_speak("بدأت مراقبة المكان، سأخبرك عندما يتغير المشهد.")
+                
+                elif any(word in command for word in MONITOR_STOP_COMMANDS):
+                    await asyncio.wrap_future(scene_monitor.stop())
+                    await edge_speak("تم إيقاف مراقبة المكان.")
+                
+                elif any(word in command for word in PHOTO_COMMANDS):
                     img_path = capture_Family_image()
                     if img_path:
                         await edge_speak("تم التقاط الصورة وحفظها.")
@@ -160,30 +166,18 @@ def run_voice_assistant():
                     else:
                         await edge_speak("وقعت مشكلة أثناء التصوير.")
                 
-                elif any(word in command for word in EXPLORE_COMMANDS):
-                    img_path = capture_image()
-                    if img_path:
-                        await edge_speak("تم التقاط الصورة، جاري إنشاء الوصف...")
+                elif any(word in command for word in REFRESH_COMMANDS + EXPLORE_COMMANDS):
+                    # A repeated "explore" of the same scene reuses its description;
+                    # "وصف جديد" forces a fresh one.
+                    force_refresh = any(word in command for word in REFRESH_COMMANDS)
+                    frame, img_path = capture_frame()
+                    if frame is not None:
                         try:
-                            # Generate caption
-                            caption = get_caption(model, image_processor, tokenizer, img_path)
-                            print(f"Original caption: {caption}")
-                            
-                            # Check for person and enhance with family recognition
-                            if contains_person_keywords(caption):
-                                print("Person detected in caption. Running family recognition...")
-                                enhanced_caption, family_members = await enhance_caption_with_family(caption, img_path)
-                                translated_caption = translate_text(enhanced_caption)
-                                await edge_speak(f"وصف الصورة: {translated_caption}")
-                                
-                                if family_members:
-                                    names = "، ".join(family_members)
-                                    await edge_speak(f"كما يوجد من أفراد العائلة: {names}")
-                            else:
-                                print("No person mentioned in caption. Skipping family recognition.")
-                                translated_caption = translate_text(caption)
-                                await edge_speak(f"وصف الصورة: {translated_caption}")
-                                
+                            # Caption, face recognition, translation and speech
+                            # run as overlapping stages; the prompt plays meanwhile.
+                            explore = explore_scene_incremental if INCREMENTAL_DESCRIPTION else explore_scene
+                            result = await explore(frame, speak=edge_speak, force_refresh=force_refresh)
+                            print(f"⏱ Explore timings: {result['timings']}")
                         except Exception as e:
                             print(f"❌ خطأ في مولد الوصف: {e}")
                             await edge_speak("لم أتمكن من إنشاء وصف للصورة.")
@@ -191,6 +185,7 @@ def run_voice_assistant():
                         await edge_speak("وقعت مشكلة أثناء التصوير.")
                 
                 elif any(word in command for word in EXIT_COMMANDS):
+                    await asyncio.wrap_future(scene_monitor.stop())
                     await edge_speak("إلى اللقاء!")
                     break
                 
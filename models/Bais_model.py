@@ -3,8 +3,13 @@ import asyncio
 from NLP.Voice_Assistant import *
 from NLP.Translation import *
 from Computer_Vision.Image_Caption import *
+from Computer_Vision import face_recognizer  # registers the shared face recognizer
+from Core.model_registry import registry
 from PIL import Image
 
+# Pre-render the fixed prompts so they play without synthesis delay.
+prerender_prompts_in_background()
+
 
 
 favicon = Image.open("assets/favicon.jpg")
@@ -63,8 +68,13 @@ st.markdown(
 async def start_point():
     await edge_speak("أهلاً بك! أنا مُبصر. قل: أهلا مبصر لنبدأ.")
 
+    # Load the caption, translation and face models in the background
+    # (the face recognizer is shared with photo enrollment).
+    registry.warmup_async()
+    get_camera().start()
+
     while True:
-        command = listen_once(duration=3)
+        command = listen_once(commands=START_COMMANDS)
         if any(word in command for word in START_COMMANDS):
             await edge_speak("تمام! يمكنك قول استكشف المكان، التقط صورة، أو شكرًا مبصر.")
             break
@@ -72,7 +82,7 @@ async def start_point():
             await edge_speak("لم أسمع أهلا مبصر، حاول مرة أخرى.")
 
     while True:
-        command = listen_once(duration=3)
+        command = listen_once(commands=MAIN_COMMANDS)
 
         if any(word in command for word in PHOTO_COMMANDS):
             img_path = capture_Family_image()
@@ -82,13 +92,14 @@ async def start_point():
                 await edge_speak("وقعت مشكلة أثناء التصوير.")
 
         elif any(word in command for word in EXPLORE_COMMANDS):
-            img_path = capture_image()
-            if img_path:
+            frame, img_path = capture_frame()
+            if frame is not None:
                 await edge_speak("تم التقاط الصورة، جاري إنشاء الوصف...")
                 try:
-                    caption = get_caption(model, image_processor, tokenizer, img_path)
+                    with using_captioner() as captioner:
+                        caption = get_caption(*captioner, frame)
                     translated_caption = translate_text(caption)
-                    await edge_speak(f"وصف الصورة: {translated_caption}")
+                    await edge_speak(f"وصف الصورة: {translated_caption}", stream=True)
                 except Exception as e:
                     print(f"❌ خطأ في مولد الوصف: {e}")
                     await edge_speak("لم أتمكن من إنشاء وصف للصورة.")
@@ -0,0 +1,87 @@
+import json
+import pytest
+import Core.batch_cli as batch_cli
+from Core.batch_cli import load_done, load_records, run_batch
+
+
+@pytest.fixture
+def images(tmp_path):
+    folder = tmp_path / "photos"
+    folder.mkdir()
+    paths = []
+    for name in ("a.jpg", "b.jpg", "c.png", "d.jpeg"):
+        (folder / name).write_bytes(b"")
+        paths.append(str(folder / name))
+    (folder / "notes.txt").write_text("not an image")
+    return folder, paths
+
+
+@pytest.fixture
+def processed(monkeypatch):
+    """Replace the models with a recorder that captions every path it gets."""
+    calls = []
+
+    def process_chunk(paths, **options):
+        calls.append(list(paths))
+        return [{"path": path, "caption": "ok"} for path in paths]
+
+    monkeypatch.setattr(batch_cli, "process_chunk", process_chunk)
+    return calls
+
+
+def read_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_fresh_run_processes_every_image(tmp_path, images, processed):
+    folder, paths = images
+    output = str(tmp_path / "out" / "captions.jsonl")
+
+    summary = run_batch([str(folder)], output, batch_size=3)
+
+    assert (summary["found"], summary["skipped"], summary["processed"]) == (4, 0, 4)
+    assert processed == [paths[:3], paths[3:]]
+    assert [r["path"] for r in read_jsonl(output)] == paths
+
+
+def test_resume_skips_done_images_and_repairs_the_output(tmp_path, images, processed):
+    folder, paths = images
+    output = str(tmp_path / "captions.jsonl")
+    with open(output, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"path": paths[0], "caption": "ok"}) + "\n")
+        f.write(json.dumps({"path": paths[1], "error": "caption failed"}) + "\n")
+        f.write('{"path": "' + paths[2][:5])  # cut short by an interruption
+
+    records, clean = load_records(output)
+    assert not clean and set(records) == {paths[0], paths[1]}
+    assert load_done(output) == {paths[0]}
+    assert load_done(output, retry_errors=False) == {paths[0], paths[1]}
+
+    summary = run_batch([str(folder)], output)
+
+    assert summary["skipped"] == 1 and summary["processed"] == 3
+    assert processed == [paths[1:]]
+    rows = read_jsonl(output)
+    assert sorted(r["path"] for r in rows) == paths
+    assert not any(r.get("error") for r in rows)
+
+    processed.clear()
+    assert run_batch([str(folder)], output)["skipped"] == 4
+    assert processed == []
+
+
+def test_latest_record_for_a_path_wins(tmp_path, images, processed):
+    folder, paths = images
+    output = str(tmp_path / "captions.jsonl")
+    with open(output, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"path": paths[0], "error": "decode failed"}) + "\n")
+        f.write(json.dumps({"path": paths[0], "caption": "ok"}) + "\n")
+
+    records, clean = load_records(output)
+    assert not clean and records[paths[0]]["caption"] == "ok"
+
+    run_batch([str(folder)], output, limit=1)
+    rows = read_jsonl(output)
+    assert [r["path"] for r in rows] == [paths[0], paths[1]]
+    assert processed == [[paths[1]]]
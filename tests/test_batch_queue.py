@@ -0,0 +1,98 @@
+import threading
+import pytest
+from Computer_Vision import face_recognition
+from Core.inference_server import BadRequest, BatchQueue, QueueFull, prepare_translate, recognize_handler
+
+
+def echo(payloads):
+    return [{"echo": payload} for payload in payloads]
+
+
+def test_malformed_payload_is_rejected_on_its_own():
+    batches = []
+
+    def handler(payloads):
+        batches.append(payloads)
+        return echo(payloads)
+
+    server_queue = BatchQueue("translate", handler, prepare=prepare_translate)
+    with pytest.raises(BadRequest):
+        server_queue.submit({"texts": "not a list"})
+    with pytest.raises(BadRequest):
+        server_queue.submit({"texts": ["a"], "num_beams": 0})
+    good = server_queue.submit({"texts": ["a cat"]})
+
+    assert good.result(timeout=5)["echo"]["texts"] == ["a cat"]
+    assert batches == [[{"texts": ["a cat"], "max_length": 50, "num_beams": None}]]
+    assert server_queue.stats()["invalid"] == 2
+
+
+def test_prepare_errors_become_bad_requests():
+    server_queue = BatchQueue("test", echo, prepare=lambda payload: payload["missing"])
+    with pytest.raises(BadRequest, match="KeyError"):
+        server_queue.submit({})
+
+
+def test_returned_exception_fails_only_its_request():
+    def handler(payloads):
+        return [ValueError("bad item") if payload == "bad" else payload.upper() for payload in payloads]
+
+    server_queue = BatchQueue("test", handler, max_wait_ms=200)
+    futures = [server_queue.submit(payload) for payload in ("one", "bad", "two")]
+
+    assert futures[0].result(timeout=5) == "ONE"
+    assert futures[2].result(timeout=5) == "TWO"
+    with pytest.raises(ValueError, match="bad item"):
+        futures[1].result(timeout=5)
+    stats = server_queue.stats()
+    assert (stats["requests"], stats["errors"], stats["batches"]) == (3, 1, 1)
+
+
+def test_raised_exception_fails_the_batch_but_not_the_worker():
+    calls = []
+
+    def handler(payloads):
+        calls.append(payloads)
+        if len(calls) == 1:
+            raise RuntimeError("model crashed")
+        return echo(payloads)
+
+    server_queue = BatchQueue("test", handler, max_wait_ms=0)
+    with pytest.raises(RuntimeError):
+        server_queue.submit("first").result(timeout=5)
+    assert server_queue.submit("second").result(timeout=5) == {"echo": "second"}
+
+
+def test_full_queue_rejects_new_requests():
+    started, release = threading.Event(), threading.Event()
+
+    def handler(payloads):
+        started.set()
+        release.wait()
+        return echo(payloads)
+
+    server_queue = BatchQueue("test", handler, max_queue=1, max_batch=1, max_wait_ms=0)
+    first = server_queue.submit("running")
+    started.wait(timeout=5)
+    server_queue.submit("waiting")
+    with pytest.raises(QueueFull):
+        server_queue.submit("rejected")
+    release.set()
+
+    assert first.result(timeout=5) == {"echo": "running"}
+    assert server_queue.stats()["rejected"] == 1
+
+
+def test_recognize_handler_isolates_a_failing_image(monkeypatch):
+    def recognize(family_folder, image, **kwargs):
+        if image == "broken":
+            raise RuntimeError("detector failed")
+        return [{"label": "Aya"}]
+
+    monkeypatch.setattr(face_recognition, "recognize_family_faces", recognize)
+    payload = {"family_folder": "family", "labels_path": "labels.json", "threshold": 0.5, "margin": 0.05}
+
+    results = recognize_handler([dict(payload, image="ok"), dict(payload, image="broken")])
+
+    assert results[0] == {"faces": [{"label": "Aya"}]}
+    assert isinstance(results[1], RuntimeError)
@@ -0,0 +1,118 @@
+import os
+import json
+import types
+import cv2
+import numpy as np
+from Computer_Vision.face_gallery import FaceGallery
+
+
+class FakeFaceApp:
+    """Returns one face whose embedding is derived from the image pixels; counts calls."""
+
+    def __init__(self, faceless=()):
+        self.calls = 0
+        self.faceless = set(faceless)
+
+    def get(self, img):
+        self.calls += 1
+        value = int(img[0, 0, 0])
+        if value in self.faceless:
+            return []
+        embedding = np.zeros(8, dtype=np.float32)
+        embedding[value % 8] = 1.0
+        return [types.SimpleNamespace(embedding=embedding)]
+
+
+def write_photo(folder, name, value):
+    path = os.path.join(folder, name)
+    cv2.imwrite(path, np.full((8, 8, 3), value, dtype=np.uint8))
+    return path
+
+
+def make_family(tmp_path):
+    folder = tmp_path / "family"
+    folder.mkdir()
+    write_photo(str(folder), "Aya.png", 1)
+    write_photo(str(folder), "Omar.png", 2)
+    return str(folder), str(tmp_path / "labels.json")
+
+
+def test_first_sync_embeds_every_photo_and_persists(tmp_path):
+    folder, labels = make_family(tmp_path)
+    app = FakeFaceApp()
+    gallery = FaceGallery(folder, labels_path=labels)
+
+    assert gallery.sync(app) is True
+    assert app.calls == 2
+    assert gallery.items()[0] == ["Aya", "Omar"]
+
+    reloaded = FaceGallery(folder, labels_path=labels)
+    assert len(reloaded) == 2
+    assert reloaded.sync(app) is False
+    assert app.calls == 2
+
+
+def test_only_added_or_changed_photos_are_embedded_again(tmp_path):
+    folder, labels = make_family(tmp_path)
+    app = FakeFaceApp()
+    gallery = FaceGallery(folder, labels_path=labels)
+    gallery.sync(app)
+
+    write_photo(folder, "Mona.png", 3)
+    write_photo(folder, "Omar.png", 4)
+    assert gallery.sync(app) is True
+    assert app.calls == 4
+    names, _, embeddings = gallery.items()
+    assert names == ["Aya", "Mona", "Omar"]
+    assert embeddings[2][4] == 1.0
+
+
+def test_touched_but_identical_photo_is_not_embedded_again(tmp_path):
+    folder, labels = make_family(tmp_path)
+    app = FakeFaceApp()
+    gallery = FaceGallery(folder, labels_path=labels)
+    gallery.sync(app)
+
+    path = os.path.join(folder, "Aya.png")
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+    assert gallery.sync(app) is True  # the new mtime is recorded
+    assert app.calls == 2
+    assert gallery.sync(app) is False
+
+
+def test_deleted_photo_is_dropped(tmp_path):
+    folder, labels = make_family(tmp_path)
+    gallery = FaceGallery(folder, labels_path=labels)
+    gallery.sync(FakeFaceApp())
+
+    os.remove(os.path.join(folder, "Omar.png"))
+    assert gallery.sync(FakeFaceApp()) is True
+    assert gallery.items()[0] == ["Aya"]
+    assert FaceGallery(folder, labels_path=labels).items()[0] == ["Aya"]
+
+
+def test_photo_without_a_face_is_not_read_again_until_it_changes(tmp_path):
+    folder, labels = make_family(tmp_path)
+    write_photo(folder, "Blurry.png", 9)
+    app = FakeFaceApp(faceless={9})
+    gallery = FaceGallery(folder, labels_path=labels)
+
+    gallery.sync(app)
+    assert app.calls == 3
+    assert "Blurry" not in gallery.items()[0]
+    gallery.sync(app)
+    assert app.calls == 3
+
+
+def test_labels_are_applied_without_re_embedding(tmp_path):
+    folder, labels = make_family(tmp_path)
+    app = FakeFaceApp()
+    gallery = FaceGallery(folder, labels_path=labels)
+    gallery.sync(app)
+
+    with open(labels, "w", encoding="utf-8") as f:
+        json.dump({"Aya": "آية - أخت"}, f, ensure_ascii=False)
+    assert gallery.sync(app) is True
+    assert gallery.items()[1] == ["آية - أخت", "Omar"]
+    assert app.calls == 2
@@ -0,0 +1,64 @@
+import numpy as np
+from Computer_Vision.face_index import FaceIndex, l2_normalize
+from Computer_Vision.face_recognition import match_faces
+
+
+def unit(*values, dim=4):
+    vector = np.zeros(dim, dtype=np.float32)
+    vector[:len(values)] = values
+    return vector / np.linalg.norm(vector)
+
+
+def gallery(rows):
+    return FaceIndex(l2_normalize(np.stack(rows)), use_ann=False)
+
+
+class ApproximateIndex(FaceIndex):
+    """Exact search reported as approximate, to exercise the widening top_k path."""
+
+    def __init__(self, matrix):
+        super().__init__(matrix, use_ann=False)
+        self.use_ann = True
+
+
+def test_each_person_is_assigned_to_at_most_one_face():
+    index = gallery([unit(1, 0), unit(0, 1)])
+    faces = np.stack([unit(1, 0.05), unit(1, 0.02), unit(0, 1)])
+
+    results = match_faces(faces, ["Aya", "Omar"], index, threshold=0.5, margin=0.0)
+
+    assert [label for label, _, _ in results] == [None, "Aya", "Omar"]
+
+
+def test_match_below_threshold_is_rejected():
+    index = gallery([unit(1, 0), unit(0, 1)])
+    results = match_faces(np.stack([unit(1, 1.5)]), ["Aya", "Omar"], index, threshold=0.9, margin=0.0)
+    assert results[0][0] is None
+
+
+def test_ambiguous_face_fails_the_margin():
+    index = gallery([unit(1, 0), unit(0.9, 0.45)])
+    face = np.stack([unit(1, 0.15)])
+
+    assert match_faces(face, ["Aya", "Mona"], index, threshold=0.5, margin=0.2)[0][0] is None
+    label, score, lead = match_faces(face, ["Aya", "Mona"], index, threshold=0.5, margin=0.01)[0]
+    assert label == "Aya" and 0.01 <= lead < 0.2
+
+
+def test_margin_is_measured_against_the_best_other_person():
+    # Many photos of Aya must not push Mona out of the runner-up position.
+    rows = [unit(1, 0.01 * i) for i in range(12)] + [unit(0.9, 0.45)]
+    labels = ["Aya"] * 12 + ["Mona"]
+    face = np.stack([unit(1, 0.15)])
+
+    for index in (gallery(rows), ApproximateIndex(l2_normalize(np.stack(rows)))):
+        label, score, lead = match_faces(face, labels, index, threshold=0.5, margin=0.01, top_k=4)[0]
+        assert label == "Aya"
+        assert lead < 0.2
+        assert match_faces(face, labels, index, threshold=0.5, margin=0.2, top_k=4)[0][0] is None
+
+
+def test_empty_gallery_matches_nobody():
+    index = FaceIndex(np.zeros((0, 4), dtype=np.float32))
+    assert match_faces(np.stack([unit(1, 0)]), [], index) == [(None, 0.0, 0.0)]
+    assert match_faces(np.zeros((0, 4), dtype=np.float32), [], index) == []
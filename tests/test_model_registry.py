@@ -0,0 +1,93 @@
+import pytest
+from Core import model_registry, tracing
+from Core.model_registry import ModelRegistry
+
+
+@pytest.fixture
+def registry():
+    """A registry with room for two of its three 100 MB models."""
+    registry = ModelRegistry(budget_mb=250)
+    registry.unloaded = []
+    for name in ("captioner", "translator", "faces"):
+        registry.register(name, lambda name=name: object(),
+                          unloader=lambda model, name=name: registry.unloaded.append(name), size_mb=100)
+    return registry
+
+
+@pytest.fixture
+def metrics(monkeypatch, registry):
+    """Enable tracing with empty metrics, exporting `registry` as the shared registry."""
+    for store in ("_counters", "_gauges", "_histograms"):
+        monkeypatch.setattr(tracing, store, {})
+    monkeypatch.setattr(model_registry, "registry", registry)
+    enabled = tracing.is_enabled()
+    tracing.configure(enabled=True)
+    yield
+    tracing.configure(enabled=enabled)
+
+
+def loaded(registry):
+    return sorted(name for name in registry.names() if registry.is_loaded(name))
+
+
+def test_least_recently_used_model_is_evicted(registry):
+    registry.get("captioner")
+    registry.get("translator")
+    registry.get("captioner")
+    registry.get("faces")
+
+    assert loaded(registry) == ["captioner", "faces"]
+    assert registry.unloaded == ["translator"]
+    assert registry.memory_stats()["resident_mb"] == pytest.approx(200)
+
+
+def test_evicted_model_is_loaded_again(registry):
+    for name in ("captioner", "translator", "faces", "captioner"):
+        registry.get(name)
+    stats = registry.stats()
+    assert stats["captioner"]["loads"] == 2 and stats["captioner"]["evictions"] == 1
+    assert registry.memory_stats()["evictions"] == 2
+
+
+def test_pinned_model_is_not_evicted(registry):
+    registry.get("translator")
+    with registry.use("captioner"):
+        assert registry.stats()["captioner"]["pinned"]
+        registry.get("faces")
+        assert loaded(registry) == ["captioner", "faces"]
+    assert not registry.stats()["captioner"]["pinned"]
+
+
+def test_idle_models_are_evicted():
+    registry = ModelRegistry(idle_seconds=60)
+    registry.register("captioner", object)
+    registry.register("translator", object)
+    registry.get("captioner")
+    now = registry._last_used["captioner"]
+    registry.get("translator")
+    registry._last_used["translator"] = now + 50
+
+    assert registry.evict_idle(now=now + 70) == ["captioner"]
+    assert loaded(registry) == ["translator"]
+
+
+def test_unload_is_not_counted_as_an_eviction(registry):
+    registry.get("captioner")
+    registry.unload("captioner")
+    assert not registry.is_loaded("captioner")
+    assert registry.stats()["captioner"]["evictions"] == 0
+
+
+def test_prometheus_output_declares_each_metric_once(registry, metrics):
+    for name in ("captioner", "translator", "faces"):
+        registry.get(name)
+
+    text = tracing.render_prometheus()
+    declared = [line.split()[2] for line in text.splitlines() if line.startswith("# TYPE")]
+    assert len(declared) == len(set(declared))
+    assert "# TYPE mobsir_model_evictions_total counter" in text
+    assert "# TYPE mobsir_model_loads_total counter" in text
+    assert 'mobsir_model_evictions_total{model="captioner",reason="budget"} 1' in text
+    assert 'mobsir_model_loads_total{model="faces"} 1' in text
+    assert 'mobsir_model_loaded{model="captioner"} 0.0' in text
+    assert 'mobsir_model_loaded{model="faces"} 1.0' in text
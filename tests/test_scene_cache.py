@@ -0,0 +1,65 @@
+import numpy as np
+from Computer_Vision import scene_cache
+from Computer_Vision.scene_cache import SceneCache, dhash, hamming_distance
+
+
+def scene(seed, shape=(120, 160, 3)):
+    """A smooth random RGB image, so the hash reflects its layout."""
+    rng = np.random.default_rng(seed)
+    coarse = rng.integers(0, 256, (6, 8, 3), dtype=np.uint8)
+    return np.kron(coarse, np.ones((20, 20, 1), dtype=np.uint8))[:shape[0], :shape[1]]
+
+
+def jitter(frame, seed=1, amount=4):
+    rng = np.random.default_rng(seed)
+    noisy = frame.astype(np.int16) + rng.integers(-amount, amount + 1, frame.shape)
+    return np.clip(noisy, 0, 255).astype(np.uint8)
+
+
+def test_small_changes_keep_the_hash_close():
+    frame = scene(0)
+    assert hamming_distance(dhash(frame), dhash(jitter(frame))) <= 6
+    assert hamming_distance(dhash(frame), dhash(scene(1))) > 6
+
+
+def test_near_identical_frame_reuses_the_description():
+    cache = SceneCache()
+    frame = scene(0)
+    assert cache.lookup(frame) is None
+    cache.store(frame, {"description": "شخص يجلس على كرسي"})
+
+    hit = cache.lookup(jitter(frame))
+    assert hit["description"] == "شخص يجلس على كرسي"
+    assert hit["scene_distance"] <= cache.max_distance
+    assert cache.lookup(scene(1)) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_stored_result_is_a_copy():
+    cache = SceneCache()
+    result = {"description": "قطة"}
+    cache.store(scene(0), result)
+    result["description"] = "كلب"
+    cache.lookup(scene(0))["description"] = "طائر"
+    assert cache.lookup(scene(0))["description"] == "قطة"
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(scene_cache.time, "monotonic", lambda: now[0])
+    cache = SceneCache(ttl=60)
+    cache.store(scene(0), {"description": "قطة"})
+
+    now[0] += 30
+    assert cache.lookup(scene(0))["scene_age"] == 30
+    now[0] += 31
+    assert cache.lookup(scene(0)) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_scene_is_dropped():
+    cache = SceneCache(max_entries=2)
+    for seed in range(3):
+        cache.store(scene(seed), {"description": str(seed)})
+    assert cache.lookup(scene(0)) is None
+    assert cache.lookup(scene(2))["description"] == "2"
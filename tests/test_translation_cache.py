@@ -0,0 +1,61 @@
+from NLP.translation_cache import TranslationCache, make_cache_key, normalize_source_text
+
+SETTINGS = {"model": "opus-mt-en-ar", "num_beams": 4}
+
+
+def test_whitespace_and_unicode_variants_share_a_key():
+    a = normalize_source_text("  A man   riding\na horse ")
+    b = normalize_source_text("A man riding a horse")
+    assert a == b == "A man riding a horse"
+    assert normalize_source_text("ﬁsh") == "fish"
+    assert make_cache_key(a, SETTINGS) == make_cache_key(b, dict(reversed(SETTINGS.items())))
+
+
+def test_generation_settings_change_the_key():
+    text = "a cat on a sofa"
+    assert make_cache_key(text, SETTINGS) != make_cache_key(text, {**SETTINGS, "num_beams": 1})
+    assert make_cache_key(text, SETTINGS) != make_cache_key(text + ".", SETTINGS)
+
+
+def test_miss_then_memory_hit():
+    cache = TranslationCache(db_path=None)
+    key = make_cache_key("a cat", SETTINGS)
+
+    assert cache.get(key) is None
+    cache.put(key, "قطة")
+    assert cache.get(key) == "قطة"
+
+    stats = cache.stats()
+    assert (stats["misses"], stats["memory_hits"], stats["disk_hits"]) == (1, 1, 0)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_disk_hit_survives_a_restart(tmp_path):
+    db_path = str(tmp_path / "cache" / "translations.sqlite3")
+    key = make_cache_key("a dog", SETTINGS)
+    TranslationCache(db_path=db_path).put(key, "كلب")
+
+    cache = TranslationCache(db_path=db_path)
+    assert cache.get(key) == "كلب"
+    assert cache.get(key) == "كلب"
+    stats = cache.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 0)
+
+
+def test_memory_lru_evicts_oldest_but_disk_keeps_it(tmp_path):
+    cache = TranslationCache(max_entries=2, db_path=str(tmp_path / "t.sqlite3"))
+    keys = [make_cache_key(text, SETTINGS) for text in ("one", "two", "three")]
+    for key, value in zip(keys, ("واحد", "اثنان", "ثلاثة")):
+        cache.put(key, value)
+
+    assert cache.stats()["memory_entries"] == 2
+    assert cache.get(keys[0]) == "واحد"
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_clear_forgets_everything(tmp_path):
+    cache = TranslationCache(db_path=str(tmp_path / "t.sqlite3"))
+    key = make_cache_key("a bird", SETTINGS)
+    cache.put(key, "طائر")
+    cache.clear()
+    assert cache.get(key) is None
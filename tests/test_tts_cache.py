@@ -0,0 +1,55 @@
+import asyncio
+import os
+from NLP.tts import StubTTSBackend, TTSCache, prerender
+
+
+def test_key_depends_on_text_voice_rate_and_backend():
+    base = TTSCache.make_key("مرحبا", "ar-EG-SalmaNeural", "+0%", "edge")
+    assert base == TTSCache.make_key("مرحبا", "ar-EG-SalmaNeural", "+0%", "edge")
+    variants = [
+        TTSCache.make_key("مرحبًا", "ar-EG-SalmaNeural", "+0%", "edge"),
+        TTSCache.make_key("مرحبا", "ar-EG-ShakirNeural", "+0%", "edge"),
+        TTSCache.make_key("مرحبا", "ar-EG-SalmaNeural", "+10%", "edge"),
+        TTSCache.make_key("مرحبا", "ar-EG-SalmaNeural", "+0%", "stub"),
+    ]
+    assert len({base, *variants}) == 5
+
+
+def test_key_fields_cannot_run_together():
+    assert TTSCache.make_key("b", "a", "+0%", "edge") != TTSCache.make_key("", "a", "+0%b", "edge")
+
+
+def test_repeated_text_is_synthesized_once(tmp_path):
+    cache = TTSCache(folder=str(tmp_path))
+    backend = StubTTSBackend()
+
+    first = asyncio.run(cache.get_or_synthesize(backend, "أهلا"))
+    second = asyncio.run(cache.get_or_synthesize(backend, "أهلا"))
+    other = asyncio.run(cache.get_or_synthesize(backend, "أهلا", rate="+20%"))
+
+    assert first == second != other
+    assert first.endswith(".wav") and os.path.exists(first)
+    assert backend.calls == 2
+    assert cache.stats() == {"hits": 1, "misses": 2, "hit_rate": 1 / 3}
+
+
+def test_read_returns_the_stored_bytes(tmp_path):
+    cache = TTSCache(folder=str(tmp_path))
+    key = cache.make_key("نص", "voice", "+0%", "stub")
+    assert cache.read(key, "wav") is None
+    cache.put(key, "wav", b"RIFF")
+    assert cache.read(key, "wav") == b"RIFF"
+
+
+def test_eviction_keeps_pinned_prompts(tmp_path):
+    cache = TTSCache(folder=str(tmp_path), max_bytes=10)
+    backend = StubTTSBackend(seconds_per_char=0.0)
+    assert asyncio.run(prerender(cache, backend, ["جاهز"])) == 1
+    pinned = cache.make_key("جاهز", "ar-EG-SalmaNeural", "+0%", "stub")
+
+    for i in range(3):
+        cache.put(cache.make_key(f"text {i}", "v", "+0%", "stub"), "wav", b"x" * 8)
+
+    remaining = {os.path.splitext(name)[0] for name in os.listdir(tmp_path)}
+    assert pinned in remaining
+    assert len(remaining) < 4
@@ -0,0 +1,71 @@
+import numpy as np
+from NLP.audio_capture import EnergyVAD, ScriptedAudioSource, UtteranceSegmenter
+
+FS = 16000
+FRAME = 480  # 30 ms
+rng = np.random.default_rng(0)
+
+
+def noise(frames):
+    return [rng.normal(0, 30, FRAME).astype(np.int16) for _ in range(frames)]
+
+
+def tone(frames, amplitude=6000):
+    t = np.arange(FRAME) / FS
+    frame = (amplitude * np.sin(2 * np.pi * 220 * t)).astype(np.int16)
+    return [frame.copy() for _ in range(frames)]
+
+
+def feed_all(segmenter, frames):
+    return [u for u in (segmenter.feed(f) for f in frames) if u is not None]
+
+
+def test_vad_separates_tone_from_background_noise():
+    vad = EnergyVAD()
+    assert not any(vad.is_speech(f) for f in noise(20))
+    assert all(vad.is_speech(f) for f in tone(5))
+
+
+def test_one_utterance_with_pre_roll_and_trailing_silence():
+    segmenter = UtteranceSegmenter(fs=FS)
+    utterances = feed_all(segmenter, noise(30) + tone(30) + noise(30))
+
+    assert len(utterances) == 1
+    # 300 ms of pre-roll (ending with the 3 start frames), 27 more speech
+    # frames and 700 ms (23 frames) of trailing silence.
+    assert len(utterances[0]) == (10 + 27 + 23) * FRAME
+    assert not segmenter.in_speech
+
+
+def test_short_click_does_not_open_an_utterance():
+    segmenter = UtteranceSegmenter(fs=FS)
+    assert feed_all(segmenter, noise(20) + tone(2) + noise(40)) == []
+    assert not segmenter.in_speech
+
+
+def test_long_speech_is_cut_at_max_utterance():
+    segmenter = UtteranceSegmenter(fs=FS, max_utterance_s=1.5)
+    utterances = feed_all(segmenter, noise(10) + tone(120))
+    assert len(utterances) >= 2
+    assert all(len(u) == segmenter.max_frames * FRAME for u in utterances)
+
+
+def test_two_utterances_are_split_on_silence():
+    segmenter = UtteranceSegmenter(fs=FS)
+    frames = noise(20) + tone(20) + noise(30) + tone(20) + noise(30)
+    assert len(feed_all(segmenter, frames)) == 2
+
+
+def test_scripted_source_drives_the_segmenter():
+    source = ScriptedAudioSource(fs=FS, frame_samples=FRAME)
+    segmenter = UtteranceSegmenter(fs=FS)
+    source.say(seconds=0.6, trailing_silence_s=1.0, delay=0.3)
+
+    utterance = None
+    for _ in range(200):
+        utterance = segmenter.feed(source.read())
+        if utterance is not None:
+            break
+    assert utterance is not None
+    assert source.speech_ended_at is not None
+    assert len(utterance) >= int(0.6 * FS)